@@ -0,0 +1,183 @@
+# scripts/batch_consult.py
+"""
+Batch consulting mode.
+Runs every {business_description, goal, kpis} record of a JSONL file through one compiled
+(async) graph with bounded concurrency.
+
+- each finished record is written to <out_dir>/final_report_<record_id>.json
+- one summary line per record is appended to <out_dir>/summary.jsonl as soon as it finishes
+- re-running the same command resumes: records whose final_report file exists are skipped;
+  with CHECKPOINTER=sqlite, records that crashed mid-graph continue from their last checkpoint
+  (coach calls that already finished are not repeated)
+
+Usage:
+    python scripts/batch_consult.py intake.jsonl [--out-dir data/metadata/batch] [--concurrency 16]
+"""
+
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import traceback
+from pathlib import Path
+from typing import Any, Dict, Iterator, Tuple
+
+# Add project root to sys.path so we can import src
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.business_consultant_graph import aresume_session, asession_status, build_async_graph, warm_vectorstores
+from src.coach_output import COACH_OUTPUT_METRICS
+
+DEFAULT_OUT_DIR = Path("data/metadata/batch")
+DEFAULT_CONCURRENCY = 16
+
+
+def record_id(rec: Dict[str, Any]) -> str:
+    """
+    Stable id for resume: explicit 'id' field, else a hash of the intake fields.
+    An explicit id is made file-name safe; when that changes it ("a/b", "a:b") a short hash of
+    the raw id is appended so distinct ids never share one final_report file.
+    """
+    if not isinstance(rec, dict):
+        raise ValueError(f"record must be a JSON object, got {type(rec).__name__}")
+    if rec.get("id"):
+        raw = str(rec["id"])
+        safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in raw)
+        if safe != raw:
+            safe += "-" + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:8]
+        return safe
+    blob = json.dumps(
+        {k: rec.get(k) for k in ("business_description", "goal", "kpis")},
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()[:12]
+
+
+def iter_records(path: Path) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    with path.open("r", encoding="utf-8") as fh:
+        for line_no, line in enumerate(fh, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Skipping malformed line {line_no}: {e}")
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    # write-then-rename so a crash never leaves a half-written report that would be treated as done
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    tmp.replace(path)
+
+
+async def _run_one(graph, rec: Dict[str, Any], rid: str, out_dir: Path) -> Dict[str, Any]:
+    initial_state = {
+        "business_description": rec.get("business_description", ""),
+        "goal": rec.get("goal", ""),
+    }
+    if rec.get("kpis"):
+        initial_state["kpis"] = rec["kpis"]
+    thread = {"configurable": {"thread_id": f"batch-{rid}"}}
+
+    entry = {"record_id": rid, "thread_id": thread["configurable"]["thread_id"], "start_ts": time.time(), "ok": False}
+    try:
+        status = await asession_status(graph, entry["thread_id"])
+        if status["exists"]:
+            entry["resumed"] = True
+            final_state = await aresume_session(graph, entry["thread_id"])
+        else:
+            final_state = await graph.ainvoke(initial_state, thread)
+        fr = final_state.get("final_report", {})
+        fr_path = out_dir / f"final_report_{rid}.json"
+        _write_atomic(fr_path, json.dumps(fr, ensure_ascii=False, indent=2))
+        entry["ok"] = True
+        entry["final_report_path"] = str(fr_path)
+        entry["num_consensus_bottlenecks"] = len(fr.get("consensus_bottlenecks", []))
+        entry["report_errors"] = final_state.get("report_errors", [])
+    except Exception as exc:
+        entry["error"] = f"{type(exc).__name__}: {exc}"
+        entry["traceback"] = traceback.format_exc()[:1000]
+    entry["end_ts"] = time.time()
+    entry["duration_s"] = round(entry["end_ts"] - entry["start_ts"], 3)
+    return entry
+
+
+async def run_batch(input_path: Path, out_dir: Path = DEFAULT_OUT_DIR, concurrency: int = DEFAULT_CONCURRENCY) -> Dict[str, int]:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    summary_path = out_dir / "summary.jsonl"
+    graph, _ = build_async_graph()
+
+    counts = {"done": 0, "failed": 0, "skipped": 0}
+    records = iter_records(input_path)
+    seen = set()
+
+    def next_pending():
+        # shared iterator: workers pull lazily so thousands of records never sit in memory as tasks
+        for line_no, rec in records:
+            try:
+                rid = record_id(rec)
+            except ValueError as e:
+                # one bad line fails only itself, never the workers
+                counts["failed"] += 1
+                summary.write(json.dumps({"line": line_no, "ok": False, "error": str(e)}, ensure_ascii=False) + "\n")
+                summary.flush()
+                print(f"Line {line_no}: {e}")
+                continue
+            if rid in seen:
+                counts["skipped"] += 1
+                print(f"Line {line_no}: duplicate record id '{rid}' in this batch, skipped")
+                continue
+            if (out_dir / f"final_report_{rid}.json").exists():
+                counts["skipped"] += 1
+                continue
+            seen.add(rid)
+            return line_no, rec, rid
+        return None
+
+    with summary_path.open("a", encoding="utf-8") as summary:
+        async def worker():
+            while True:
+                item = next_pending()
+                if item is None:
+                    return
+                line_no, rec, rid = item
+                entry = await _run_one(graph, rec, rid, out_dir)
+                entry["line"] = line_no
+                summary.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                summary.flush()
+                counts["done" if entry["ok"] else "failed"] += 1
+                print(f"[{rid}] {'ok' if entry['ok'] else 'FAILED'} in {entry['duration_s']}s "
+                      f"(done={counts['done']} failed={counts['failed']} skipped={counts['skipped']})")
+
+        await asyncio.gather(*[worker() for _ in range(max(1, concurrency))])
+    return counts
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run a JSONL file of intake records through the consulting graph.")
+    ap.add_argument("input", help="JSONL with one {business_description, goal, kpis} object per line")
+    ap.add_argument("--out-dir", default=str(DEFAULT_OUT_DIR))
+    ap.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="max records in flight")
+    args = ap.parse_args()
+
+    input_path = Path(args.input)
+    if not input_path.exists():
+        raise SystemExit(f"Input file not found: {input_path}")
+
+    warm_vectorstores()
+    t0 = time.time()
+    counts = asyncio.run(run_batch(input_path, Path(args.out_dir), args.concurrency))
+    print(f"\n=== BATCH COMPLETE in {time.time() - t0:.1f}s === {counts}")
+    overall = COACH_OUTPUT_METRICS.snapshot().get("all")
+    if overall:
+        print(f"Coach output: parse failures {overall['parse_failure_rate']:.1%}, repairs {overall['repair_rate']:.1%}, "
+              f"repair success {overall['repair_success_rate']:.1%}")
+    print("Summary:", Path(args.out_dir) / "summary.jsonl")
+
+
+if __name__ == "__main__":
+    main()
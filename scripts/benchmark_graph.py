@@ -0,0 +1,255 @@
+# scripts/benchmark_graph.py
+"""
+Offline end-to-end benchmark of the consulting graph.
+
+ChatOpenAI and the embeddings client are swapped for src/fake_models.py stand-ins (canned coach
+JSON, hashing vectors, configurable latency), so runs cost nothing and differ only by the code
+under test. Retrieval runs against the EMBEDDING_BACKEND=hashing collections; ingest them once with
+    EMBEDDING_BACKEND=hashing python scripts/ingest_chroma.py
+
+For each concurrency level it records throughput, per-run latency percentiles, per-stage latency
+(from src/tracing.py spans), LLM calls and peak memory; startup time (import + build + warm-up) is
+measured in fresh interpreters. Results go to data/benchmarks/bench_<ts>.json.
+
+Usage:
+    python scripts/benchmark_graph.py [--levels 1,4,16] [--requests 24] [--llm-latency lognormal:400:0.4]
+        [--embed-latency fixed:30] [--malformed-rate 0.1] [--graph async|sync] [--baseline old.json]
+
+With --baseline, exits 1 when throughput drops or run p95 / peak memory grow by more than --tolerance.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import resource
+import statistics
+import subprocess
+import tempfile
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# offline defaults; must be set before the graph module reads its config at import
+OFFLINE_ENV = {
+    "EMBEDDING_BACKEND": "hashing",
+    "LLM_CACHE_DISABLED": "1",
+    "QUERY_EMBED_CACHE_DIR": "",
+    "CHECKPOINTER": "memory",
+    "OPENAI_API_KEY": "sk-benchmark",
+}
+for _k, _v in OFFLINE_ENV.items():
+    os.environ.setdefault(_k, _v)
+
+# Add project root to sys.path so we can import src
+ROOT = Path(__file__).parent.parent
+sys.path.append(str(ROOT))
+
+import src.business_consultant_graph as graph_mod
+from src.coach_output import COACH_OUTPUT_METRICS
+from src.fake_models import FakeChatModel, install_fakes
+from src.tracing import Tracer, load_spans, percentile, summarize
+
+OUT_DIR = Path("data/benchmarks")
+
+SCENARIOS = [
+    ("Diaper manufacturing business with moderate local sales and high production costs.", "Get profitable in 6 months"),
+    ("Bootstrapped coaching SaaS selling monthly subscriptions to coaches.", "Double monthly recurring revenue in 6 months"),
+    ("3-store retail chain with inconsistent inventory and declining footfall.", "Increase same-store sales by 20% in 3 months"),
+]
+
+STARTUP_SNIPPET = """
+import sys, time, json
+t0 = time.perf_counter()
+sys.path.insert(0, {root!r})
+import src.business_consultant_graph as g
+t1 = time.perf_counter()
+g.build_graph()
+g.warm_vectorstores()
+t2 = time.perf_counter()
+print(json.dumps({{"import_s": t1 - t0, "build_and_warm_s": t2 - t1}}))
+"""
+
+
+def make_state(i: int, level: int):
+    desc, goal = SCENARIOS[i % len(SCENARIOS)]
+    # unique text per run so the in-memory query-embedding cache does not short-circuit retrieval
+    return {"business_description": f"{desc} (bench c{level} #{i})", "goal": goal}
+
+
+def _timed_sync(graph, state, thread_id):
+    t0 = time.perf_counter()
+    try:
+        fr = graph.invoke(state, {"configurable": {"thread_id": thread_id}}).get("final_report")
+        ok = bool(fr)
+    except Exception as e:
+        print(f"run {thread_id} failed: {e}")
+        ok = False
+    return time.perf_counter() - t0, ok
+
+
+async def _timed_async(graph, state, thread_id, sem):
+    async with sem:
+        t0 = time.perf_counter()
+        try:
+            fr = (await graph.ainvoke(state, {"configurable": {"thread_id": thread_id}})).get("final_report")
+            ok = bool(fr)
+        except Exception as e:
+            print(f"run {thread_id} failed: {e}")
+            ok = False
+        return time.perf_counter() - t0, ok
+
+
+def run_level(graph, kind: str, level: int, n_requests: int):
+    """Runs n_requests sessions with at most `level` in flight. Returns (wall_s, [(latency_s, ok)])."""
+    states = [(make_state(i, level), f"bench-c{level}-{i}") for i in range(n_requests)]
+    t0 = time.perf_counter()
+    if kind == "sync":
+        with ThreadPoolExecutor(max_workers=level) as pool:
+            results = list(pool.map(lambda a: _timed_sync(graph, *a), states))
+    else:
+        async def _all():
+            sem = asyncio.Semaphore(level)
+            return await asyncio.gather(*(_timed_async(graph, s, tid, sem) for s, tid in states))
+        results = asyncio.run(_all())
+    return time.perf_counter() - t0, results
+
+
+def measure_startup(repeats: int):
+    samples = []
+    env = dict(os.environ, TRACE_DISABLED="1")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        out = subprocess.run([sys.executable, "-c", STARTUP_SNIPPET.format(root=str(ROOT.resolve()))],
+                             capture_output=True, text=True, env=env)
+        total = time.perf_counter() - t0
+        try:
+            sample = json.loads(out.stdout.strip().splitlines()[-1])
+        except (IndexError, json.JSONDecodeError):
+            print("Startup probe failed:", out.stderr[-500:])
+            continue
+        sample["process_s"] = total
+        samples.append(sample)
+    if not samples:
+        return {}
+    return {k: round(statistics.median(s[k] for s in samples), 4) for k in samples[0]} | {"repeats": len(samples)}
+
+
+def bench_level(graph, args, level: int, llm: FakeChatModel, trace_dir: Path):
+    trace_path = trace_dir / f"spans_c{level}.jsonl"
+    graph_mod.TRACER = Tracer(trace_path)
+    calls_before = llm.calls
+    COACH_OUTPUT_METRICS.reset()
+    tracemalloc.start()
+    wall, results = run_level(graph, args.graph, level, args.requests)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    graph_mod.TRACER.close()
+
+    lat_ms = sorted(r[0] * 1000 for r in results)
+    ok = sum(1 for r in results if r[1])
+    return {
+        "concurrency": level,
+        "requests": len(results),
+        "ok": ok,
+        "errors": len(results) - ok,
+        "wall_s": round(wall, 4),
+        "throughput_rps": round(len(results) / wall, 3) if wall else 0.0,
+        "run_latency_ms": {
+            "p50": round(percentile(lat_ms, 50), 3),
+            "p95": round(percentile(lat_ms, 95), 3),
+            "p99": round(percentile(lat_ms, 99), 3),
+            "mean": round(sum(lat_ms) / len(lat_ms), 3) if lat_ms else 0.0,
+        },
+        "llm_calls": llm.calls - calls_before,
+        "coach_output": COACH_OUTPUT_METRICS.snapshot().get("all", {}),
+        "peak_traced_mb": round(peak / 2**20, 3),
+        "maxrss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "stages": summarize(load_spans(trace_path)),
+    }
+
+
+def compare_to_baseline(result, baseline, tolerance: float):
+    """Returns human-readable regressions for concurrency levels present in both runs."""
+    base_levels = {lv["concurrency"]: lv for lv in baseline.get("levels", [])}
+    problems = []
+    for lv in result["levels"]:
+        old = base_levels.get(lv["concurrency"])
+        if old is None:
+            continue
+        c = lv["concurrency"]
+        if lv["throughput_rps"] < old["throughput_rps"] * (1 - tolerance):
+            problems.append(f"c={c} throughput {old['throughput_rps']} -> {lv['throughput_rps']} rps")
+        if lv["run_latency_ms"]["p95"] > old["run_latency_ms"]["p95"] * (1 + tolerance):
+            problems.append(f"c={c} run p95 {old['run_latency_ms']['p95']} -> {lv['run_latency_ms']['p95']} ms")
+        if lv["peak_traced_mb"] > old["peak_traced_mb"] * (1 + tolerance):
+            problems.append(f"c={c} peak memory {old['peak_traced_mb']} -> {lv['peak_traced_mb']} MB")
+    return problems
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline benchmark of the consulting graph with fake LLM/embeddings.")
+    ap.add_argument("--levels", default="1,4,16", help="comma-separated concurrency levels")
+    ap.add_argument("--requests", type=int, default=24, help="sessions per concurrency level")
+    ap.add_argument("--graph", choices=["async", "sync"], default="async")
+    ap.add_argument("--llm-latency", default="lognormal:400:0.4", help="fake LLM delay spec (ms), see src/fake_models.py")
+    ap.add_argument("--embed-latency", default="fixed:30", help="fake embedding delay spec (ms)")
+    ap.add_argument("--malformed-rate", type=float, default=0.1, help="share of coach answers missing keys (exercises repair)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--startup-repeats", type=int, default=3, help="fresh interpreters for startup timing (0 to skip)")
+    ap.add_argument("--out", default=None, help="output JSON path (default data/benchmarks/bench_<ts>.json)")
+    ap.add_argument("--baseline", default=None, help="earlier result JSON to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression vs --baseline")
+    args = ap.parse_args()
+    levels = [int(x) for x in args.levels.split(",") if x.strip()]
+
+    startup = measure_startup(args.startup_repeats) if args.startup_repeats > 0 else {}
+    if startup:
+        print("Startup:", startup)
+
+    llm, _ = install_fakes(graph_mod, args.llm_latency, args.embed_latency, args.malformed_rate, args.seed)
+    graph, _ = graph_mod.build_async_graph() if args.graph == "async" else graph_mod.build_graph()
+    # one untimed session so lazy loads (BM25 index, encoder, Chroma handles) are not billed to level 1
+    run_level(graph, args.graph, 1, 1)
+
+    result = {
+        "timestamp": time.time(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline")} | {"levels": levels},
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "embedding_backend": graph_mod.EMBEDDING_BACKEND,
+            "retrieval_mode": graph_mod.RETRIEVAL_MODE,
+            "retriever": graph_mod.RETRIEVER,
+        },
+        "startup": startup,
+        "levels": [],
+    }
+    with tempfile.TemporaryDirectory() as trace_dir:
+        for level in levels:
+            lv = bench_level(graph, args, level, llm, Path(trace_dir))
+            result["levels"].append(lv)
+            print(f"c={level:<3} {lv['throughput_rps']:>8} rps  p50 {lv['run_latency_ms']['p50']:>9} ms  "
+                  f"p95 {lv['run_latency_ms']['p95']:>9} ms  llm calls {lv['llm_calls']:>4}  "
+                  f"peak {lv['peak_traced_mb']} MB  errors {lv['errors']}")
+
+    out = Path(args.out) if args.out else OUT_DIR / f"bench_{int(result['timestamp'])}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    print("Saved benchmark results to:", out)
+
+    if args.baseline:
+        problems = compare_to_baseline(result, json.loads(Path(args.baseline).read_text(encoding="utf-8")), args.tolerance)
+        if problems:
+            print("Regressions vs baseline:")
+            for p in problems:
+                print("  -", p)
+            sys.exit(1)
+        print("No regressions vs baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,200 @@
 # scripts/dedupe_chunks.py
+"""
+Near-duplicate removal for processed chunks (MinHash + LSH banding).
+
+- each chunk -> set of word 5-gram shingles -> MinHash signature (NUM_PERM hashes)
+- signatures are split into bands; chunks sharing any band bucket become candidate pairs
+- candidates are confirmed with exact Jaccard >= threshold and grouped into clusters (union-find)
+
+Detection runs over the whole corpus, so clusters can span coaches. By default only duplicates
+within the same coach are dropped (each coach has its own collection); --scope global drops
+cross-coach duplicates too. Writes <coach>/chunks_dedup.jsonl (read by ingest_chroma.py)
+and a cluster report to data/metadata/dedupe_report.json.
+
+Usage:
+    python scripts/dedupe_chunks.py [--threshold 0.8] [--scope coach|global]
+"""
+import re
 import json
+import zlib
+import argparse
 from pathlib import Path
 from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
 
 PROCESSED_ROOT = Path("data/processed")
 OUT_SUFFIX = "_dedup.jsonl"
+REPORT_PATH = Path("data/metadata/dedupe_report.json")
+DEFAULT_THRESHOLD = 0.8
+NUM_PERM = 128
+SHINGLE_WORDS = 5
+SEED = 1
+_MERSENNE_PRIME = np.uint64(4294967311)  # smallest prime above 2**32
+_WORD_RE = re.compile(r"\w+")
+
+def shingles(text: str, k: int = SHINGLE_WORDS) -> Set[int]:
+    """32-bit hashes of lowercase word k-grams."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < k:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))} if words else set()
+    return {zlib.crc32(" ".join(words[i:i + k]).encode("utf-8")) for i in range(len(words) - k + 1)}
+
+class MinHasher:
+    """Universal hashing (a*x + b) mod p; a < 2**31 keeps the product inside uint64."""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = SEED):
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, 2**31, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 2**31, size=num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+
+    def signature(self, shingle_set: Set[int]) -> np.ndarray:
+        if not shingle_set:
+            return np.full(self.num_perm, np.iinfo(np.uint64).max, dtype=np.uint64)
+        hv = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set))
+        phv = (np.outer(hv, self.a) + self.b) % _MERSENNE_PRIME
+        return phv.min(axis=0)
+
+def optimal_bands(threshold: float, num_perm: int = NUM_PERM) -> Tuple[int, int]:
+    """(bands, rows) with bands*rows == num_perm whose S-curve midpoint (1/b)**(1/r) is closest to threshold."""
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        err = abs((1.0 / bands) ** (1.0 / rows) - threshold)
+        if best is None or err < best[0]:
+            best = (err, bands, rows)
+    return best[1], best[2]
+
+class UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, x: int) -> int:
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # lower index (earlier chunk) stays the root, so it is the one kept
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+def load_corpus() -> List[Dict]:
+    """All chunks in deterministic (coach, file order) order."""
+    docs = []
+    for d in sorted(PROCESSED_ROOT.iterdir()):
+        f = d / "chunks.jsonl"
+        if not d.is_dir() or not f.exists():
+            continue
+        with f.open("r", encoding="utf-8") as fin:
+            for line in fin:
+                if line.strip():
+                    obj = json.loads(line)
+                    obj.setdefault("coach", d.name)
+                    docs.append(obj)
+    return docs
+
+def find_near_duplicates(texts: List[str], threshold: float = DEFAULT_THRESHOLD, num_perm: int = NUM_PERM) -> List[Tuple[int, int, float]]:
+    """Returns confirmed pairs (i, j, jaccard) with i < j. Roughly linear: only band-bucket collisions are compared."""
+    hasher = MinHasher(num_perm)
+    bands, rows = optimal_bands(threshold, num_perm)
+    shingle_sets = [shingles(t) for t in texts]
+    buckets = [defaultdict(list) for _ in range(bands)]
+    for idx, sh in enumerate(shingle_sets):
+        if not sh:
+            continue
+        sig = hasher.signature(sh)
+        for band in range(bands):
+            buckets[band][sig[band * rows:(band + 1) * rows].tobytes()].append(idx)
+
+    candidates = set()
+    for table in buckets:
+        for members in table.values():
+            if len(members) > 1:
+                for pos, i in enumerate(members):
+                    for j in members[pos + 1:]:
+                        candidates.add((i, j))
+
+    pairs = []
+    for i, j in sorted(candidates):
+        a, b = shingle_sets[i], shingle_sets[j]
+        jac = len(a & b) / len(a | b)
+        if jac >= threshold:
+            pairs.append((i, j, jac))
+    return pairs
+
+def dedupe_corpus(threshold: float = DEFAULT_THRESHOLD, scope: str = "coach") -> Dict:
+    docs = load_corpus()
+    pairs = find_near_duplicates([d.get("text", "") for d in docs], threshold)
+
+    # scope decides which pairs may drop a chunk; the report still lists every cluster
+    uf_all, uf_drop = UnionFind(len(docs)), UnionFind(len(docs))
+    for i, j, _ in pairs:
+        uf_all.union(i, j)
+        if scope == "global" or docs[i]["coach"] == docs[j]["coach"]:
+            uf_drop.union(i, j)
+
+    best_sim: Dict[int, float] = {}
+    for i, j, jac in pairs:
+        best_sim[j] = max(best_sim.get(j, 0.0), jac)
+
+    clusters = defaultdict(list)
+    for idx in range(len(docs)):
+        clusters[uf_all.find(idx)].append(idx)
+
+    def ref(idx):
+        d = docs[idx]
+        return {"coach": d["coach"], "source": d.get("source"), "chunk_id": d.get("chunk_id")}
+
+    report_clusters = []
+    for root, members in sorted(clusters.items()):
+        if len(members) < 2:
+            continue
+        report_clusters.append({
+            "kept": ref(root),
+            "members": [dict(ref(m), jaccard=round(best_sim.get(m, 1.0), 4),
+                             dropped=uf_drop.find(m) != m, cross_coach=docs[m]["coach"] != docs[root]["coach"])
+                        for m in members if m != root],
+        })
+
+    kept_by_coach = defaultdict(list)
+    dropped = 0
+    for idx, d in enumerate(docs):
+        if uf_drop.find(idx) == idx:
+            kept_by_coach[d["coach"]].append(d)
+        else:
+            dropped += 1
+
+    for coach in sorted({d["coach"] for d in docs}):
+        out = PROCESSED_ROOT / coach / ("chunks" + OUT_SUFFIX)
+        with out.open("w", encoding="utf-8") as fout:
+            for obj in kept_by_coach.get(coach, []):
+                fout.write(json.dumps(obj, ensure_ascii=False) + "\n")
+        print("Wrote deduped:", out, f"({len(kept_by_coach.get(coach, []))} chunks)")
 
-def dedupe_coach(coach):
-    f = PROCESSED_ROOT / coach / "chunks.jsonl"
-    if not f.exists():
-        print("No chunks for", coach); return
-    seen = set()
-    out = PROCESSED_ROOT / coach / ("chunks"+OUT_SUFFIX)
-    with f.open("r", encoding="utf-8") as fin, out.open("w", encoding="utf-8") as fout:
-        for line in fin:
-            obj = json.loads(line)
-            key = obj["text"].strip()[:300]  # first 300 chars
-            if key in seen:
-                continue
-            seen.add(key)
-            fout.write(json.dumps(obj, ensure_ascii=False) + "\n")
-    print("Wrote deduped:", out)
+    report = {
+        "threshold": threshold,
+        "scope": scope,
+        "num_perm": NUM_PERM,
+        "bands_rows": list(optimal_bands(threshold, NUM_PERM)),
+        "total_chunks": len(docs),
+        "dropped_chunks": dropped,
+        "clusters": report_clusters,
+    }
+    REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    REPORT_PATH.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"Dropped {dropped}/{len(docs)} near-duplicate chunks in {len(report_clusters)} clusters. Report: {REPORT_PATH}")
+    return report
 
 if __name__ == "__main__":
-    for d in PROCESSED_ROOT.iterdir():
-        if d.is_dir():
-            dedupe_coach(d.name)
+    ap = argparse.ArgumentParser(description="MinHash/LSH near-duplicate removal for processed chunks.")
+    ap.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Jaccard similarity at/above which chunks are duplicates")
+    ap.add_argument("--scope", choices=["coach", "global"], default="coach", help="drop duplicates only within a coach, or across coaches too")
+    args = ap.parse_args()
+    dedupe_corpus(args.threshold, args.scope)
@@ -0,0 +1,32 @@
+# scripts/export_numpy_index.py
+"""
+Export each coach collection from chroma_persist into a memory-mappable NumPy index
+(see src/numpy_index.py). Retrieval uses it when RETRIEVER=numpy.
+
+Usage:
+    python scripts/export_numpy_index.py [coach ...]
+"""
+import sys
+import time
+from pathlib import Path
+
+# Add project root to sys.path so we can import src
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.numpy_index import INDEX_ROOT, export_collection
+from src.embedding_backends import backend_name, collection_name
+
+PERSIST_DIR = "chroma_persist"
+COACHES = ["alex_hormozi", "dan_martell", "sam_ovens"]
+
+if __name__ == "__main__":
+    coaches = sys.argv[1:] or COACHES
+    backend = backend_name()
+    for coach in coaches:
+        name = collection_name(coach, backend)
+        t0 = time.time()
+        try:
+            out = export_collection(PERSIST_DIR, name, INDEX_ROOT)
+            print(f"Exported '{name}' -> {out} in {time.time() - t0:.2f}s")
+        except Exception as e:
+            print(f"Export failed for '{name}': {e}")
@@ -1,24 +1,50 @@
 # scripts/extract_latest_report.py
+"""
+Write the newest run's final_report to data/metadata/latest_final_report.json.
+
+Reads one record through the run store index (data/metadata/runs/, RUN_STORE_DIR). Given a
+flat JSONL file instead, only its last line is read (seeking back from the end of the file).
+
+Usage:
+    python scripts/extract_latest_report.py [--runs data/metadata/runs.jsonl]
+"""
+import sys
 import json
+import argparse
 from pathlib import Path
 
-runs_file = Path("data/metadata/runs.jsonl")
-if not runs_file.exists():
-    print("No runs.jsonl found")
-    exit(1)
-
-lines = runs_file.read_text(encoding="utf-8").strip().split("\n")
-latest = None
-for line in reversed(lines):
-    if line.strip():
-        latest = json.loads(line)
-        break
-
-if not latest:
-    print("No valid runs found")
-    exit(1)
-
-output_path = Path("data/metadata/latest_final_report.json")
-output_path.write_text(json.dumps(latest["final_report"], indent=2, ensure_ascii=False), encoding="utf-8")
-print(f"Extracted latest report to: {output_path}")
-print(f"Thread ID: {latest['thread_id']}")
+# Add project root to sys.path so we can import src
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.run_store import default_run_store, read_tail
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Extract the latest run's final report.")
+    ap.add_argument("--runs", default=None, help="flat runs JSONL to read instead of the run store")
+    args = ap.parse_args()
+
+    if args.runs:
+        runs_file = Path(args.runs)
+        if not runs_file.exists():
+            print(f"No {runs_file} found")
+            exit(1)
+        tail = read_tail(runs_file, 1)
+        latest = json.loads(tail[0]) if tail else None
+    else:
+        store = default_run_store()
+        found = store.latest(1)
+        latest = found[0] if found else None
+
+    if not latest:
+        print("No valid runs found")
+        exit(1)
+
+    output_path = Path("data/metadata/latest_final_report.json")
+    output_path.write_text(json.dumps(latest["final_report"], indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"Extracted latest report to: {output_path}")
+    print(f"Thread ID: {latest['thread_id']}")
+
+
+if __name__ == "__main__":
+    main()
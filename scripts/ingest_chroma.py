@@ -1,16 +1,25 @@
 # scripts/ingest_chroma.py
 import os
+import sys
 import json
-import time
+import hashlib
 import inspect
 from pathlib import Path
 from dotenv import load_dotenv
 
+# Add project root to sys.path so we can import src
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.embedding_pipeline import EmbeddingPipeline
+from src.embedding_backends import backend_name, collection_name, get_embedding_backend
+from src.lexical_index import CHUNK_STAT_FIELDS
+
 load_dotenv()
 
 OPENAI_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_KEY:
-    raise SystemExit("Set OPENAI_API_KEY in your .env before running this script.")
+EMBEDDING_BACKEND = backend_name()
+if EMBEDDING_BACKEND == "openai" and not OPENAI_KEY:
+    raise SystemExit("Set OPENAI_API_KEY in your .env before running this script (or set EMBEDDING_BACKEND=local|hashing).")
 
 # Try imports in order of modern -> community -> fallback
 EmbeddingClass = None
@@ -46,137 +55,179 @@ except Exception:
 PROCESSED_ROOT = Path("data/processed")
 PERSIST_DIR = "chroma_persist"
 BATCH_SIZE = 128
-SLEEP_BETWEEN_BATCHES = 1.0
+# Embedding throughput: several requests in flight, bounded by the provider's per-minute limits
+MAX_IN_FLIGHT = int(os.getenv("EMBED_MAX_IN_FLIGHT", 4))
+EMBED_RPM = float(os.getenv("EMBED_RPM", 3000))
+EMBED_TPM = float(os.getenv("EMBED_TPM", 1_000_000))
+
+def chunk_content_hash(text: str, metadata: dict) -> str:
+    """Stable document id: sha256 over the chunk text and its metadata."""
+    blob = json.dumps({"text": text, "metadata": metadata}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
 
 def read_chunks(chunks_file: Path):
-    texts = []
-    metadatas = []
+    """
+    Returns (ids, texts, metadatas) with content-hash ids; duplicate chunks collapse to one id.
+    Precomputed chunk stats (token_count, offsets, text_hash) go into the metadata but not the id,
+    so chunks from before they existed are not re-embedded.
+    """
+    ids, texts, metadatas = [], [], []
+    seen = set()
     with chunks_file.open("r", encoding="utf-8") as f:
         for line in f:
+            if not line.strip():
+                continue
             obj = json.loads(line)
-            texts.append(obj.get("text", ""))
-            metadatas.append({
+            text = obj.get("text", "")
+            meta = {
                 "source": obj.get("source"),
                 "coach": obj.get("coach"),
                 "chunk_id": obj.get("chunk_id"),
-            })
-    return texts, metadatas
+            }
+            doc_id = chunk_content_hash(text, meta)
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+            ids.append(doc_id)
+            texts.append(text)
+            stats = {k: obj[k] for k in CHUNK_STAT_FIELDS if obj.get(k) is not None}
+            metadatas.append(dict(meta, content_hash=doc_id, **stats))
+    return ids, texts, metadatas
+
+def pick_chunks_file(coach_dir: Path):
+    """Prefer the near-duplicate-filtered chunks (scripts/dedupe_chunks.py) unless they are older than chunks.jsonl."""
+    raw = coach_dir / "chunks.jsonl"
+    dedup = coach_dir / "chunks_dedup.jsonl"
+    if dedup.exists() and (not raw.exists() or dedup.stat().st_mtime >= raw.stat().st_mtime):
+        print(f"[{coach_dir.name}] using {dedup.name}")
+        return dedup
+    if dedup.exists():
+        print(f"[{coach_dir.name}] {dedup.name} is older than {raw.name}; re-run scripts/dedupe_chunks.py. Using {raw.name}.")
+    return raw if raw.exists() else None
 
 def chunked_iter(lst, n):
     for i in range(0, len(lst), n):
         yield lst[i:i+n]
 
-def ingest_collection(coach_name: str, texts: list, metadatas: list, emb_instance):
+def open_collection(coach_name: str, emb_instance):
     """
-    Call ChromaClass.from_texts in a way that adapts to different versions'
-    expected parameter names for the embedding object.
+    Construct a Chroma instance for one collection, adapting to the constructor
+    parameter names of different langchain versions.
     """
-    print(f"Ingesting {len(texts)} docs into collection '{coach_name}' (persist dir: {PERSIST_DIR})")
-
-    # Inspect the signature of from_texts if present
-    from_texts = getattr(ChromaClass, "from_texts", None)
-    tried = []
-
-    if callable(from_texts):
-        sig = inspect.signature(from_texts)
-        params = sig.parameters
-        # choose embedding arg name
-        embed_arg = None
-        for candidate in ("embeddings", "embedding_function", "embedding"):
-            if candidate in params:
-                embed_arg = candidate
-                break
-
-        kwargs = {
-            "texts": texts,
-            "metadatas": metadatas,
-            "collection_name": coach_name,
-            "persist_directory": PERSIST_DIR
-        }
-
-        # If embed_arg found, supply embedding instance under that name
-        if embed_arg:
-            kwargs[embed_arg] = emb_instance
-            tried.append(f"from_texts with arg '{embed_arg}'")
-            try:
-                ChromaClass.from_texts(**kwargs)
-                print(f"Finished ingesting collection '{coach_name}' using from_texts({embed_arg}=...)")
-                return
-            except TypeError as e:
-                print(f"from_texts TypeError with '{embed_arg}':", e)
-            except Exception as e:
-                print(f"from_texts error with '{embed_arg}':", e)
-
-        # Try without embedding param (some versions infer embeddings differently)
-        tried.append("from_texts without explicit embedding arg")
-        try:
-            # remove embedding if present
-            ChromaClass.from_texts(texts=texts, metadatas=metadatas, collection_name=coach_name, persist_directory=PERSIST_DIR)
-            print(f"Finished ingesting collection '{coach_name}' using from_texts() without explicit embedding param")
-            return
-        except Exception as e:
-            print("from_texts fallback failed:", e)
-
-    # As a last resort, try to construct the ChromaClass then add documents through its instance API
-    print("Falling back to instance-based ingestion (construct Chroma then add documents). Tried:", tried)
+    init_params = inspect.signature(ChromaClass).parameters
+    init_kwargs = {"persist_directory": PERSIST_DIR, "collection_name": collection_name(coach_name, EMBEDDING_BACKEND)}
+    if "embedding_function" in init_params:
+        init_kwargs["embedding_function"] = emb_instance
+    elif "embeddings" in init_params:
+        init_kwargs["embeddings"] = emb_instance
+    return ChromaClass(**init_kwargs)
+
+def existing_ids(vect) -> set:
     try:
-        # Find constructor params and try safe init
-        init_sig = inspect.signature(ChromaClass)
-        init_params = init_sig.parameters
-        init_kwargs = {}
-        # common constructor args: persist_directory, collection_name, embedding_function
-        if "persist_directory" in init_params:
-            init_kwargs["persist_directory"] = PERSIST_DIR
-        if "collection_name" in init_params:
-            init_kwargs["collection_name"] = coach_name
-        if "embedding_function" in init_params:
-            init_kwargs["embedding_function"] = emb_instance
-        elif "embeddings" in init_params:
-            init_kwargs["embeddings"] = emb_instance
-        # create instance
-        chroma_inst = ChromaClass(**init_kwargs)
-        # Try instance.add_texts / add_documents / upsert - try common methods
-        if hasattr(chroma_inst, "add_texts"):
-            chroma_inst.add_texts(texts=texts, metadatas=metadatas)
-            print(f"Used chroma_inst.add_texts for '{coach_name}'")
-            return
-        elif hasattr(chroma_inst, "add_documents"):
-            chroma_inst.add_documents(documents=texts, metadatas=metadatas)
-            print(f"Used chroma_inst.add_documents for '{coach_name}'")
-            return
-        elif hasattr(chroma_inst, "upsert"):
-            chroma_inst.upsert(documents=texts, metadatas=metadatas)
-            print(f"Used chroma_inst.upsert for '{coach_name}'")
-            return
-        else:
-            raise RuntimeError("No known instance ingestion method found on ChromaClass instance.")
-    except Exception as e:
-        print("Final fallback ingestion attempt failed:", e)
-        raise
+        got = vect.get(include=[])
+    except TypeError:
+        got = vect.get()
+    return set(got.get("ids", []))
+
+def plan_sync(ids: list, current: set):
+    """Returns (new_positions, stale_ids): which source chunks to embed and which stored docs to drop."""
+    wanted = set(ids)
+    new_positions = [i for i, doc_id in enumerate(ids) if doc_id not in current]
+    stale_ids = sorted(current - wanted)
+    return new_positions, stale_ids
+
+def backfill_metadata(vect, ids: list, metadatas: list, positions: list) -> int:
+    """
+    Metadata-only update for already-stored chunks whose stored metadata differs from the source
+    (e.g. stats added by a newer preprocess run). No re-embedding. Returns the number updated.
+    """
+    collection = getattr(vect, "_collection", None)
+    if collection is None or not hasattr(collection, "update"):
+        return 0
+    updated = 0
+    for batch in chunked_iter(positions, BATCH_SIZE):
+        batch_ids = [ids[j] for j in batch]
+        got = collection.get(ids=batch_ids, include=["metadatas"])
+        stored = dict(zip(got.get("ids", []), got.get("metadatas") or []))
+        changed = [j for j in batch if stored.get(ids[j]) != metadatas[j]]
+        if changed:
+            collection.update(ids=[ids[j] for j in changed], metadatas=[metadatas[j] for j in changed])
+            updated += len(changed)
+    return updated
+
+def make_writer(vect):
+    """Persist precomputed vectors; falls back to add_texts (which re-embeds) on stores without a raw collection."""
+    collection = getattr(vect, "_collection", None)
+    if collection is not None and hasattr(collection, "upsert"):
+        def write(ids, vectors, texts, metas):
+            collection.upsert(ids=ids, embeddings=vectors, documents=texts, metadatas=metas)
+        return write
+
+    def write(ids, vectors, texts, metas):
+        vect.add_texts(texts=texts, metadatas=metas, ids=ids)
+    return write
+
+def ingest_collection(coach_name: str, ids: list, texts: list, metadatas: list, emb_instance, embed_fn=None):
+    """
+    Sync one collection with its chunks.jsonl using content-hash ids:
+    unchanged chunks are skipped, new/changed chunks are embedded and upserted,
+    and documents whose chunk disappeared from the source are deleted.
+    embed_fn overrides emb_instance.embed_documents (e.g. a fake embedder in tests).
+    """
+    vect = open_collection(coach_name, emb_instance)
+    current = existing_ids(vect)
+    new_positions, stale_ids = plan_sync(ids, current)
+    print(f"[{coach_name}] source={len(ids)} stored={len(current)} "
+          f"unchanged={len(ids) - len(new_positions)} to_embed={len(new_positions)} to_delete={len(stale_ids)}")
+
+    if new_positions:
+        batches = (
+            ([ids[j] for j in batch], [texts[j] for j in batch], [metadatas[j] for j in batch])
+            for batch in chunked_iter(new_positions, BATCH_SIZE)
+        )
+        pipeline = EmbeddingPipeline(
+            embed_fn=embed_fn or emb_instance.embed_documents,
+            write_fn=make_writer(vect),
+            max_in_flight=MAX_IN_FLIGHT,
+            rpm=EMBED_RPM,
+            tpm=EMBED_TPM,
+        )
+        stats = pipeline.run(batches)
+        print(f"[{coach_name}] upserted {stats['written']} docs in {stats['batches']} batches "
+              f"(~{stats['tokens']} tokens, {stats['rate_limited']} rate-limit retries)")
+
+    new_set = set(new_positions)
+    unchanged = [j for j in range(len(ids)) if j not in new_set and any(k in metadatas[j] for k in CHUNK_STAT_FIELDS)]
+    if unchanged:
+        n = backfill_metadata(vect, ids, metadatas, unchanged)
+        if n:
+            print(f"[{coach_name}] refreshed metadata on {n} unchanged documents")
+
+    for batch in chunked_iter(stale_ids, BATCH_SIZE):
+        vect.delete(ids=batch)
+    if stale_ids:
+        print(f"[{coach_name}] deleted {len(stale_ids)} stale documents")
 
 def main():
-    emb = EmbeddingClass(openai_api_key=OPENAI_KEY)
+    emb = get_embedding_backend(EMBEDDING_BACKEND, openai_class=EmbeddingClass, openai_api_key=OPENAI_KEY)
+    print(f"Embedding backend: {EMBEDDING_BACKEND}")
     if not PROCESSED_ROOT.exists():
         raise SystemExit(f"No processed files found at {PROCESSED_ROOT}. Run preprocessing first.")
 
     for coach_dir in sorted(PROCESSED_ROOT.iterdir()):
         if not coach_dir.is_dir():
             continue
-        chunks_file = coach_dir / "chunks.jsonl"
-        if not chunks_file.exists():
+        chunks_file = pick_chunks_file(coach_dir)
+        if chunks_file is None:
             print(f"No chunks.jsonl for coach '{coach_dir.name}', skipping.")
             continue
 
-        texts, metadatas = read_chunks(chunks_file)
+        ids, texts, metadatas = read_chunks(chunks_file)
         if not texts:
-            print(f"No text chunks found in {chunks_file}, skipping.")
-            continue
+            # still sync so documents from a now-empty source get removed
+            print(f"No text chunks found in {chunks_file}.")
 
-        # ingest in batches
-        for i, (tb, mb) in enumerate(zip(chunked_iter(texts, BATCH_SIZE), chunked_iter(metadatas, BATCH_SIZE)), start=1):
-            print(f"[{coach_dir.name}] ingesting batch {i} (size={len(tb)})")
-            ingest_collection(coach_dir.name, tb, mb, emb)
-            time.sleep(SLEEP_BETWEEN_BATCHES)
+        ingest_collection(coach_dir.name, ids, texts, metadatas, emb)
 
     print("All ingestions complete. Chroma persisted at:", PERSIST_DIR)
 
@@ -1,49 +1,224 @@
 # scripts/preprocess_and_chunk.py
+import os
 import re, json
+import hashlib
+import functools
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
 import tiktoken
 
 RAW_ROOT = Path("data/raw")
 PROCESSED_ROOT = Path("data/processed")
 MODEL_FOR_TOKENIZER = "gpt-3.5-turbo"
+MAX_TOKENS = 450
+OVERLAP_TOKENS = 80
+# characters read per streaming block; bounds memory regardless of transcript size
+BLOCK_CHARS = 1_000_000
+# tokens at the end of each encoded block that are re-encoded with the next block,
+# so BPE merges across the block boundary come out the same as encoding the whole text
+HOLDBACK_TOKENS = 16
+MAX_WORKERS = int(os.getenv("CHUNK_WORKERS", os.cpu_count() or 1))
+
+_TIMESTAMP_RE = re.compile(r"\[?\d{1,2}:\d{2}(?::\d{2})?\]?")
+_WS_NEWLINE_RE = re.compile(r"\s+\n\s+")
+_MULTI_NEWLINE_RE = re.compile(r"\n{2,}")
+
+@functools.lru_cache(maxsize=None)
+def get_encoder():
+    """Tokenizer is built once per process."""
+    if hasattr(tiktoken, "encoding_for_model"):
+        return tiktoken.encoding_for_model(MODEL_FOR_TOKENIZER)
+    return tiktoken.get_encoding("cl100k_base")
+
+def _clean_whitespace(s: str) -> str:
+    s = _WS_NEWLINE_RE.sub("\n", s)
+    s = _MULTI_NEWLINE_RE.sub("\n\n", s)
+    return s
 
 def clean_text(s: str) -> str:
-    s = re.sub(r"\[?\d{1,2}:\d{2}(?::\d{2})?\]?", " ", s)
-    s = re.sub(r"\s+\n\s+", "\n", s)
-    s = re.sub(r"\n{2,}", "\n\n", s)
-    return s.strip()
-
-def chunk_text_tokens(text: str, max_tokens: int=450, overlap_tokens: int=80):
-    enc = tiktoken.encoding_for_model(MODEL_FOR_TOKENIZER) if hasattr(tiktoken, "encoding_for_model") else tiktoken.get_encoding("cl100k_base")
-    toks = enc.encode(text)
-    chunks = []
-    i = 0
-    L = len(toks)
-    while i < L:
-        j = min(i + max_tokens, L)
-        chunk = enc.decode(toks[i:j])
-        chunks.append(chunk.strip())
-        i += max_tokens - overlap_tokens
-    return chunks
-
-def process_all():
+    s = _TIMESTAMP_RE.sub(" ", s)
+    return _clean_whitespace(s).strip()
+
+def iter_clean_blocks(lines: Iterable[str], block_chars: int = BLOCK_CHARS) -> Iterator[str]:
+    """
+    Streaming clean_text: yields cleaned pieces whose concatenation equals clean_text(whole input).
+    Timestamps never span lines, and every block is cut after its last non-whitespace character
+    (the whitespace tail is carried into the next block), so the whitespace rules see each run intact.
+    """
+    carry = ""
+    buf: List[str] = []
+    size = 0
+    first = True
+
+    def emit(text: str, final: bool) -> Tuple[str, str]:
+        nonlocal first
+        text = carry + text
+        if final:
+            head, tail = text, ""
+        else:
+            stripped = text.rstrip()
+            head, tail = stripped, text[len(stripped):]
+        out = _clean_whitespace(head)
+        if first:
+            out = out.lstrip()
+            if out:
+                first = False
+        if final:
+            out = out.rstrip()
+        return out, tail
+
+    for line in lines:
+        buf.append(_TIMESTAMP_RE.sub(" ", line))
+        size += len(line)
+        if size >= block_chars:
+            out, carry = emit("".join(buf), final=False)
+            buf, size = [], 0
+            if out:
+                yield out
+    out, carry = emit("".join(buf), final=True)
+    if out:
+        yield out
+
+def iter_tokens(blocks: Iterable[str]) -> Iterator[List[int]]:
+    """Encode text blocks incrementally, holding back a few tokens so merges across blocks match a one-shot encode."""
+    enc = get_encoder()
+    pending = ""
+    for block in blocks:
+        pending += block
+        toks = enc.encode(pending)
+        # cut just before a token that starts with ASCII whitespace: that is a clean pre-tokenizer
+        # boundary and a clean UTF-8 boundary, so the held-back text can be re-encoded with the next block
+        cut = len(toks) - HOLDBACK_TOKENS
+        while cut > 0 and enc.decode_single_token_bytes(toks[cut])[:1] not in (b" ", b"\n", b"\t", b"\r"):
+            cut -= 1
+        if cut <= 0:
+            continue
+        committed = toks[:cut]
+        pending = pending[len(enc.decode_bytes(committed).decode("utf-8")):]
+        yield committed
+    if pending:
+        yield enc.encode(pending)
+
+def iter_token_windows(token_blocks: Iterable[List[int]], max_tokens: int = MAX_TOKENS, overlap_tokens: int = OVERLAP_TOKENS) -> Iterator[Tuple[int, int, List[int]]]:
+    """
+    Sliding windows over a token stream: yields (start, end, tokens) exactly like slicing
+    toks[i:i+max_tokens] for i = 0, stride, 2*stride, ... while i < total, without holding the full list.
+    """
+    stride = max_tokens - overlap_tokens
+    buf: List[int] = []
+    buf_start = 0  # absolute index of buf[0]
+    i = 0          # absolute start of the next window
+    for block in token_blocks:
+        buf.extend(block)
+        while i + max_tokens <= buf_start + len(buf):
+            lo = i - buf_start
+            yield i, i + max_tokens, buf[lo:lo + max_tokens]
+            i += stride
+            drop = min(i - buf_start, len(buf))
+            if drop > 0:
+                del buf[:drop]
+                buf_start += drop
+    total = buf_start + len(buf)
+    while i < total:
+        lo = i - buf_start
+        j = min(i + max_tokens, total)
+        yield i, j, buf[lo:lo + (j - i)]
+        i += stride
+
+def chunk_text_tokens(text: str, max_tokens: int=MAX_TOKENS, overlap_tokens: int=OVERLAP_TOKENS):
+    enc = get_encoder()
+    windows = iter_token_windows(iter_tokens([text]), max_tokens, overlap_tokens)
+    return [enc.decode(toks).strip() for _, _, toks in windows]
+
+_CONTINUATION_BYTES = bytes(range(0x80, 0xC0))
+
+def _token_chars(enc, toks: List[int]) -> int:
+    """Characters spanned by a token run (a character split across tokens counts where it starts)."""
+    return sum(1 for b in enc.decode_bytes(toks) if b & 0xC0 != 0x80)
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def iter_file_chunks(path: Path, max_tokens: int = MAX_TOKENS, overlap_tokens: int = OVERLAP_TOKENS) -> Iterator[Dict[str, Any]]:
+    """
+    Chunk one transcript without materializing its full text or token list.
+    Yields {"text", "token_count", "token_start", "token_end", "char_start", "char_end", "text_hash"};
+    offsets index the cleaned text, so cleaned[char_start:char_end] == text (apart from a character
+    split by a window edge, which decodes as U+FFFD).
+    """
+    enc = get_encoder()
+    prev_start, prev_toks, prev_char = 0, [], 0
+    with path.open("r", encoding="utf-8") as fh:
+        blocks = iter_clean_blocks(fh)
+        for start, end, toks in iter_token_windows(iter_tokens(blocks), max_tokens, overlap_tokens):
+            # windows advance by less than their length, so the previous window covers the step
+            char_start = prev_char + _token_chars(enc, prev_toks[:start - prev_start])
+            prev_start, prev_toks, prev_char = start, toks, char_start
+            data = enc.decode_bytes(toks)
+            # continuation bytes of a character split by the window edge each decode to one U+FFFD;
+            # shift left so text[i] lines up with cleaned[char_start + i]
+            orphans = len(data) - len(data.lstrip(_CONTINUATION_BYTES))
+            raw = data.decode("utf-8", errors="replace")
+            text = raw.strip()
+            lead = len(raw) - len(raw.lstrip()) - orphans
+            yield {
+                "text": text,
+                "token_count": len(enc.encode(text)),
+                "token_start": start,
+                "token_end": end,
+                "char_start": char_start + lead,
+                "char_end": char_start + lead + len(text),
+                "text_hash": text_hash(text),
+            }
+
+def _chunk_file_to_part(args: Tuple[str, str, str]) -> Tuple[str, int]:
+    """Worker: chunk one file into its own part file. Returns (part_path, n_chunks)."""
+    txt_path, coach, part_path = args
+    txt = Path(txt_path)
+    n = 0
+    with open(part_path, "w", encoding="utf-8") as fout:
+        for idx, c in enumerate(iter_file_chunks(txt)):
+            doc = {"text": c.pop("text"), "source": str(txt.name), "coach": coach, "chunk_id": idx, **c}
+            fout.write(json.dumps(doc, ensure_ascii=False) + "\n")
+            n += 1
+    return part_path, n
+
+def process_all(max_workers: int = MAX_WORKERS):
     PROCESSED_ROOT.mkdir(parents=True, exist_ok=True)
-    for coach_dir in RAW_ROOT.iterdir():
+    jobs = []  # (coach, out_file, [(txt, coach, part)])
+    for coach_dir in sorted(RAW_ROOT.iterdir()):
         if not coach_dir.is_dir():
             continue
         out_dir = PROCESSED_ROOT / coach_dir.name
-        out_dir.mkdir(parents=True, exist_ok=True)
-        out_file = out_dir / "chunks.jsonl"
-        print("Processing coach:", coach_dir.name)
+        parts_dir = out_dir / ".parts"
+        parts_dir.mkdir(parents=True, exist_ok=True)
+        files = [(str(txt), coach_dir.name, str(parts_dir / f"{i:05d}.jsonl"))
+                 for i, txt in enumerate(sorted(coach_dir.glob("*.txt")))]
+        jobs.append((coach_dir.name, out_dir / "chunks.jsonl", files))
+
+    all_files = [f for _, _, files in jobs for f in files]
+    print(f"Chunking {len(all_files)} files from {len(jobs)} coaches with {max_workers} workers")
+    if max_workers > 1 and len(all_files) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            counts = dict(pool.map(_chunk_file_to_part, all_files))
+    else:
+        counts = dict(_chunk_file_to_part(f) for f in all_files)
+
+    # stitch parts back together in sorted file order so output is deterministic
+    for coach, out_file, files in jobs:
+        print("Processing coach:", coach)
         with out_file.open("w", encoding="utf-8") as fout:
-            for txt in sorted(coach_dir.glob("*.txt")):
-                raw = txt.read_text(encoding="utf-8")
-                cleaned = clean_text(raw)
-                chunks = chunk_text_tokens(cleaned)
-                for idx, c in enumerate(chunks):
-                    doc = {"text": c, "source": str(txt.name), "coach": coach_dir.name, "chunk_id": idx}
-                    fout.write(json.dumps(doc, ensure_ascii=False) + "\n")
-        print("Wrote chunks to:", out_file)
+            for _, _, part in files:
+                with open(part, "r", encoding="utf-8") as fin:
+                    for line in fin:
+                        fout.write(line)
+                os.remove(part)
+        try:
+            (out_file.parent / ".parts").rmdir()
+        except OSError:
+            pass
+        print(f"Wrote {sum(counts[p] for _, _, p in files)} chunks to:", out_file)
 
 if __name__ == "__main__":
     process_all()
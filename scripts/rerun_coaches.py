@@ -0,0 +1,69 @@
+# scripts/rerun_coaches.py
+"""
+Re-run only some coaches of an earlier run, then re-merge the final report.
+
+The run's state comes from the checkpointer (CHECKPOINTER=sqlite) when the thread is there,
+otherwise from its latest record in the run store (data/metadata/runs/, RUN_STORE_DIR). By default the coaches whose
+analysis failed to parse are re-run; pass --coach to pick them explicitly.
+
+Usage:
+    python scripts/rerun_coaches.py <thread_id> [--coach sam_ovens --coach dan_martell]
+"""
+import sys
+import json
+import argparse
+from pathlib import Path
+
+# Add project root to sys.path so we can import src
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.business_consultant_graph import (
+    build_graph,
+    failed_coaches,
+    rerun_coaches,
+    rerun_session_coaches,
+    session_status,
+    state_from_final_report,
+)
+from src.run_store import default_run_store
+
+OUT_DIR = Path("data/metadata")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Re-run selected coaches of an existing run and re-merge its report.")
+    ap.add_argument("thread_id")
+    ap.add_argument("--coach", action="append", help="coach to re-run (repeatable); default: coaches whose analysis failed")
+    args = ap.parse_args()
+
+    graph, _ = build_graph()
+    store = default_run_store()
+    if session_status(graph, args.thread_id)["exists"]:
+        print(f"Loaded thread {args.thread_id} from the checkpointer")
+        coaches = args.coach or failed_coaches(graph.get_state({"configurable": {"thread_id": args.thread_id}}).values)
+        state = rerun_session_coaches(graph, args.thread_id, coaches)
+    else:
+        rec = store.get(args.thread_id)
+        if rec is None:
+            raise SystemExit(f"No checkpoint or {store.root} record for thread '{args.thread_id}'")
+        print(f"Loaded thread {args.thread_id} from {store.root}")
+        prior = state_from_final_report(rec.get("final_report", {}))
+        coaches = args.coach or failed_coaches(prior)
+        state = rerun_coaches(prior, coaches)
+
+    if not coaches:
+        print("No failed coaches; report re-merged unchanged.")
+    else:
+        print("Re-ran:", ", ".join(coaches))
+
+    fr = state.get("final_report", {})
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    fr_path = OUT_DIR / f"final_report_{args.thread_id}.json"
+    fr_path.write_text(json.dumps(fr, indent=2, ensure_ascii=False), encoding="utf-8")
+    store.append({"thread_id": args.thread_id, "final_report": fr, "rerun_coaches": coaches})
+    store.close()
+    print(f"Saved final report to: {fr_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,66 +1,70 @@
 # scripts/step10_evaluate.py
 """
-Step 10 evaluation harness (minimal, non-invasive).
-Runs a few test scenarios through your graph (build_graph in src/business_consultant_graph.py),
-validates final_report using src/validate_report.validate_final_report(),
-and writes an evaluation summary to data/metadata/eval_results.json.
+Step 10 evaluation harness.
+Runs scenarios concurrently against one compiled (async) graph, repeats each one N times,
+validates every final_report with src/validate_report.validate_final_report() and aggregates
+latency percentiles, validation pass rates, provenance counts, token usage (from the
+src/tracing.py spans of each run) and coach parse-failure / repair rates into
+data/metadata/eval_results_<ts>.json.
 
-This script makes NO changes to your core source files.
+With --baseline the summary is diffed against a stored result; slower p95, more tokens per run,
+a lower pass rate or fewer provenance items beyond the tolerances exit 1.
+
+Usage:
+    python scripts/step10_evaluate.py [--scenarios data/eval/scenarios.json ...] [--workers 4] [--repeats 3]
+        [--baseline data/eval/baseline.json] [--save-baseline] [--fake-llm]
+
+Scenario files are a JSON list or JSONL of {name, business_description, goal, kpis}.
 """
 
+import sys
 import json
 import time
 import uuid
-import sys
+import asyncio
+import argparse
+import tempfile
+import traceback
 from pathlib import Path
+from typing import Any, Dict, List
 
 # Add project root to sys.path so we can import src
 sys.path.append(str(Path(__file__).parent.parent))
 
-# Import project pieces (these are local modules you've created)
-# They must be on the PYTHONPATH when running from repo root (default).
-from src.business_consultant_graph import build_graph
-try:
-    from src.validate_report import validate_final_report
-except Exception:
-    # If validate_report isn't present, use a no-op validator that returns no errors
-    def validate_final_report(rep):
-        return []
-
-# --- test scenarios: keep these minimal; you can edit/add more later ---
-TEST_SCENARIOS = [
-    {
-        "name": "diaper_manufacturing",
-        "business_description": "Diaper manufacturing business with moderate local sales and high production costs.",
-        "goal": "Get profitable in 6 months",
-        "kpis": {"production_cost_per_unit": None, "revenue": None}
-    },
-    {
-        "name": "local_coaching_saas",
-        "business_description": "Bootstrapped coaching SaaS selling monthly subscriptions to coaches.",
-        "goal": "Double monthly recurring revenue in 6 months",
-        "kpis": {}
-    },
-    {
-        "name": "small_retail_chain",
-        "business_description": "3-store retail chain with inconsistent inventory and declining footfall.",
-        "goal": "Increase same-store sales by 20% in 3 months",
-        "kpis": {"conversion_rate": None}
-    }
-]
+import src.business_consultant_graph as graph_mod
+from src.coach_output import COACH_OUTPUT_METRICS
+from src.tracing import Tracer, load_spans, percentile, summarize
+from src.validate_report import validate_final_report
 
+DEFAULT_SCENARIOS = Path("data/eval/scenarios.json")
+DEFAULT_BASELINE = Path("data/eval/baseline.json")
 OUT_DIR = Path("data/metadata")
-OUT_DIR.mkdir(parents=True, exist_ok=True)
-OUT_PATH = OUT_DIR / f"eval_results_{int(time.time())}.json"
 
-results = []
 
-# Build graph once (reuse ok)
-graph, memory = build_graph()
+def load_scenarios(paths: List[Path]) -> List[Dict[str, Any]]:
+    scenarios = []
+    for path in paths:
+        text = path.read_text(encoding="utf-8").strip()
+        if text.startswith("["):
+            items = json.loads(text)
+        else:
+            items = [json.loads(line) for line in text.splitlines() if line.strip()]
+        for i, sc in enumerate(items):
+            sc.setdefault("name", f"{path.stem}_{i}")
+            scenarios.append(sc)
+    return scenarios
 
-for scenario in TEST_SCENARIOS:
-    run_id = uuid.uuid4().hex[:8]
-    thread = {"configurable": {"thread_id": f"eval-{run_id}"}}
+
+def _provenance_counts(fr: Dict[str, Any]) -> Dict[str, int]:
+    counts = {}
+    for coach, payload in (fr.get("coach_insights") or {}).items():
+        prov = payload.get("provenance") if isinstance(payload, dict) else None
+        counts[coach] = len(prov or [])
+    return counts
+
+
+async def run_one(graph, scenario: Dict[str, Any], repeat: int, out_dir: Path, save_reports: bool) -> Dict[str, Any]:
+    thread_id = f"eval-{uuid.uuid4().hex[:8]}"
     initial_state = {
         "business_description": scenario["business_description"],
         "goal": scenario["goal"],
@@ -70,77 +74,224 @@ for scenario in TEST_SCENARIOS:
 
     entry = {
         "scenario": scenario["name"],
-        "thread_id": thread["configurable"]["thread_id"],
+        "repeat": repeat,
+        "thread_id": thread_id,
         "start_ts": time.time(),
         "ok": False,
+        "valid": False,
         "errors": [],
-        "metrics": {}
+        "metrics": {},
     }
-
-    print(f"\n=== Running scenario: {scenario['name']} (thread {entry['thread_id']}) ===")
+    t0 = time.perf_counter()
     try:
-        final_state = graph.invoke(initial_state, thread)
+        final_state = await graph.ainvoke(initial_state, {"configurable": {"thread_id": thread_id}})
+        entry["latency_ms"] = round((time.perf_counter() - t0) * 1000, 3)
         fr = final_state.get("final_report", {})
 
-        # Defensive fills so validator doesn't crash if keys missing
-        if "business_snapshot" not in fr:
-            fr["business_snapshot"] = {
-                "description": initial_state.get("business_description", ""),
-                "goal": initial_state.get("goal", "")
-            }
-
-        # Validate
         try:
             v_errors = validate_final_report(fr)
         except Exception as e:
             v_errors = [f"validator_exception: {e}"]
 
-        # Basic sanity metrics
-        consensus_b = fr.get("consensus_bottlenecks", [])
-        action_plan = fr.get("action_plan", [])
-        kpis_to_track = fr.get("kpis_to_track", [])
-        proposed_kpis = fr.get("proposed_kpis", [])
-        coach_insights = fr.get("coach_insights", {})
-
-        proof_counts = {}
-        for coach, payload in coach_insights.items():
-            prov = payload.get("provenance") if isinstance(payload, dict) else None
-            if prov is None:
-                # if payload is nested {'analysis':..., 'provenance':...}
-                prov = payload.get("provenance") if isinstance(payload, dict) else []
-            proof_counts[coach] = len(prov or [])
-
-        entry["end_ts"] = time.time()
-        entry["ok"] = len(v_errors) == 0
+        entry["ok"] = True
+        entry["valid"] = len(v_errors) == 0
         entry["errors"] = v_errors
         entry["metrics"] = {
-            "num_consensus_bottlenecks": len(consensus_b),
-            "num_action_plan_items": len(action_plan),
-            "num_kpis_to_track": len(kpis_to_track),
-            "num_proposed_kpis": len(proposed_kpis),
-            "provenance_counts": proof_counts
+            "num_consensus_bottlenecks": len(fr.get("consensus_bottlenecks", [])),
+            "num_action_plan_items": len(fr.get("action_plan", [])),
+            "num_kpis_to_track": len(fr.get("kpis_to_track", [])),
+            "num_proposed_kpis": len(fr.get("proposed_kpis", [])),
+            "provenance_counts": _provenance_counts(fr),
         }
+        if save_reports:
+            fr_file = out_dir / f"final_report_{scenario['name']}_{thread_id}.json"
+            fr_file.write_text(json.dumps(fr, ensure_ascii=False, indent=2), encoding="utf-8")
+            entry["final_report_path"] = str(fr_file)
+    except Exception as exc:
+        entry["latency_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+        entry["errors"].append(f"exception_during_invoke: {exc}")
+        entry["errors"].append(traceback.format_exc()[:1000])
+    entry["end_ts"] = time.time()
+    print(f"[{scenario['name']} #{repeat}] {'valid' if entry['valid'] else 'INVALID' if entry['ok'] else 'FAILED'} "
+          f"in {entry['latency_ms']:.0f}ms")
+    return entry
 
-        # Save a copy of the produced final_report for manual inspection
-        fr_file = OUT_DIR / f"final_report_{scenario['name']}_{entry['thread_id']}.json"
-        fr_file.write_text(json.dumps(fr, ensure_ascii=False, indent=2), encoding="utf-8")
-        entry["final_report_path"] = str(fr_file)
 
-        print("Scenario finished. Validation errors:", v_errors)
-        print("Metrics:", entry["metrics"])
+async def run_all(scenarios, repeats: int, workers: int, out_dir: Path, save_reports: bool) -> List[Dict[str, Any]]:
+    graph, _ = graph_mod.build_async_graph()
+    queue = [(sc, r) for r in range(repeats) for sc in scenarios]
+    queue.reverse()
+    results = []
 
-    except Exception as exc:
-        import traceback as tb
-        entry["end_ts"] = time.time()
-        entry["ok"] = False
-        entry["errors"].append(f"exception_during_invoke: {exc}")
-        entry["errors"].append(tb.format_exc()[:1000])
-        print("Exception during scenario run:", exc)
+    async def worker():
+        while queue:
+            sc, r = queue.pop()
+            results.append(await run_one(graph, sc, r, out_dir, save_reports))
+
+    await asyncio.gather(*[worker() for _ in range(max(1, workers))])
+    return results
+
+
+def _tokens_by_trace(trace_path: Path) -> Dict[str, Dict[str, int]]:
+    tokens: Dict[str, Dict[str, int]] = {}
+    for sp in load_spans(trace_path):
+        if sp.get("stage") in ("llm", "repair") and sp.get("trace_id"):
+            t = tokens.setdefault(sp["trace_id"], {"prompt_tokens": 0, "completion_tokens": 0, "llm_calls": 0})
+            t["prompt_tokens"] += sp.get("prompt_tokens") or 0
+            t["completion_tokens"] += sp.get("completion_tokens") or 0
+            # one "repair" span covers all repair calls of a coach answer; retries is their count
+            t["llm_calls"] += (sp.get("retries") or 0) if sp["stage"] == "repair" else 1
+    return tokens
+
+
+def _latency_stats(values: List[float]) -> Dict[str, float]:
+    values = sorted(values)
+    if not values:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "mean": 0.0, "max": 0.0}
+    return {
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "mean": round(sum(values) / len(values), 3),
+        "max": round(values[-1], 3),
+    }
+
+
+def _aggregate(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    n = len(runs)
+    prov: Dict[str, List[int]] = {}
+    for r in runs:
+        for coach, c in r["metrics"].get("provenance_counts", {}).items():
+            prov.setdefault(coach, []).append(c)
+    tokens = [r.get("tokens", {}) for r in runs]
+    return {
+        "runs": n,
+        "ok_rate": round(sum(r["ok"] for r in runs) / n, 4) if n else 0.0,
+        "pass_rate": round(sum(r["valid"] for r in runs) / n, 4) if n else 0.0,
+        "latency_ms": _latency_stats([r["latency_ms"] for r in runs if r["ok"]]),
+        "mean_provenance": {coach: round(sum(v) / len(v), 3) for coach, v in sorted(prov.items())},
+        "tokens_per_run": {
+            k: round(sum(t.get(k, 0) for t in tokens) / n, 1) if n else 0.0
+            for k in ("prompt_tokens", "completion_tokens", "llm_calls")
+        },
+    }
+
+
+def summarize_runs(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    by_scenario: Dict[str, List[Dict[str, Any]]] = {}
+    for r in runs:
+        by_scenario.setdefault(r["scenario"], []).append(r)
+    return {
+        "overall": _aggregate(runs),
+        "scenarios": {name: _aggregate(rs) for name, rs in sorted(by_scenario.items())},
+    }
+
+
+def diff_against_baseline(summary: Dict[str, Any], baseline: Dict[str, Any], latency_tol: float, token_tol: float,
+                          pass_rate_drop: float, provenance_tol: float = 0.10) -> List[str]:
+    """Regressions of `summary` vs `baseline` (both summarize_runs() output), overall and per shared scenario."""
+    problems = []
+    pairs = [("overall", summary["overall"], baseline.get("overall"))]
+    pairs += [(name, agg, baseline.get("scenarios", {}).get(name)) for name, agg in summary["scenarios"].items()]
+    for label, new, old in pairs:
+        if not old:
+            continue
+        if new["latency_ms"]["p95"] > old["latency_ms"]["p95"] * (1 + latency_tol):
+            problems.append(f"{label}: p95 latency {old['latency_ms']['p95']} -> {new['latency_ms']['p95']} ms")
+        for k in ("prompt_tokens", "completion_tokens"):
+            if new["tokens_per_run"][k] > old["tokens_per_run"][k] * (1 + token_tol):
+                problems.append(f"{label}: {k}/run {old['tokens_per_run'][k]} -> {new['tokens_per_run'][k]}")
+        if new["pass_rate"] < old["pass_rate"] - pass_rate_drop:
+            problems.append(f"{label}: validation pass rate {old['pass_rate']} -> {new['pass_rate']}")
+        for coach, old_mean in old.get("mean_provenance", {}).items():
+            new_mean = new["mean_provenance"].get(coach, 0.0)
+            if new_mean < old_mean * (1 - provenance_tol):
+                problems.append(f"{label}: mean provenance for {coach} {old_mean} -> {new_mean}")
+    return problems
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run evaluation scenarios concurrently and diff against a baseline.")
+    ap.add_argument("--scenarios", action="append", help=f"scenario file (repeatable; default {DEFAULT_SCENARIOS})")
+    ap.add_argument("--workers", type=int, default=4, help="scenario runs in flight")
+    ap.add_argument("--repeats", type=int, default=1, help="runs per scenario")
+    ap.add_argument("--use-llm-cache", action="store_true", help="allow cached LLM answers (repeats then measure the cache)")
+    ap.add_argument("--fake-llm", action="store_true", help="offline run with src/fake_models.py stand-ins (use with EMBEDDING_BACKEND=hashing)")
+    ap.add_argument("--save-reports", action="store_true", help="write each final_report json to data/metadata")
+    ap.add_argument("--baseline", default=None, help=f"summary to diff against (e.g. {DEFAULT_BASELINE})")
+    ap.add_argument("--save-baseline", action="store_true", help=f"store this run's summary as --baseline (default {DEFAULT_BASELINE})")
+    ap.add_argument("--latency-tolerance", type=float, default=0.25, help="allowed relative p95 increase")
+    ap.add_argument("--token-tolerance", type=float, default=0.10, help="allowed relative increase in tokens per run")
+    ap.add_argument("--provenance-tolerance", type=float, default=0.10,
+                    help="allowed relative drop in mean provenance items per coach")
+    ap.add_argument("--pass-rate-drop", type=float, default=0.0, help="allowed absolute drop in validation pass rate")
+    args = ap.parse_args()
+
+    scenarios = load_scenarios([Path(p) for p in (args.scenarios or [DEFAULT_SCENARIOS])])
+    if not scenarios:
+        raise SystemExit("No scenarios to run")
+    if args.fake_llm:
+        from src.fake_models import install_fakes
+        if graph_mod.EMBEDDING_BACKEND != "hashing":
+            print("Warning: --fake-llm embeds with hashing vectors; set EMBEDDING_BACKEND=hashing to match the collections")
+        install_fakes(graph_mod)
+    else:
+        graph_mod.warm_vectorstores()
+    graph_mod.LLM_CACHE.enabled = graph_mod.LLM_CACHE.enabled and args.use_llm_cache
+
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    print(f"Running {len(scenarios)} scenarios x {args.repeats} with {args.workers} workers")
+    with tempfile.TemporaryDirectory() as trace_dir:
+        trace_path = Path(trace_dir) / "spans.jsonl"
+        graph_mod.TRACER = Tracer(trace_path)
+        t0 = time.time()
+        runs = asyncio.run(run_all(scenarios, args.repeats, args.workers, OUT_DIR, args.save_reports))
+        wall = time.time() - t0
+        graph_mod.TRACER.close()
+        tokens = _tokens_by_trace(trace_path)
+        stages = summarize(load_spans(trace_path))
+    for r in runs:
+        r["tokens"] = tokens.get(r["thread_id"], {})
+
+    summary = summarize_runs(runs)
+    result = {
+        "timestamp": time.time(),
+        "config": {"workers": args.workers, "repeats": args.repeats, "scenarios": [s["name"] for s in scenarios],
+                   "fake_llm": args.fake_llm, "llm_cache": graph_mod.LLM_CACHE.enabled},
+        "wall_s": round(wall, 3),
+        "summary": summary,
+        "stages": stages,
+        "coach_output": COACH_OUTPUT_METRICS.snapshot(),
+        "runs": runs,
+    }
+    out_path = OUT_DIR / f"eval_results_{int(result['timestamp'])}.json"
+    out_path.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    overall = summary["overall"]
+    print("\n=== EVALUATION COMPLETE ===")
+    print(f"runs={overall['runs']} pass_rate={overall['pass_rate']} p50={overall['latency_ms']['p50']}ms "
+          f"p95={overall['latency_ms']['p95']}ms tokens/run={overall['tokens_per_run']}")
+    print("Summary saved to:", out_path)
+
+    if args.baseline or args.save_baseline:
+        baseline_path = Path(args.baseline or DEFAULT_BASELINE)
+        if args.save_baseline:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+            print("Baseline saved to:", baseline_path)
+        elif not baseline_path.exists():
+            raise SystemExit(f"Baseline not found: {baseline_path} (create it with --save-baseline)")
+        else:
+            problems = diff_against_baseline(summary, json.loads(baseline_path.read_text(encoding="utf-8")),
+                                             args.latency_tolerance, args.token_tolerance, args.pass_rate_drop,
+                                             args.provenance_tolerance)
+            if problems:
+                print("\n!!! REGRESSIONS vs", baseline_path)
+                for p in problems:
+                    print("  -", p)
+                sys.exit(1)
+            print("No regressions vs", baseline_path)
 
-    results.append(entry)
 
-# Write summary file
-OUT_PATH.write_text(json.dumps({"runs": results}, ensure_ascii=False, indent=2), encoding="utf-8")
-print("\n=== EVALUATION COMPLETE ===")
-print("Summary saved to:", OUT_PATH)
-print("Per-scenario final_report jsons saved in:", OUT_DIR)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# scripts/stream_consult.py
+"""
+Run one consultation and stream progress events to stdout as newline-delimited JSON
+(see astream_session in src/business_consultant_graph.py for the event types, including
+per-bottleneck events and provisional consensus rankings while the coaches are still generating).
+Diagnostics go to stderr, so stdout can be piped straight to a front-end.
+
+Usage:
+    python scripts/stream_consult.py --description "..." --goal "..." [--kpi "MRR=$20k" ...] [--thread-id ID]
+"""
+import sys
+import argparse
+from pathlib import Path
+
+# Add project root to sys.path so we can import src
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.business_consultant_graph import stream_session_ndjson
+
+
+def parse_kpis(items):
+    kpis = {}
+    for item in items or []:
+        name, _, value = item.partition("=")
+        if name.strip():
+            kpis[name.strip()] = value.strip() or None
+    return kpis
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Stream graph progress events as NDJSON.")
+    ap.add_argument("--description", required=True, help="business description")
+    ap.add_argument("--goal", required=True)
+    ap.add_argument("--kpi", action="append", help="KPI as name=value (repeatable)")
+    ap.add_argument("--thread-id", default=None)
+    args = ap.parse_args()
+
+    state = {"business_description": args.description, "goal": args.goal}
+    kpis = parse_kpis(args.kpi)
+    if kpis:
+        state["kpis"] = kpis
+    stream_session_ndjson(state, args.thread_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+# scripts/trace_summary.py
+"""
+Per-stage latency percentiles and token totals from the local span trace.
+
+Usage:
+    python scripts/trace_summary.py [--path data/traces/spans.jsonl] [--since-hours 24] [--json]
+"""
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+# Add project root to sys.path so we can import src
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.tracing import DEFAULT_TRACE_PATH, load_spans, summarize
+
+COLUMNS = ["count", "errors", "p50_ms", "p95_ms", "p99_ms", "mean_ms", "max_ms",
+           "prompt_tokens", "completion_tokens", "cache_hits", "retries", "traces"]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Summarize per-stage spans written by src/tracing.py.")
+    ap.add_argument("--path", default=str(DEFAULT_TRACE_PATH))
+    ap.add_argument("--since-hours", type=float, default=None, help="only spans started in the last N hours")
+    ap.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = ap.parse_args()
+
+    since = time.time() - args.since_hours * 3600 if args.since_hours is not None else None
+    summary = summarize(load_spans(Path(args.path)), since=since)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    if not summary:
+        print(f"No spans in {args.path}")
+        return
+
+    width = max(len("stage"), *(len(s) for s in summary))
+    print("stage".ljust(width), *(c.rjust(max(len(c), 8)) for c in COLUMNS))
+    for stage in sorted(summary, key=lambda s: -summary[s]["p95_ms"]):
+        row = summary[stage]
+        print(stage.ljust(width), *(str(row[c]).rjust(max(len(c), 8)) for c in COLUMNS))
+
+
+if __name__ == "__main__":
+    main()
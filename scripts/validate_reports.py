@@ -0,0 +1,92 @@
+# scripts/validate_reports.py
+"""
+Re-validate stored final reports against src/validate_report.FINAL_REPORT_SCHEMA.
+
+Reads every final-report JSON matching the glob(s) (default data/metadata/*.json; files that are
+not reports, like manifest.json or eval_results_*.json, are skipped) and, with --runs, the
+"final_report" of every record of a run store directory (or a flat runs JSONL file).
+Prints each invalid report with its JSON-pointer errors.
+
+Usage:
+    python scripts/validate_reports.py [--glob "data/metadata/**/*.json"] [--runs data/metadata/runs] [--json]
+Exits 1 when any report is invalid.
+"""
+import sys
+import json
+import glob
+import time
+import argparse
+from pathlib import Path
+from typing import Any, Dict, Iterator, Tuple
+
+# Add project root to sys.path so we can import src
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.run_store import RunStore
+from src.validate_report import report_errors
+
+
+def _is_report(obj: Any) -> bool:
+    return isinstance(obj, dict) and "coach_insights" in obj and "business_snapshot" in obj
+
+
+def iter_reports(patterns, runs_file=None) -> Iterator[Tuple[str, Any]]:
+    """Yields (label, report) for every report file and run record."""
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern, recursive=True)):
+            try:
+                obj = json.loads(Path(path).read_text(encoding="utf-8"))
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Skipping {path}: {e}")
+                continue
+            if _is_report(obj):
+                yield path, obj
+    if runs_file and Path(runs_file).is_dir():
+        for seq, rec in enumerate(RunStore(Path(runs_file), legacy_file=None).iter_records(), start=1):
+            if "final_report" in rec:
+                yield f"{runs_file}#{seq} ({rec.get('thread_id')})", rec["final_report"]
+    elif runs_file and Path(runs_file).exists():
+        with open(runs_file, "r", encoding="utf-8") as fh:
+            for line_no, line in enumerate(fh, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if "final_report" in rec:
+                    yield f"{runs_file}:{line_no} ({rec.get('thread_id')})", rec["final_report"]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Validate stored final reports against the report schema.")
+    ap.add_argument("--glob", action="append", help="report file glob (repeatable; default data/metadata/*.json)")
+    ap.add_argument("--runs", default=None, help="also validate every record of this run store directory or runs JSONL")
+    ap.add_argument("--json", action="store_true", help="print results as JSON lines")
+    args = ap.parse_args()
+
+    counts: Dict[str, int] = {"reports": 0, "invalid": 0, "errors": 0}
+    spent = 0.0
+    for label, rep in iter_reports(args.glob or ["data/metadata/*.json"], args.runs):
+        t0 = time.perf_counter()
+        errs = report_errors(rep)
+        spent += time.perf_counter() - t0
+        counts["reports"] += 1
+        if args.json:
+            print(json.dumps({"report": label, "valid": not errs, "errors": [e._asdict() for e in errs]}, ensure_ascii=False))
+        if errs:
+            counts["invalid"] += 1
+            counts["errors"] += len(errs)
+            if not args.json:
+                print(f"\n{label}: {len(errs)} error(s)")
+                for e in errs:
+                    print("  ", e)
+
+    per_report_us = spent / counts["reports"] * 1e6 if counts["reports"] else 0.0
+    print(f"\nValidated {counts['reports']} reports: {counts['invalid']} invalid, {counts['errors']} errors "
+          f"({per_report_us:.1f}us/report)", file=sys.stderr if args.json else sys.stdout)
+    sys.exit(1 if counts["invalid"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,46 @@
 # src/business_consultant_graph.py
 import os
 import sys
+import asyncio
 import time
 import uuid
 import json
+import weakref
 import inspect
+import threading
 import traceback
-from typing import TypedDict, Dict, Any, Optional, List, Tuple
+import contextlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import TypedDict, Dict, Any, AsyncIterator, Callable, Optional, List, Tuple
 from pathlib import Path
 from dotenv import load_dotenv
 
 # LangGraph / LangChain imports
 from langgraph.graph import StateGraph, START, END
 from langgraph.checkpoint.memory import MemorySaver
+from langgraph.config import get_stream_writer
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
 
+# Make project root importable so `src.*` helpers resolve when run as a script too
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+from src.embedding_cache import QueryEmbeddingCache
+from src.embedding_backends import backend_name, collection_name, get_embedding_backend
+from src.numpy_index import NumpyIndexRegistry
+from src.lexical_index import LexicalIndexRegistry, reciprocal_rank_fusion
+from src.context_budget import pack_evidence
+from src.llm_cache import LLMResponseCache
+from src.checkpoint_store import SQLiteCheckpointSaver
+from src.tracing import make_tracer
+from src.validate_report import validate_final_report
+from src.coach_output import COACH_OUTPUT_METRICS, build_repair_messages, invalid_fields, response_format
+from src.stream_json import CoachStreamParser
+from src.run_store import default_run_store
+
 # Load env
 load_dotenv()
 os.environ.setdefault("OPENAI_API_KEY", os.getenv("OPENAI_API_KEY", ""))
@@ -50,35 +75,218 @@ except Exception:
 # RAG config
 CHROMA_PERSIST_DIR = "chroma_persist"
 RAG_TOP_K = 3
+# candidates fetched per coach; the prompt only gets what fits the coach's evidence token budget
+RAG_CANDIDATE_K = int(os.getenv("RAG_CANDIDATE_K", 6))
+EVIDENCE_TOKEN_BUDGET = int(os.getenv("EVIDENCE_TOKEN_BUDGET", 1400))
+COACH_EVIDENCE_BUDGETS: Dict[str, int] = {}  # per-coach overrides, e.g. {"sam_ovens": 1800}
 EMB_OPENAI_KEY = os.getenv("OPENAI_API_KEY")
+# openai | local | hashing (see src/embedding_backends.py); non-openai backends use "<coach>__<tag>" collections
+EMBEDDING_BACKEND = backend_name()
+# chroma | numpy (memory-mapped export from scripts/export_numpy_index.py; falls back to chroma if missing)
+RETRIEVER = os.getenv("RETRIEVER", "chroma").strip().lower()
+NUMPY_INDEX_DIR = os.getenv("NUMPY_INDEX_DIR", "data/index")
+# vector | bm25 | hybrid (BM25 + vector merged by reciprocal rank); overridable per call
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector").strip().lower()
+# hybrid mode pulls k * factor candidates from each ranker before fusing
+HYBRID_CANDIDATE_FACTOR = 4
+QUERY_EMBED_CACHE_SIZE = 512
+# on-disk tier for query vectors; set QUERY_EMBED_CACHE_DIR="" to keep the cache in memory only
+QUERY_EMBED_CACHE_DIR = os.getenv("QUERY_EMBED_CACHE_DIR", "data/cache/query_embeddings")
+# per-stage spans -> TRACE_PATH (default data/traces/spans.jsonl); TRACE_DISABLED=1 turns it off
+TRACER = make_tracer()
+
+
+def _current_thread_id() -> Optional[str]:
+    """thread_id of the graph run we are inside (used as the trace id), if any."""
+    try:
+        from langgraph.config import get_config
+        return get_config().get("configurable", {}).get("thread_id")
+    except Exception:
+        return None
 
 # ---------- MCP-STYLE RETRIEVAL TOOL ----------
-def retrieval_tool(query: str, coach: str, k: int = RAG_TOP_K):
+def retrieval_tool(query: str, coach: str, k: int = RAG_TOP_K, mode: Optional[str] = None):
     """
     MCP-style retrieval tool stub.
     Future versions could expose this as a real tool.
     For now, it simply wraps your existing RAG retrieval.
+    mode: "vector", "bm25" or "hybrid" (defaults to RETRIEVAL_MODE).
     """
-    return get_top_k_evidence_with_meta(coach, query, k)
+    return get_top_k_evidence_with_meta(coach, query, k, mode=mode)
+
+
+def _new_embeddings():
+    """Embeddings client for the configured backend."""
+    if EMBEDDING_BACKEND == "openai" and not EmbeddingClass:
+        raise RuntimeError("Chroma/Embeddings not available")
+    return get_embedding_backend(EMBEDDING_BACKEND, openai_class=EmbeddingClass, openai_api_key=EMB_OPENAI_KEY)
 
 
-def _build_chroma_vectorstore(coach_collection_name: str):
-    """Construct a Chroma vectorstore instance."""
-    if not EmbeddingClass or not ChromaClass:
+def _build_chroma_vectorstore(coach_collection_name: str, emb: Any = None):
+    """Construct a Chroma vectorstore instance (collection name is resolved per embedding backend)."""
+    if not ChromaClass:
         raise RuntimeError("Chroma/Embeddings not available")
-    emb = EmbeddingClass(openai_api_key=EMB_OPENAI_KEY)
+    if emb is None:
+        emb = _new_embeddings()
+    name = collection_name(coach_collection_name, EMBEDDING_BACKEND)
     try:
-        return ChromaClass(persist_directory=CHROMA_PERSIST_DIR, collection_name=coach_collection_name, embedding_function=emb)
+        return ChromaClass(persist_directory=CHROMA_PERSIST_DIR, collection_name=name, embedding_function=emb)
     except TypeError:
         try:
-            return ChromaClass(persist_directory=CHROMA_PERSIST_DIR, collection_name=coach_collection_name, embeddings=emb)
+            return ChromaClass(persist_directory=CHROMA_PERSIST_DIR, collection_name=name, embeddings=emb)
         except TypeError:
-            return ChromaClass(persist_directory=CHROMA_PERSIST_DIR, collection_name=coach_collection_name)
+            return ChromaClass(persist_directory=CHROMA_PERSIST_DIR, collection_name=name)
 
-def get_top_k_evidence_with_meta(coach: str, query: str, k: int = RAG_TOP_K) -> List[Tuple[str, Dict[str, Any]]]:
-    """Returns list of tuples: (text, metadata) for top-k retrieved chunks."""
-    vect = _build_chroma_vectorstore(coach)
-    docs = vect.similarity_search(query, k=k)
+
+# ---------- VECTORSTORE POOL ----------
+COACH_COLLECTIONS = ["dan_martell", "sam_ovens", "alex_hormozi"]
+POOL_STALE_CHECK_SECONDS = 5.0
+
+
+class VectorstorePool:
+    """
+    Process-wide registry of long-lived Chroma vectorstores and embedding clients,
+    keyed by collection name. Safe to share between the parallel coach nodes.
+    Handles are dropped when the persist directory changes on disk (e.g. re-ingestion).
+    """
+
+    def __init__(self, persist_dir: str = CHROMA_PERSIST_DIR):
+        self.persist_dir = persist_dir
+        self._lock = threading.RLock()
+        self._stores: Dict[str, Any] = {}
+        self._embeddings: Dict[str, Any] = {}
+        self._signature: Optional[Tuple] = None
+        self._last_check = 0.0
+        # handles leased out right now, and whether chromadb's client cache still needs dropping
+        self._in_flight = 0
+        self._reset_pending = False
+
+    def _disk_signature(self) -> Tuple:
+        root = Path(self.persist_dir)
+        sig = []
+        for p in (root, root / "chroma.sqlite3"):
+            try:
+                st = p.stat()
+                sig.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                sig.append(None)
+        return tuple(sig)
+
+    def _check_stale(self) -> None:
+        now = time.monotonic()
+        if now - self._last_check < POOL_STALE_CHECK_SECONDS:
+            return
+        self._last_check = now
+        if self._signature is not None and self._disk_signature() != self._signature:
+            print(f"Vectorstore pool: '{self.persist_dir}' changed on disk, dropping cached handles.")
+            self.invalidate()
+
+    def get_embeddings(self, collection: str) -> Any:
+        with self._lock:
+            emb = self._embeddings.get(collection)
+            if emb is None:
+                # one client is enough for every collection; reuse it when we already have one
+                emb = next(iter(self._embeddings.values()), None) or _new_embeddings()
+                self._embeddings[collection] = emb
+            return emb
+
+    def get(self, collection: str) -> Any:
+        """Pooled handle for `collection`. Prefer `lease()` when the handle is used outside the pool lock."""
+        with self._lock:
+            self._check_stale()
+            vect = self._stores.get(collection)
+            if vect is None:
+                vect = _build_chroma_vectorstore(collection, emb=self.get_embeddings(collection))
+                self._stores[collection] = vect
+                # opening the store may itself touch the sqlite file, so snapshot afterwards
+                self._signature = self._disk_signature()
+                self._last_check = time.monotonic()
+            return vect
+
+    def acquire(self, collection: str) -> Any:
+        """Like `get()`, but counts the handle as in flight until `release()`."""
+        with self._lock:
+            vect = self.get(collection)
+            self._in_flight += 1
+            return vect
+
+    def release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._maybe_reset_clients()
+
+    @contextlib.contextmanager
+    def lease(self, collection: str):
+        vect = self.acquire(collection)
+        try:
+            yield vect
+        finally:
+            self.release()
+
+    def _maybe_reset_clients(self) -> None:
+        # chromadb caches one client per path and closing it breaks every handle opened through
+        # it, so only drop it once no caller is still using one (always under self._lock)
+        if not self._reset_pending or self._in_flight:
+            return
+        self._reset_pending = False
+        self._stores.clear()
+        try:
+            from chromadb.api.client import SharedSystemClient
+            SharedSystemClient.clear_system_cache()
+        except Exception:
+            pass
+
+    def warm_up(self, collections: Optional[List[str]] = None) -> Dict[str, bool]:
+        """Open handles ahead of the first request. Returns {collection: ok}."""
+        status = {}
+        for name in collections or COACH_COLLECTIONS:
+            try:
+                with self.lease(name) as vect:
+                    status[name] = True
+                    count = getattr(getattr(vect, "_collection", None), "count", None)
+                    empty = callable(count) and count() == 0
+                if empty:
+                    print(f"Vectorstore warm-up: '{name}' is empty for EMBEDDING_BACKEND={EMBEDDING_BACKEND}; run scripts/ingest_chroma.py")
+            except Exception as e:
+                print(f"Vectorstore warm-up failed for {name}: {e}")
+                status[name] = False
+        return status
+
+    def invalidate(self, collection: Optional[str] = None) -> None:
+        """
+        Drop the pool's own handles. Handles already leased stay usable; chromadb's shared
+        client is closed once the last of them is released, so the next open sees the new files.
+        """
+        with self._lock:
+            if collection is not None:
+                self._stores.pop(collection, None)
+                return
+            self._stores.clear()
+            self._embeddings.clear()
+            self._signature = None
+            self._reset_pending = True
+            self._maybe_reset_clients()
+
+
+VECTORSTORE_POOL = VectorstorePool()
+
+
+def warm_vectorstores(collections: Optional[List[str]] = None) -> Dict[str, bool]:
+    """Pre-open the pooled coach collections (call once at startup)."""
+    return VECTORSTORE_POOL.warm_up(collections)
+
+
+# ---------- QUERY EMBEDDING CACHE ----------
+QUERY_EMBED_CACHE = QueryEmbeddingCache(max_entries=QUERY_EMBED_CACHE_SIZE, disk_dir=QUERY_EMBED_CACHE_DIR or None)
+
+
+def embed_query_cached(query: str, coach: str = COACH_COLLECTIONS[0]) -> List[float]:
+    """Embed the query once and share the vector across every coach collection."""
+    with TRACER.span("embed_query", backend=EMBEDDING_BACKEND):
+        return QUERY_EMBED_CACHE.get_or_embed(query, VECTORSTORE_POOL.get_embeddings(coach))
+
+
+def _docs_to_evidence(docs: List[Any]) -> List[Tuple[str, Dict[str, Any]]]:
     results: List[Tuple[str, Dict[str, Any]]] = []
     for d in docs:
         text = getattr(d, "page_content", None) or getattr(d, "text", None) or str(d)
@@ -91,6 +299,211 @@ def get_top_k_evidence_with_meta(coach: str, query: str, k: int = RAG_TOP_K) ->
         results.append((text, meta or {}))
     return results
 
+
+# ---------- NUMPY RETRIEVER ----------
+NUMPY_INDEXES = NumpyIndexRegistry(Path(NUMPY_INDEX_DIR))
+_numpy_fallback_warned = set()
+
+
+def _numpy_index_for(coach: str):
+    index = NUMPY_INDEXES.get(collection_name(coach, EMBEDDING_BACKEND))
+    if index is None and coach not in _numpy_fallback_warned:
+        _numpy_fallback_warned.add(coach)
+        print(f"RETRIEVER=numpy but no export for {coach} under {NUMPY_INDEX_DIR}; using Chroma. Run scripts/export_numpy_index.py")
+    return index
+
+
+def _vector_top_k(coach: str, query: str, k: int, query_vector: Optional[List[float]] = None) -> List[Tuple[str, Dict[str, Any]]]:
+    if RETRIEVER == "numpy":
+        index = _numpy_index_for(coach)
+        if index is not None:
+            if query_vector is None:
+                query_vector = embed_query_cached(query, coach)
+            return [(txt, meta) for txt, meta, _ in index.search(query_vector, k)]
+
+    with VECTORSTORE_POOL.lease(coach) as vect:
+        if hasattr(vect, "similarity_search_by_vector"):
+            if query_vector is None:
+                query_vector = embed_query_cached(query, coach)
+            docs = vect.similarity_search_by_vector(query_vector, k=k)
+        else:
+            docs = vect.similarity_search(query, k=k)
+    return _docs_to_evidence(docs)
+
+
+# ---------- ASYNC RETRIEVAL ----------
+# Per-upstream concurrency caps so one event loop can drive many sessions
+# without flooding the OpenAI API or the local Chroma store.
+UPSTREAM_LIMITS = {
+    "llm": int(os.getenv("LLM_MAX_CONCURRENCY", 32)),
+    "embeddings": int(os.getenv("EMBED_MAX_CONCURRENCY", 16)),
+    "chroma": int(os.getenv("CHROMA_MAX_CONCURRENCY", 8)),
+}
+# loop -> {upstream name: semaphore}; entries go away with their loop, so a new loop never
+# inherits a semaphore bound to a dead one
+_UPSTREAM_SEMAPHORES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary())
+_UPSTREAM_LOCK = threading.Lock()
+
+
+def upstream_semaphore(name: str) -> asyncio.Semaphore:
+    """Semaphore for one upstream, created lazily per running event loop."""
+    loop = asyncio.get_running_loop()
+    with _UPSTREAM_LOCK:
+        sems = _UPSTREAM_SEMAPHORES.get(loop)
+        if sems is None:
+            sems = _UPSTREAM_SEMAPHORES[loop] = {}
+        sem = sems.get(name)
+        if sem is None:
+            sem = sems[name] = asyncio.Semaphore(UPSTREAM_LIMITS[name])
+    return sem
+
+
+async def aembed_query_cached(query: str, coach: str = COACH_COLLECTIONS[0]) -> List[float]:
+    emb = VECTORSTORE_POOL.get_embeddings(coach)
+    with TRACER.span("embed_query", backend=EMBEDDING_BACKEND):
+        async with upstream_semaphore("embeddings"):
+            return await QUERY_EMBED_CACHE.aget_or_embed(query, emb)
+
+
+async def _avector_top_k(coach: str, query: str, k: int, query_vector: Optional[List[float]] = None) -> List[Tuple[str, Dict[str, Any]]]:
+    if RETRIEVER == "numpy":
+        index = _numpy_index_for(coach)
+        if index is not None:
+            if query_vector is None:
+                query_vector = await aembed_query_cached(query, coach)
+            # a mat-vec over a few thousand rows; cheaper to run inline than to hop threads
+            return [(txt, meta) for txt, meta, _ in index.search(query_vector, k)]
+
+    # first open of a collection touches sqlite; keep it off the event loop
+    vect = await asyncio.to_thread(VECTORSTORE_POOL.acquire, coach)
+    try:
+        if hasattr(vect, "asimilarity_search_by_vector"):
+            if query_vector is None:
+                query_vector = await aembed_query_cached(query, coach)
+            async with upstream_semaphore("chroma"):
+                docs = await vect.asimilarity_search_by_vector(query_vector, k=k)
+        else:
+            async with upstream_semaphore("chroma"):
+                docs = await asyncio.to_thread(vect.similarity_search, query, k=k)
+    finally:
+        VECTORSTORE_POOL.release()
+    return _docs_to_evidence(docs)
+
+# ---------- LEXICAL / HYBRID RETRIEVAL ----------
+LEXICAL_INDEX = LexicalIndexRegistry()
+
+
+def get_top_k_evidence_with_meta(coach: str, query: str, k: int = RAG_TOP_K, query_vector: Optional[List[float]] = None, mode: Optional[str] = None) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Returns list of tuples: (text, metadata) for top-k retrieved chunks.
+    mode "vector" = embeddings only, "bm25" = lexical only, "hybrid" = both fused by reciprocal rank.
+    """
+    mode = mode or RETRIEVAL_MODE
+    with TRACER.span("retrieval", coach=coach, mode=mode, k=k) as sp:
+        results = _top_k_evidence(coach, query, k, query_vector, mode)
+        sp.set(n_results=len(results))
+        return results
+
+
+def _top_k_evidence(coach: str, query: str, k: int, query_vector: Optional[List[float]], mode: str) -> List[Tuple[str, Dict[str, Any]]]:
+    if mode == "bm25":
+        return LEXICAL_INDEX.search(coach, query, k)
+    if mode == "hybrid":
+        n = k * HYBRID_CANDIDATE_FACTOR
+        lexical = LEXICAL_INDEX.search(coach, query, n)
+        try:
+            vector = _vector_top_k(coach, query, n, query_vector)
+        except Exception as e:
+            print(f"Vector retrieval failed for {coach}, using BM25 only: {e}")
+            vector = []
+        return reciprocal_rank_fusion([vector, lexical], k)
+    return _vector_top_k(coach, query, k, query_vector)
+
+
+async def aget_top_k_evidence_with_meta(coach: str, query: str, k: int = RAG_TOP_K, query_vector: Optional[List[float]] = None, mode: Optional[str] = None) -> List[Tuple[str, Dict[str, Any]]]:
+    """Async version of get_top_k_evidence_with_meta (the BM25 stage is in-memory and runs inline)."""
+    mode = mode or RETRIEVAL_MODE
+    with TRACER.span("retrieval", coach=coach, mode=mode, k=k) as sp:
+        results = await _atop_k_evidence(coach, query, k, query_vector, mode)
+        sp.set(n_results=len(results))
+        return results
+
+
+async def _atop_k_evidence(coach: str, query: str, k: int, query_vector: Optional[List[float]], mode: str) -> List[Tuple[str, Dict[str, Any]]]:
+    if mode == "bm25":
+        return LEXICAL_INDEX.search(coach, query, k)
+    if mode == "hybrid":
+        n = k * HYBRID_CANDIDATE_FACTOR
+        lexical = LEXICAL_INDEX.search(coach, query, n)
+        try:
+            vector = await _avector_top_k(coach, query, n, query_vector)
+        except Exception as e:
+            print(f"Vector retrieval failed for {coach}, using BM25 only: {e}")
+            vector = []
+        return reciprocal_rank_fusion([vector, lexical], k)
+    return await _avector_top_k(coach, query, k, query_vector)
+
+
+# ---------- FAN-OUT RETRIEVAL ----------
+_RETRIEVAL_POOL = ThreadPoolExecutor(max_workers=max(4, len(COACH_COLLECTIONS)), thread_name_prefix="retrieval")
+
+
+def retrieve_for_coaches(query: str, coaches: Optional[List[str]] = None, k: int = RAG_TOP_K, query_vector: Optional[List[float]] = None, mode: Optional[str] = None, on_result: Optional[Callable[[str, List[Tuple[str, Dict[str, Any]]]], None]] = None) -> Dict[str, List[Tuple[str, Dict[str, Any]]]]:
+    """
+    One query against several coach collections: the query is embedded once and the
+    per-collection lookups run concurrently. Returns {coach: [(text, metadata), ...]};
+    a coach whose lookup fails gets an empty list. on_result(coach, evidence) is called
+    as each coach's lookup finishes.
+    """
+    coaches = coaches or COACH_COLLECTIONS
+    mode = mode or RETRIEVAL_MODE
+    if query_vector is None and mode != "bm25":
+        try:
+            query_vector = embed_query_cached(query, coaches[0])
+        except Exception as e:
+            # each lookup below retries (and reports) on its own
+            print(f"Query embedding failed: {e}")
+    # copy_context keeps the caller's trace span as the parent inside the pool threads
+    futures = {_RETRIEVAL_POOL.submit(contextvars.copy_context().run, get_top_k_evidence_with_meta, c, query, k, query_vector, mode): c
+               for c in coaches}
+    done: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+    for fut in as_completed(futures):
+        coach = futures[fut]
+        try:
+            done[coach] = fut.result()
+        except Exception as e:
+            print(f"RAG retrieval failed for {coach}: {e}")
+            done[coach] = []
+        if on_result is not None:
+            on_result(coach, done[coach])
+    return {c: done[c] for c in coaches}
+
+
+async def aretrieve_for_coaches(query: str, coaches: Optional[List[str]] = None, k: int = RAG_TOP_K, query_vector: Optional[List[float]] = None, mode: Optional[str] = None, on_result: Optional[Callable[[str, List[Tuple[str, Dict[str, Any]]]], None]] = None) -> Dict[str, List[Tuple[str, Dict[str, Any]]]]:
+    """Async version of retrieve_for_coaches."""
+    coaches = coaches or COACH_COLLECTIONS
+    mode = mode or RETRIEVAL_MODE
+    if query_vector is None and mode != "bm25":
+        try:
+            query_vector = await aembed_query_cached(query, coaches[0])
+        except Exception as e:
+            print(f"Query embedding failed: {e}")
+
+    async def one(coach: str) -> List[Tuple[str, Dict[str, Any]]]:
+        try:
+            out = await aget_top_k_evidence_with_meta(coach, query, k, query_vector, mode)
+        except Exception as e:
+            print(f"RAG retrieval failed for {coach}: {e}")
+            out = []
+        if on_result is not None:
+            on_result(coach, out)
+        return out
+
+    outcomes = await asyncio.gather(*[one(c) for c in coaches])
+    return dict(zip(coaches, outcomes))
+
+
 # ========== STATE DEFINITION ==========
 class BizState(TypedDict, total=False):
     business_description: str
@@ -100,9 +513,27 @@ class BizState(TypedDict, total=False):
     analysis_sam: Optional[Dict[str, Any]]
     analysis_alex: Optional[Dict[str, Any]]
     final_report: Optional[Dict[str, Any]]
+    # schema violations of final_report ("<json pointer>: <message>"), set by merge_node
+    report_errors: List[str]
+    # prefetched by retrieve_node: {coach: [{"text": ..., "metadata": {...}}, ...]}
+    evidence: Dict[str, List[Dict[str, Any]]]
 
 # ========== LLM ==========
 llm = ChatOpenAI(model="gpt-3.5-turbo", temperature=0)
+# json_object (JSON mode) | json_schema (strict CoachAnalysis schema; needs a model with structured
+# outputs, e.g. gpt-4o-mini) | text (no response_format)
+COACH_OUTPUT_MODE = os.getenv("COACH_OUTPUT_MODE", "json_object").strip().lower()
+# follow-up calls allowed per coach answer to fill in fields that are missing or malformed
+COACH_REPAIR_RETRIES = int(os.getenv("COACH_REPAIR_RETRIES", 1))
+
+# Response cache in front of llm.invoke (coach nodes + JSON repair).
+# LLM_CACHE_DISABLED=1 bypasses it, e.g. when prompts are being tuned.
+LLM_CACHE = LLMResponseCache(
+    path=os.getenv("LLM_CACHE_PATH", "data/cache/llm_responses.sqlite3"),
+    ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600)),
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000)),
+    enabled=os.getenv("LLM_CACHE_DISABLED", "") not in ("1", "true", "yes"),
+)
 
 # ========== PERSONA PROMPTS ==========
 DAN_SYSTEM = (
@@ -168,6 +599,13 @@ def safe_parse_json(text: str) -> Dict[str, Any]:
 
     s = text.strip()
 
+    # structured-output / JSON-mode answers are a bare object: skip the regex work
+    if s.startswith("{") and s.endswith("}"):
+        try:
+            return json.loads(s)
+        except Exception:
+            pass
+
     # remove markdown code fences ```json ... ``` or ``` ... ```
     s = re.sub(r"```(?:json)?\s*", "", s)
     s = re.sub(r"\s*```$", "", s)
@@ -191,40 +629,132 @@ def safe_parse_json(text: str) -> Dict[str, Any]:
     except Exception:
         return {"raw_text": text}
 
-def validate_and_fix_json(parsed: Dict[str, Any], llm_instance: ChatOpenAI, msgs: List[Any], max_retries: int = 1) -> Dict[str, Any]:
-    """
-    Ensure required keys exist. If not, re-prompt the model (one retry) with a strict instruction
-    to output only valid JSON and to fill missing keys.
-    msgs is the original message list [SystemMessage, HumanMessage].
-    """
-    required = ["bottlenecks", "top_recommendation", "kpis_to_track", "summary"]
+REQUIRED_COACH_KEYS = ["bottlenecks", "top_recommendation", "kpis_to_track", "summary"]
+
+
+def _llm_usage(resp: Any) -> Tuple[int, int]:
+    """(prompt_tokens, completion_tokens) reported by the provider for one response; 0s if unknown."""
+    usage = getattr(resp, "usage_metadata", None) or {}
+    if usage:
+        return int(usage.get("input_tokens") or 0), int(usage.get("output_tokens") or 0)
+    token_usage = (getattr(resp, "response_metadata", None) or {}).get("token_usage") or {}
+    return int(token_usage.get("prompt_tokens") or 0), int(token_usage.get("completion_tokens") or 0)
+
+
+def _response_usage(resp: Any) -> Tuple[bool, int, int]:
+    """(cache_hit, prompt_tokens, completion_tokens); cached answers cost no tokens."""
+    cache_hit = bool((getattr(resp, "response_metadata", None) or {}).get("cache_hit"))
+    prompt_tokens, completion_tokens = (0, 0) if cache_hit else _llm_usage(resp)
+    return cache_hit, prompt_tokens, completion_tokens
+
+
+def _trace_llm_response(sp: Any, resp: Any) -> None:
+    """Record tokens and cache hit for an LLM span."""
+    cache_hit, prompt_tokens, completion_tokens = _response_usage(resp)
+    sp.set(cache_hit=cache_hit, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+
+def _coach_call_kwargs() -> Dict[str, Any]:
+    """Extra llm.invoke kwargs for a coach call under COACH_OUTPUT_MODE."""
+    fmt = response_format(COACH_OUTPUT_MODE)
+    return {"response_format": fmt} if fmt else {}
+
+
+def _repair_call_kwargs() -> Dict[str, Any]:
+    # the repair answer holds only some keys, so it can't use the full strict schema
+    return {"response_format": response_format("json_object")} if COACH_OUTPUT_MODE != "text" else {}
+
+
+def _merge_repair(parsed: Dict[str, Any], resp: Any, fields: List[str]) -> Dict[str, Any]:
+    repaired = safe_parse_json(getattr(resp, "content", str(resp)))
+    if isinstance(repaired, dict):
+        if set(parsed) == {"raw_text"}:
+            parsed = {}
+        # repaired wins for the fields we asked for
+        parsed.update({k: v for k, v in repaired.items() if k in fields or k not in parsed})
+    return parsed
+
+
+class _RepairUsage:
+    """Token / cache totals over the repair calls of one coach answer, set on its "repair" span."""
+
+    def __init__(self):
+        self.prompt_tokens = self.completion_tokens = 0
+        self.cache_hit = True
+
+    def add(self, resp: Any) -> None:
+        cache_hit, prompt_tokens, completion_tokens = _response_usage(resp)
+        self.cache_hit = self.cache_hit and cache_hit
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+
+    def record(self, sp: Any, attempts: int, fields: List[str]) -> None:
+        sp.set(retries=attempts, still_invalid=len(fields), cache_hit=bool(attempts) and self.cache_hit,
+               prompt_tokens=self.prompt_tokens, completion_tokens=self.completion_tokens)
+
+
+def _fix_json(parsed: Dict[str, Any], llm_instance: ChatOpenAI, max_retries: int, refresh: bool,
+              context: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], int]:
+    """Repair loop behind validate_and_fix_json. Returns (parsed, repair calls that returned)."""
+    if not isinstance(parsed, dict):
+        parsed = {"raw_text": str(parsed)}
+    fields = invalid_fields(parsed)
+    if not fields or max_retries <= 0:
+        return parsed, 0
+    attempts, usage = 0, _RepairUsage()
+    with TRACER.span("repair", missing_keys=len(fields), max_retries=max_retries) as sp:
+        while fields and attempts < max_retries:
+            try:
+                resp = LLM_CACHE.invoke(llm_instance, build_repair_messages(parsed, fields, context),
+                                        refresh=refresh, **_repair_call_kwargs())
+            except Exception:
+                break
+            attempts += 1
+            usage.add(resp)
+            parsed = _merge_repair(parsed, resp, fields)
+            fields = invalid_fields(parsed)
+        usage.record(sp, attempts, fields)
+    return parsed, attempts
+
+
+async def _afix_json(parsed: Dict[str, Any], llm_instance: ChatOpenAI, max_retries: int, refresh: bool,
+                     context: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], int]:
     if not isinstance(parsed, dict):
         parsed = {"raw_text": str(parsed)}
+    fields = invalid_fields(parsed)
+    if not fields or max_retries <= 0:
+        return parsed, 0
+    attempts, usage = 0, _RepairUsage()
+    with TRACER.span("repair", missing_keys=len(fields), max_retries=max_retries) as sp:
+        while fields and attempts < max_retries:
+            try:
+                async with upstream_semaphore("llm"):
+                    resp = await LLM_CACHE.ainvoke(llm_instance, build_repair_messages(parsed, fields, context),
+                                                   refresh=refresh, **_repair_call_kwargs())
+            except Exception:
+                break
+            attempts += 1
+            usage.add(resp)
+            parsed = _merge_repair(parsed, resp, fields)
+            fields = invalid_fields(parsed)
+        usage.record(sp, attempts, fields)
+    return parsed, attempts
+
+
+def validate_and_fix_json(parsed: Dict[str, Any], llm_instance: ChatOpenAI, *, max_retries: int = COACH_REPAIR_RETRIES,
+                          refresh: bool = False, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Ensure the CoachAnalysis fields are present and well-formed. If not, make up to max_retries small
+    repair calls that send the previous answer (plus the business `context`, see build_repair_messages)
+    and ask for the broken fields only.
+    """
+    return _fix_json(parsed, llm_instance, max_retries, refresh, context)[0]
 
-    missing = [k for k in required if k not in parsed]
-    if not missing:
-        return parsed
-
-    # prepare re-prompt
-    system_msg = msgs[0] if len(msgs) > 0 else SystemMessage(content="You are a strict JSON assistant.")
-    human_msg = msgs[-1] if len(msgs) > 0 else HumanMessage(content="")
-    repair_instruction = (
-        human_msg.content
-        + "\n\nIMPORTANT: Your previous response was missing keys: "
-        + ", ".join(missing)
-        + ". Return ONLY a valid JSON object that includes these keys. "
-        + "Do not include any text outside the JSON. If you can't determine a value, use \"I_DONT_KNOW\"."
-    )
-    re_msgs = [system_msg, HumanMessage(content=repair_instruction)]
-    try:
-        resp = llm_instance.invoke(re_msgs)
-        repaired = safe_parse_json(getattr(resp, "content", str(resp)))
-        if isinstance(repaired, dict):
-            # merge: repaired wins for missing keys
-            parsed.update(repaired)
-        return parsed
-    except Exception:
-        return parsed
+
+async def avalidate_and_fix_json(parsed: Dict[str, Any], llm_instance: ChatOpenAI, *, max_retries: int = COACH_REPAIR_RETRIES,
+                                 refresh: bool = False, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Async version of validate_and_fix_json."""
+    return (await _afix_json(parsed, llm_instance, max_retries, refresh, context))[0]
 
 # ---------- KPI TARGET HELPER (optional but recommended) ----------
 def suggest_kpi_targets(kpis: Dict[str, Any]) -> Dict[str, Any]:
@@ -258,9 +788,13 @@ def suggest_kpi_targets(kpis: Dict[str, Any]) -> Dict[str, Any]:
 
     return targets
 
-def build_coach_prompt_with_rag(system_text: str, business_desc: str, goal: str, kpis: dict, coach: str, k: int = RAG_TOP_K) -> Tuple[List[Any], List[Dict[str, Any]]]:
+def _coach_query(business_desc: str, goal: str) -> str:
+    return f"{business_desc}\nGoal: {goal}"
+
+
+def build_coach_prompt_with_rag(system_text: str, business_desc: str, goal: str, kpis: dict, coach: str, k: int = RAG_CANDIDATE_K) -> Tuple[List[Any], List[Dict[str, Any]]]:
     """Build the System+Human messages for the coach including retrieved evidence. Returns (msgs, provenance)."""
-    query = f"{business_desc}\nGoal: {goal}"
+    query = _coach_query(business_desc, goal)
     evidence = []
     try:
         evidence = get_top_k_evidence_with_meta(coach, query, k=k)
@@ -269,16 +803,40 @@ def build_coach_prompt_with_rag(system_text: str, business_desc: str, goal: str,
         # print for debug but continue
         print(f"RAG retrieval failed for {coach}: {e}")
         evidence = []
+    return render_coach_prompt(system_text, business_desc, goal, kpis, coach, evidence)
+
+
+async def abuild_coach_prompt_with_rag(system_text: str, business_desc: str, goal: str, kpis: dict, coach: str, k: int = RAG_CANDIDATE_K) -> Tuple[List[Any], List[Dict[str, Any]]]:
+    """Async version of build_coach_prompt_with_rag."""
+    query = _coach_query(business_desc, goal)
+    evidence = []
+    try:
+        evidence = await aget_top_k_evidence_with_meta(coach, query, k=k)
+    except Exception as e:
+        print(f"RAG retrieval failed for {coach}: {e}")
+        evidence = []
+    return render_coach_prompt(system_text, business_desc, goal, kpis, coach, evidence)
+
+
+def render_coach_prompt(system_text: str, business_desc: str, goal: str, kpis: dict, coach: str, evidence: List[Tuple[str, Dict[str, Any]]], budget_tokens: Optional[int] = None) -> Tuple[List[Any], List[Dict[str, Any]]]:
+    """
+    Turn already-retrieved evidence into the coach messages. Returns (msgs, provenance).
+    Evidence is packed into the coach's token budget; provenance records the tokens each piece used.
+    """
+    if budget_tokens is None:
+        budget_tokens = COACH_EVIDENCE_BUDGETS.get(coach, EVIDENCE_TOKEN_BUDGET)
+    packed, _ = pack_evidence(evidence, budget_tokens)
 
     evidence_block = ""
     provenance: List[Dict[str, Any]] = []
-    if evidence:
+    if packed:
         pieces = []
-        for i, (txt, meta) in enumerate(evidence, start=1):
+        for i, (txt, meta, info) in enumerate(packed, start=1):
             src = meta.get("source", meta.get("source_file", "unknown"))
             cid = meta.get("chunk_id", meta.get("chunk", ""))
             pieces.append(f"--- EVIDENCE {i} (source={src}, chunk_id={cid}) ---\n{txt}")
-            provenance.append({"evidence_rank": i, "source": src, "chunk_id": cid})
+            span = {k: meta[k] for k in ("char_start", "char_end", "text_hash") if k in meta}
+            provenance.append({"evidence_rank": i, "source": src, "chunk_id": cid, **span, **info})
         evidence_block = "\n\n".join(pieces)
     else:
         evidence_block = "NO_RETRIEVED_EVIDENCE"
@@ -298,7 +856,7 @@ Goal:
 KPIs:
 {kpi_block}
 
-Retrieved Evidence (top {len(evidence)} from coach collection '{coach}'):
+Retrieved Evidence (top {len(packed)} from coach collection '{coach}'):
 {evidence_block}
 
 Respond STRICTLY in this JSON format (no extra commentary):
@@ -307,51 +865,163 @@ Respond STRICTLY in this JSON format (no extra commentary):
     msgs = [SystemMessage(content=system_text), HumanMessage(content=human_text)]
     return msgs, provenance
 
+# ========== PROGRESS EVENTS ==========
+def _emit(event: str, **data: Any) -> None:
+    """Progress event for astream_session(); a no-op outside a streaming graph run."""
+    try:
+        writer = get_stream_writer()
+    except Exception:
+        return
+    writer({"event": event, **data})
+
+
+def _emit_retrieval(coach: str, evidence: List[Tuple[str, Dict[str, Any]]]) -> None:
+    _emit("retrieval_done", coach=coach, n_evidence=len(evidence),
+          sources=[m.get("source") for _, m in evidence])
+
+# ========== RETRIEVAL NODE ==========
+def _evidence_to_state(results: Dict[str, List[Tuple[str, Dict[str, Any]]]]) -> Dict[str, Any]:
+    # plain dicts rather than tuples so the state stays JSON-friendly for checkpointers
+    return {"evidence": {c: [{"text": t, "metadata": m} for t, m in ev] for c, ev in results.items()}}
+
+
+def _evidence_from_state(state: BizState, coach: str) -> Optional[List[Tuple[str, Dict[str, Any]]]]:
+    """Prefetched evidence for a coach, or None if retrieval has not run for it."""
+    items = (state.get("evidence") or {}).get(coach)
+    if items is None:
+        return None
+    return [(it.get("text", ""), it.get("metadata") or {}) for it in items]
+
+
+def retrieve_node(state: BizState) -> Dict[str, Any]:
+    """Prefetch evidence for every coach in one fan-out so the coach nodes do no retrieval I/O."""
+    query = _coach_query(state.get("business_description", ""), state.get("goal", ""))
+    with TRACER.span("retrieve_node", trace_id=_current_thread_id()):
+        return _evidence_to_state(retrieve_for_coaches(query, k=RAG_CANDIDATE_K, on_result=_emit_retrieval))
+
+
+async def aretrieve_node(state: BizState) -> Dict[str, Any]:
+    query = _coach_query(state.get("business_description", ""), state.get("goal", ""))
+    with TRACER.span("retrieve_node", trace_id=_current_thread_id()):
+        return _evidence_to_state(await aretrieve_for_coaches(query, k=RAG_CANDIDATE_K, on_result=_emit_retrieval))
+
 # ========== COACH NODES ==========
+def _coach_prompt(system_text: str, coach: str, state: BizState) -> Tuple[List[Any], List[Dict[str, Any]]]:
+    args = (system_text, state.get("business_description", ""), state.get("goal", ""), state.get("kpis", {}), coach)
+    evidence = _evidence_from_state(state, coach)
+    if evidence is None:
+        return build_coach_prompt_with_rag(*args)
+    return render_coach_prompt(*args, evidence)
+
+
+async def _acoach_prompt(system_text: str, coach: str, state: BizState) -> Tuple[List[Any], List[Dict[str, Any]]]:
+    args = (system_text, state.get("business_description", ""), state.get("goal", ""), state.get("kpis", {}), coach)
+    evidence = _evidence_from_state(state, coach)
+    if evidence is None:
+        return await abuild_coach_prompt_with_rag(*args)
+    return render_coach_prompt(*args, evidence)
+
+
+def _repair_context(state: BizState) -> Dict[str, Any]:
+    return {"description": state.get("business_description", ""), "goal": state.get("goal", ""),
+            "kpis": state.get("kpis", {})}
+
+
+def _finish_coach(coach: str, parsed: Dict[str, Any], first_parse: Dict[str, Any], invalid: List[str], resp: Any,
+                  repairs: int = 0) -> None:
+    """Record parse/repair metrics for one coach answer and emit the "parsed" progress event.
+    repairs = repair calls that actually returned (a call that raised is not a repair)."""
+    still_invalid = bool(invalid) and bool(invalid_fields(parsed))
+    COACH_OUTPUT_METRICS.record(coach, parse_failed=set(first_parse) == {"raw_text"}, invalid=bool(invalid),
+                                repaired=repairs > 0, still_invalid=still_invalid)
+    _emit("parsed", coach=coach, repaired=repairs > 0,
+          ok=not still_invalid,
+          cache_hit=bool((getattr(resp, "response_metadata", None) or {}).get("cache_hit")))
+
+
+def _traced_parse(resp: Any) -> Tuple[Dict[str, Any], List[str]]:
+    """safe_parse_json under a "parse" span. Returns (parsed, invalid_fields)."""
+    with TRACER.span("parse") as sp:
+        parsed = safe_parse_json(getattr(resp, "content", str(resp)))
+        invalid = invalid_fields(parsed)
+        sp.set(missing_keys=len(invalid), raw_text=set(parsed) == {"raw_text"})
+    return parsed, invalid
+
+
+def _run_coach(system_text: str, coach: str, state_key: str, state: BizState, refresh: bool = False) -> Dict[str, Any]:
+    with TRACER.span("coach", trace_id=_current_thread_id(), coach=coach):
+        msgs, provenance = _coach_prompt(system_text, coach, state)
+        _emit("llm_started", coach=coach)
+        with TRACER.span("llm", coach=coach, output_mode=COACH_OUTPUT_MODE) as sp:
+            resp = LLM_CACHE.invoke(llm, msgs, refresh=refresh, **_coach_call_kwargs())
+            _trace_llm_response(sp, resp)
+        first, invalid = _traced_parse(resp)
+        if invalid:
+            _emit("repairing", coach=coach, missing_keys=invalid)
+        parsed, repairs = _fix_json(dict(first), llm, COACH_REPAIR_RETRIES, refresh, _repair_context(state))
+        _finish_coach(coach, parsed, first, invalid, resp, repairs)
+    return {state_key: {"analysis": parsed, "provenance": provenance}}
+
+
+async def _arun_coach(system_text: str, coach: str, state_key: str, state: BizState, refresh: bool = False) -> Dict[str, Any]:
+    with TRACER.span("coach", trace_id=_current_thread_id(), coach=coach):
+        msgs, provenance = await _acoach_prompt(system_text, coach, state)
+        async with upstream_semaphore("llm"):
+            _emit("llm_started", coach=coach)
+            with TRACER.span("llm", coach=coach, output_mode=COACH_OUTPUT_MODE) as sp:
+                resp = await LLM_CACHE.ainvoke(llm, msgs, refresh=refresh, **_coach_call_kwargs())
+                _trace_llm_response(sp, resp)
+        first, invalid = _traced_parse(resp)
+        if invalid:
+            _emit("repairing", coach=coach, missing_keys=invalid)
+        parsed, repairs = await _afix_json(dict(first), llm, COACH_REPAIR_RETRIES, refresh, _repair_context(state))
+        _finish_coach(coach, parsed, first, invalid, resp, repairs)
+    return {state_key: {"analysis": parsed, "provenance": provenance}}
+
+
 def dan_node(state: BizState) -> Dict[str, Any]:
-    msgs, provenance = build_coach_prompt_with_rag(DAN_SYSTEM, state.get("business_description", ""), state.get("goal", ""), state.get("kpis", {}), "dan_martell")
-    resp = llm.invoke(msgs)
-    parsed = safe_parse_json(getattr(resp, "content", str(resp)))
-    parsed = validate_and_fix_json(parsed, llm, msgs)
-    return {"analysis_dan": {"analysis": parsed, "provenance": provenance}}
+    return _run_coach(DAN_SYSTEM, "dan_martell", "analysis_dan", state)
 
 def sam_node(state: BizState) -> Dict[str, Any]:
-    msgs, provenance = build_coach_prompt_with_rag(SAM_SYSTEM, state.get("business_description", ""), state.get("goal", ""), state.get("kpis", {}), "sam_ovens")
-    resp = llm.invoke(msgs)
-    parsed = safe_parse_json(getattr(resp, "content", str(resp)))
-    parsed = validate_and_fix_json(parsed, llm, msgs)
-    return {"analysis_sam": {"analysis": parsed, "provenance": provenance}}
+    return _run_coach(SAM_SYSTEM, "sam_ovens", "analysis_sam", state)
 
 def alex_node(state: BizState) -> Dict[str, Any]:
-    msgs, provenance = build_coach_prompt_with_rag(ALEX_SYSTEM, state.get("business_description", ""), state.get("goal", ""), state.get("kpis", {}), "alex_hormozi")
-    resp = llm.invoke(msgs)
-    parsed = safe_parse_json(getattr(resp, "content", str(resp)))
-    parsed = validate_and_fix_json(parsed, llm, msgs)
-    return {"analysis_alex": {"analysis": parsed, "provenance": provenance}}
+    return _run_coach(ALEX_SYSTEM, "alex_hormozi", "analysis_alex", state)
+
+async def adan_node(state: BizState) -> Dict[str, Any]:
+    return await _arun_coach(DAN_SYSTEM, "dan_martell", "analysis_dan", state)
+
+async def asam_node(state: BizState) -> Dict[str, Any]:
+    return await _arun_coach(SAM_SYSTEM, "sam_ovens", "analysis_sam", state)
+
+async def aalex_node(state: BizState) -> Dict[str, Any]:
+    return await _arun_coach(ALEX_SYSTEM, "alex_hormozi", "analysis_alex", state)
 
 # ========== MERGE NODE ==========
 def merge_node(state: BizState) -> Dict[str, Any]:
+    with TRACER.span("merge", trace_id=_current_thread_id()) as sp:
+        out = _merge_analyses(state)
+        errors = validate_final_report(out["final_report"])
+        sp.set(report_errors=len(errors))
+    if errors:
+        print(f"final_report failed validation ({len(errors)} errors), first: {errors[0]}")
+    return {**out, "report_errors": errors}
+
+
+def _merge_analyses(state: BizState) -> Dict[str, Any]:
     # Collect analyses from unique per-coach keys
     analyses_list: List[Dict[str, Any]] = []
-    if "analysis_dan" in state and state["analysis_dan"] is not None:
-        a = state["analysis_dan"]
-        # handle both shapes: either {'analysis': {...}, 'provenance': [...] } or direct dict
+    for key, coach in (("analysis_dan", "dan_martell"), ("analysis_sam", "sam_ovens"), ("analysis_alex", "alex_hormozi")):
+        a = state.get(key)
+        if a is None:
+            continue
+        # handle both shapes: either {'analysis': {...}, 'provenance': [...] } or direct dict;
+        # streamed analyses that are still being generated carry "partial": True
         if isinstance(a, dict) and "analysis" in a:
-            analyses_list.append({"coach": "dan_martell", "analysis": a["analysis"], "provenance": a.get("provenance", [])})
+            analyses_list.append({"coach": coach, "analysis": a["analysis"], "provenance": a.get("provenance", []),
+                                  "partial": bool(a.get("partial"))})
         else:
-            analyses_list.append({"coach": "dan_martell", "analysis": a, "provenance": []})
-    if "analysis_sam" in state and state["analysis_sam"] is not None:
-        a = state["analysis_sam"]
-        if isinstance(a, dict) and "analysis" in a:
-            analyses_list.append({"coach": "sam_ovens", "analysis": a["analysis"], "provenance": a.get("provenance", [])})
-        else:
-            analyses_list.append({"coach": "sam_ovens", "analysis": a, "provenance": []})
-    if "analysis_alex" in state and state["analysis_alex"] is not None:
-        a = state["analysis_alex"]
-        if isinstance(a, dict) and "analysis" in a:
-            analyses_list.append({"coach": "alex_hormozi", "analysis": a["analysis"], "provenance": a.get("provenance", [])})
-        else:
-            analyses_list.append({"coach": "alex_hormozi", "analysis": a, "provenance": []})
+            analyses_list.append({"coach": coach, "analysis": a, "provenance": [], "partial": False})
 
     merged = {
         "business_snapshot": {
@@ -373,6 +1043,8 @@ def merge_node(state: BizState) -> Dict[str, Any]:
             "analysis": a["analysis"],
             "provenance": a.get("provenance", [])
         }
+        if a["partial"]:
+            merged["coach_insights"][a["coach"]]["partial"] = True
         if isinstance(a["analysis"], dict):
             for b in a["analysis"].get("bottlenecks", []):
                 b_copy = dict(b)
@@ -420,17 +1092,47 @@ def merge_node(state: BizState) -> Dict[str, Any]:
     return {"final_report": merged}
 
 # ========== GRAPH BUILDER ==========
-def build_graph():
+# ---------- CHECKPOINTING ----------
+# memory (default, lost on restart) | sqlite (durable; threads can be resumed with resume_session)
+CHECKPOINTER = os.getenv("CHECKPOINTER", "memory").strip().lower()
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB", "data/checkpoints/graph.sqlite")
+CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", 10))
+CHECKPOINT_MAX_AGE_DAYS = float(os.getenv("CHECKPOINT_MAX_AGE_DAYS", 7))
+_SQLITE_SAVERS: Dict[str, SQLiteCheckpointSaver] = {}
+
+
+def make_checkpointer(kind: Optional[str] = None):
+    """Checkpointer for compiled graphs. SQLite savers are shared per file within a process."""
+    kind = (kind or CHECKPOINTER).strip().lower()
+    if kind == "memory":
+        return MemorySaver()
+    if kind == "sqlite":
+        saver = _SQLITE_SAVERS.get(CHECKPOINT_DB)
+        if saver is None:
+            saver = _SQLITE_SAVERS[CHECKPOINT_DB] = SQLiteCheckpointSaver(
+                Path(CHECKPOINT_DB),
+                keep_last=CHECKPOINT_KEEP_LAST,
+                max_age_seconds=CHECKPOINT_MAX_AGE_DAYS * 24 * 3600,
+            )
+        return saver
+    raise ValueError(f"Unknown CHECKPOINTER '{kind}' (expected memory or sqlite)")
+
+
+def _assemble_graph(retrieve, dan, sam, alex, checkpointer=None):
     g = StateGraph(BizState)
-    g.add_node("dan_analysis", dan_node)
-    g.add_node("sam_analysis", sam_node)
-    g.add_node("alex_analysis", alex_node)
+    g.add_node("retrieve_evidence", retrieve)
+    g.add_node("dan_analysis", dan)
+    g.add_node("sam_analysis", sam)
+    g.add_node("alex_analysis", alex)
     g.add_node("merge_report", merge_node)
 
-    # START -> each coach
-    g.add_edge(START, "dan_analysis")
-    g.add_edge(START, "sam_analysis")
-    g.add_edge(START, "alex_analysis")
+    # START -> one fan-out retrieval for all coaches
+    g.add_edge(START, "retrieve_evidence")
+
+    # retrieval -> each coach
+    g.add_edge("retrieve_evidence", "dan_analysis")
+    g.add_edge("retrieve_evidence", "sam_analysis")
+    g.add_edge("retrieve_evidence", "alex_analysis")
 
     # each coach -> merge
     g.add_edge("dan_analysis", "merge_report")
@@ -440,10 +1142,274 @@ def build_graph():
     # merge -> END
     g.add_edge("merge_report", END)
 
-    memory = MemorySaver()
+    memory = checkpointer or make_checkpointer()
     graph = g.compile(checkpointer=memory)
     return graph, memory
 
+def build_graph(checkpointer=None):
+    return _assemble_graph(retrieve_node, dan_node, sam_node, alex_node, checkpointer)
+
+def build_async_graph(checkpointer=None):
+    """
+    Same topology as build_graph() but with native async coach nodes.
+    Drive it with `await graph.ainvoke(state, config)`; many sessions can share one loop,
+    with LLM / embedding / Chroma calls capped by UPSTREAM_LIMITS.
+    """
+    return _assemble_graph(aretrieve_node, adan_node, asam_node, aalex_node, checkpointer)
+
+# ========== SESSIONS ==========
+# A session is one thread_id in the checkpointer. When a node raises (e.g. an LLM timeout in one
+# coach), LangGraph keeps the writes of the nodes that finished in the same step, so resuming
+# re-runs only the failed node(s) and whatever comes after them.
+def _thread_config(thread_id: str) -> Dict[str, Any]:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def _status_from_snapshot(snap) -> Dict[str, Any]:
+    exists = bool(snap.config.get("configurable", {}).get("checkpoint_id"))
+    failed = {t.name: t.error for t in snap.tasks if getattr(t, "error", None)}
+    return {
+        "exists": exists,
+        "done": exists and not snap.next,
+        "next": list(snap.next),
+        "failed": {name: err if isinstance(err, str) else f"{type(err).__name__}: {err}" for name, err in failed.items()},
+        "has_final_report": bool(snap.values.get("final_report")),
+    }
+
+
+def session_status(graph, thread_id: str) -> Dict[str, Any]:
+    """{"exists", "done", "next": [pending nodes], "failed": {node: error}, "has_final_report"}"""
+    return _status_from_snapshot(graph.get_state(_thread_config(thread_id)))
+
+
+async def asession_status(graph, thread_id: str) -> Dict[str, Any]:
+    return _status_from_snapshot(await graph.aget_state(_thread_config(thread_id)))
+
+
+def resume_session(graph, thread_id: str) -> Dict[str, Any]:
+    """
+    Continue a thread from its last checkpoint, re-running only the nodes that did not finish.
+    Returns the final state; a finished thread is returned as is. Raises KeyError for unknown threads.
+    """
+    config = _thread_config(thread_id)
+    status = session_status(graph, thread_id)
+    if not status["exists"]:
+        raise KeyError(f"No checkpoint for thread '{thread_id}'")
+    if status["done"]:
+        return graph.get_state(config).values
+    return graph.invoke(None, config)
+
+
+async def aresume_session(graph, thread_id: str) -> Dict[str, Any]:
+    config = _thread_config(thread_id)
+    status = await asession_status(graph, thread_id)
+    if not status["exists"]:
+        raise KeyError(f"No checkpoint for thread '{thread_id}'")
+    if status["done"]:
+        return (await graph.aget_state(config)).values
+    return await graph.ainvoke(None, config)
+
+# ========== STREAMING ==========
+NODE_COACHES = {"dan_analysis": "dan_martell", "sam_analysis": "sam_ovens", "alex_analysis": "alex_hormozi"}
+
+
+async def astream_session(initial_state: BizState, thread_id: Optional[str] = None, graph=None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run the async graph and yield progress events as they happen (every event has "event",
+    "thread_id" and "t" = seconds since start):
+        run_started, retrieval_done (per coach), llm_started, token (LLM text deltas),
+        repairing, parsed (ok / repaired / cache_hit), coach_done (with the analysis),
+        merge_done (with final_report, report_errors), run_finished | run_failed
+        bottleneck (each bottlenecks[] entry of a coach answer as soon as it has streamed in),
+        field (each other top-level answer field once complete),
+        provisional_ranking (consensus_bottlenecks merged from finished + partial analyses,
+        with partial_coaches / pending_coaches; sent until every coach is done)
+    Cache hits produce no token events; their text arrives with coach_done.
+    """
+    if graph is None:
+        graph, _ = build_async_graph()
+    thread_id = thread_id or f"biz-{uuid.uuid4().hex[:8]}"
+    config = _thread_config(thread_id)
+    t0 = time.time()
+
+    def ev(event: str, **data: Any) -> Dict[str, Any]:
+        return {"event": event, "thread_id": thread_id, "t": round(time.time() - t0, 3), **data}
+
+    parsers: Dict[str, CoachStreamParser] = {}
+    finished: Dict[str, Any] = {}
+
+    def ranking() -> Dict[str, Any]:
+        report = provisional_report({**initial_state, **finished},
+                                    {c: p.partial() for c, p in parsers.items() if COACH_SPECS[c][1] not in finished})
+        return ev("provisional_ranking", consensus_bottlenecks=report["consensus_bottlenecks"],
+                  partial_coaches=report["partial_coaches"], pending_coaches=report["pending_coaches"])
+
+    yield ev("run_started")
+    try:
+        async for mode, chunk in graph.astream(initial_state, config, stream_mode=["updates", "messages", "custom"]):
+            if mode == "custom":
+                if chunk.get("event") == "llm_started" and chunk.get("coach") in COACH_SPECS:
+                    parsers[chunk["coach"]] = CoachStreamParser()
+                yield ev(**chunk)
+            elif mode == "messages":
+                msg, meta = chunk
+                text = getattr(msg, "content", "")
+                if isinstance(text, str) and text:
+                    coach = NODE_COACHES.get(meta.get("langgraph_node"))
+                    yield ev("token", coach=coach, text=text)
+                    parser = parsers.get(coach)
+                    if parser is None or COACH_SPECS[coach][1] in finished:
+                        continue
+                    new_items = False
+                    for kind, key, value in parser.feed(text):
+                        if kind == "bottleneck":
+                            new_items = True
+                            yield ev("bottleneck", coach=coach, index=key, bottleneck=value)
+                        elif key != "bottlenecks":
+                            yield ev("field", coach=coach, name=key, value=value)
+                    if new_items:
+                        yield ranking()
+            elif mode == "updates":
+                for node, update in (chunk or {}).items():
+                    if node in NODE_COACHES:
+                        finished.update(update or {})
+                        out = next(iter(update.values()), {}) if update else {}
+                        yield ev("coach_done", coach=NODE_COACHES[node], analysis=out.get("analysis"))
+                        if len(finished) < len(COACH_SPECS):
+                            yield ranking()
+                    elif node == "merge_report":
+                        yield ev("merge_done", final_report=(update or {}).get("final_report"),
+                                 report_errors=(update or {}).get("report_errors", []))
+    except Exception as exc:
+        yield ev("run_failed", error=f"{type(exc).__name__}: {exc}")
+        return
+    yield ev("run_finished")
+
+
+def provisional_report(state: BizState, partial: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    merge_node over the analyses finished in `state` plus partially streamed ones
+    (partial: coach -> fields parsed so far). Adds "provisional", "partial_coaches" and "pending_coaches".
+    """
+    merged_state = dict(state)
+    for coach, analysis in partial.items():
+        key = COACH_SPECS[coach][1]
+        if merged_state.get(key) is None and analysis:
+            merged_state[key] = {"analysis": analysis, "provenance": [], "partial": True}
+    report = _merge_analyses(merged_state)["final_report"]
+    report["provisional"] = True
+    report["partial_coaches"] = [c for c, i in report["coach_insights"].items() if i.get("partial")]
+    report["pending_coaches"] = [c for c, (_, key) in COACH_SPECS.items() if merged_state.get(key) is None]
+    return report
+
+
+def stream_session_ndjson(initial_state: BizState, thread_id: Optional[str] = None, out=None) -> Optional[Dict[str, Any]]:
+    """astream_session() written as newline-delimited JSON (stdout by default). Returns the final report."""
+    out = out or sys.stdout
+    final_report: Dict[str, Optional[Dict[str, Any]]] = {"value": None}
+
+    async def run():
+        async for event in astream_session(initial_state, thread_id):
+            if event["event"] == "merge_done":
+                final_report["value"] = event.get("final_report")
+            out.write(json.dumps(event, ensure_ascii=False, default=str) + "\n")
+            out.flush()
+
+    # pipeline diagnostics are print()ed; keep them off the event stream
+    with contextlib.redirect_stdout(sys.stderr):
+        asyncio.run(run())
+    return final_report["value"]
+
+
+# ========== PARTIAL RE-RUN ==========
+# Recover a run where one coach came back unusable (e.g. only {"raw_text": ...}) without paying
+# for the other coaches again: re-run just that coach node, then merge_node.
+COACH_SPECS = {  # coach -> (system prompt, state key)
+    "dan_martell": (DAN_SYSTEM, "analysis_dan"),
+    "sam_ovens": (SAM_SYSTEM, "analysis_sam"),
+    "alex_hormozi": (ALEX_SYSTEM, "analysis_alex"),
+}
+
+
+def state_from_final_report(final_report: Dict[str, Any]) -> BizState:
+    """Rebuild graph state from a saved final report (a run store record's "final_report" or final_report_*.json)."""
+    snap = final_report.get("business_snapshot", {}) or {}
+    state: BizState = {"business_description": snap.get("description", ""), "goal": snap.get("goal", "")}
+    if snap.get("kpis"):
+        state["kpis"] = snap["kpis"]
+    insights = final_report.get("coach_insights", {}) or {}
+    for coach, (_, key) in COACH_SPECS.items():
+        if coach in insights:
+            ins = insights[coach] or {}
+            state[key] = {"analysis": ins.get("analysis"), "provenance": ins.get("provenance", [])}
+    return state
+
+
+def failed_coaches(state: BizState) -> List[str]:
+    """Coaches whose analysis is missing or fails CoachAnalysis validation (same test as the repair step)."""
+    failed = []
+    for coach, (_, key) in COACH_SPECS.items():
+        a = state.get(key)
+        analysis = a.get("analysis") if isinstance(a, dict) and "analysis" in a else a
+        if not isinstance(analysis, dict) or invalid_fields(analysis):
+            failed.append(coach)
+    return failed
+
+
+def _coaches_to_rerun(state: BizState, coaches: Optional[List[str]]) -> List[str]:
+    coaches = failed_coaches(state) if coaches is None else list(coaches)
+    unknown = [c for c in coaches if c not in COACH_SPECS]
+    if unknown:
+        raise ValueError(f"Unknown coach(es) {unknown}; expected some of {list(COACH_SPECS)}")
+    return coaches
+
+
+def rerun_coaches(state: BizState, coaches: Optional[List[str]] = None) -> BizState:
+    """
+    Re-run only `coaches` (default: failed_coaches(state)) and merge_node; the other analyses and any
+    retrieved evidence in state are reused. The LLM cache is refreshed for the re-run calls, so a
+    cached bad answer is not simply returned again. Returns the updated state (with final_report).
+    """
+    coaches = _coaches_to_rerun(state, coaches)
+    new_state: BizState = dict(state)
+    if coaches:
+        with ThreadPoolExecutor(max_workers=len(coaches)) as pool:
+            updates = list(pool.map(
+                lambda c: _run_coach(COACH_SPECS[c][0], c, COACH_SPECS[c][1], state, refresh=True), coaches))
+        for upd in updates:
+            new_state.update(upd)
+    new_state.update(merge_node(new_state))
+    return new_state
+
+
+async def arerun_coaches(state: BizState, coaches: Optional[List[str]] = None) -> BizState:
+    coaches = _coaches_to_rerun(state, coaches)
+    new_state: BizState = dict(state)
+    updates = await asyncio.gather(*[
+        _arun_coach(COACH_SPECS[c][0], c, COACH_SPECS[c][1], state, refresh=True) for c in coaches
+    ])
+    for upd in updates:
+        new_state.update(upd)
+    new_state.update(merge_node(new_state))
+    return new_state
+
+
+def rerun_session_coaches(graph, thread_id: str, coaches: Optional[List[str]] = None) -> BizState:
+    """
+    rerun_coaches() on a checkpointed thread; the new analyses and final_report are written back
+    to the thread as a merge_report update. (For a thread that crashed mid-run, use resume_session.)
+    """
+    config = _thread_config(thread_id)
+    values = graph.get_state(config).values
+    if not values:
+        raise KeyError(f"No checkpoint for thread '{thread_id}'")
+    coaches = _coaches_to_rerun(values, coaches)
+    new_state = rerun_coaches(values, coaches)
+    keys = [COACH_SPECS[c][1] for c in coaches] + ["final_report", "report_errors"]
+    graph.update_state(config, {k: new_state[k] for k in keys}, as_node="merge_report")
+    return new_state
+
+
 # ========== VERBOSE RUNNER ==========
 def run_all_coaches_and_save_verbose():
     """Verbose runner with diagnostics."""
@@ -497,6 +1463,7 @@ def run_all_coaches_and_save_verbose():
 
     try:
         t0 = time.time()
+        warm_vectorstores()
         graph, memory = build_graph()
         print("Graph built successfully.")
         thread_id = f"biz-{uuid.uuid4().hex[:8]}"
@@ -505,6 +1472,7 @@ def run_all_coaches_and_save_verbose():
         final_state = graph.invoke(initial_state, thread)
         t1 = time.time()
         print(f"Graph invoked. Duration: {t1-t0:.2f}s")
+        print("LLM cache stats:", LLM_CACHE.stats)
         print("Final state keys:", list(final_state.keys()))
         print("\n===== FINAL MERGED REPORT (pretty-print) =====")
         try:
@@ -536,11 +1504,11 @@ def run_all_coaches_and_save_verbose():
                 "final_report": final_state.get("final_report", {}),
                 "timestamp": time.time()
             }
-            Path("data/metadata").mkdir(parents=True, exist_ok=True)
-            with open("data/metadata/runs.jsonl", "a", encoding="utf-8") as fh:
-                fh.write(json.dumps(run_meta, ensure_ascii=False) + "\n")
-        except Exception:
-            pass
+            store = default_run_store()
+            store.append(run_meta)
+            store.close()
+        except Exception as e:
+            print(f"Could not record run in the run store: {e}")
 
         try:
             if hasattr(memory, "list_runs"):
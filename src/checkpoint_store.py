@@ -0,0 +1,342 @@
+# src/checkpoint_store.py
+"""
+File-backed LangGraph checkpointer (SQLite, WAL mode).
+
+- checkpoints and pending task writes are stored per (thread_id, checkpoint_ns, checkpoint_id),
+  so a thread can be resumed after a restart; writes of coach nodes that finished before a
+  crash are replayed instead of re-run
+- put() only queues its row; a background thread commits queued rows in one transaction every
+  flush_interval seconds (or as soon as batch_size rows are queued). put_writes() - the result
+  of a finished node, e.g. one coach call - commits the queue before returning, so a crash never
+  loses completed work; at most the latest checkpoint rows, which are rebuilt from those writes.
+  Reads flush first, so the process always sees its own writes
+- retention: only the newest keep_last checkpoints per thread are kept, and checkpoints older
+  than max_age_seconds are dropped (applied by the flusher every prune_interval seconds)
+"""
+import time
+import atexit
+import sqlite3
+import asyncio
+import threading
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+DEFAULT_PATH = Path("data/checkpoints/graph.sqlite")
+FLUSH_INTERVAL_SECONDS = 0.2
+BATCH_SIZE = 64
+KEEP_LAST = 10
+MAX_AGE_SECONDS = 7 * 24 * 3600
+PRUNE_INTERVAL_SECONDS = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE INDEX IF NOT EXISTS checkpoints_created_at ON checkpoints (created_at);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver):
+    """Drop-in replacement for MemorySaver that survives restarts and keeps memory flat."""
+
+    def __init__(
+        self,
+        path: Path = DEFAULT_PATH,
+        *,
+        serde=None,
+        flush_interval: float = FLUSH_INTERVAL_SECONDS,
+        batch_size: int = BATCH_SIZE,
+        keep_last: Optional[int] = KEEP_LAST,
+        max_age_seconds: Optional[float] = MAX_AGE_SECONDS,
+        prune_interval: float = PRUNE_INTERVAL_SECONDS,
+    ):
+        super().__init__(serde=serde)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.keep_last = keep_last
+        self.max_age_seconds = max_age_seconds
+        self.prune_interval = prune_interval
+
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._db_lock = threading.RLock()
+        self._queue_lock = threading.Lock()
+        self._pending: List[Tuple[str, tuple]] = []
+        self._wake = threading.Event()
+        self._closed = False
+        self._last_prune = 0.0
+        self._flusher = threading.Thread(target=self._flush_loop, name="checkpoint-flusher", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    # ----- write batching -----
+    def _enqueue(self, rows: List[Tuple[str, tuple]]) -> None:
+        with self._queue_lock:
+            self._pending.extend(rows)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Commit queued rows in one transaction. Returns the number of rows written."""
+        with self._db_lock:
+            with self._queue_lock:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return 0
+            self._conn.execute("BEGIN")
+            try:
+                for sql, params in rows:
+                    self._conn.execute(sql, params)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return len(rows)
+
+    def _flush_loop(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+                if time.time() - self._last_prune >= self.prune_interval:
+                    self.apply_retention()
+            except Exception as e:
+                print(f"Checkpoint flush failed: {e}")
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._flusher.join(timeout=5)
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+    # ----- retention -----
+    def apply_retention(self) -> int:
+        """Enforce keep_last / max_age_seconds. Returns the number of checkpoints deleted."""
+        self._last_prune = time.time()
+        deleted = 0
+        with self._db_lock:
+            self.flush()
+            self._conn.execute("BEGIN")
+            try:
+                if self.max_age_seconds is not None:
+                    cur = self._conn.execute(
+                        "DELETE FROM checkpoints WHERE created_at < ?", (time.time() - self.max_age_seconds,))
+                    deleted += cur.rowcount
+                if self.keep_last:
+                    cur = self._conn.execute(
+                        """DELETE FROM checkpoints WHERE rowid IN (
+                               SELECT rowid FROM (
+                                   SELECT rowid, ROW_NUMBER() OVER (
+                                       PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC) AS rn
+                                   FROM checkpoints)
+                               WHERE rn > ?)""", (self.keep_last,))
+                    deleted += cur.rowcount
+                if deleted:
+                    self._delete_orphan_writes()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return deleted
+
+    def _delete_orphan_writes(self) -> None:
+        self._conn.execute(
+            """DELETE FROM writes WHERE NOT EXISTS (
+                   SELECT 1 FROM checkpoints c WHERE c.thread_id = writes.thread_id
+                   AND c.checkpoint_ns = writes.checkpoint_ns AND c.checkpoint_id = writes.checkpoint_id)""")
+
+    def prune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        with self._db_lock:
+            self.flush()
+            self._conn.execute("BEGIN")
+            try:
+                for tid in thread_ids:
+                    if strategy == "delete":
+                        self._conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (tid,))
+                    else:
+                        self._conn.execute(
+                            """DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_id NOT IN (
+                                   SELECT MAX(checkpoint_id) FROM checkpoints WHERE thread_id = ? GROUP BY checkpoint_ns)""",
+                            (tid, tid))
+                self._delete_orphan_writes()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.prune([thread_id], strategy="delete")
+
+    # ----- BaseCheckpointSaver -----
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        conf = config["configurable"]
+        thread_id = conf["thread_id"]
+        checkpoint_ns = conf.get("checkpoint_ns", "")
+        ctype, cblob = self.serde.dumps_typed(checkpoint)
+        mtype, mblob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        self._enqueue([(
+            "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (thread_id, checkpoint_ns, checkpoint["id"], conf.get("checkpoint_id"),
+             ctype, cblob, mtype, mblob, time.time()),
+        )])
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        conf = config["configurable"]
+        key = (conf["thread_id"], conf.get("checkpoint_ns", ""), conf["checkpoint_id"])
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            idx = WRITES_IDX_MAP.get(channel, idx)
+            # regular writes are first-wins (a retried task must not clobber them); special ones overwrite
+            verb = "INSERT OR REPLACE" if idx < 0 else "INSERT OR IGNORE"
+            vtype, vblob = self.serde.dumps_typed(value)
+            rows.append((f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                         (*key, task_id, idx, channel, vtype, vblob, task_path)))
+        self._enqueue(rows)
+        # completed-task writes are what resume relies on to skip finished coaches: commit now
+        self.flush()
+
+    def _tuple_from_row(self, row: tuple) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, ctype, cblob, mtype, mblob = row
+        writes = self._conn.execute(
+            """SELECT task_id, channel, type, value FROM writes
+               WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?
+               ORDER BY task_path, task_id, idx""",
+            (thread_id, checkpoint_ns, checkpoint_id)).fetchall()
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            checkpoint=self.serde.loads_typed((ctype, cblob)),
+            metadata=self.serde.loads_typed((mtype, mblob)),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+                if parent_id else None
+            ),
+            pending_writes=[(tid, ch, self.serde.loads_typed((t, v))) for tid, ch, t, v in writes],
+        )
+
+    _COLUMNS = "thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        conf = config["configurable"]
+        thread_id = conf["thread_id"]
+        checkpoint_ns = conf.get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        with self._db_lock:
+            self.flush()
+            if checkpoint_id:
+                row = self._conn.execute(
+                    f"SELECT {self._COLUMNS} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id)).fetchone()
+            else:
+                row = self._conn.execute(
+                    f"""SELECT {self._COLUMNS} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?
+                        ORDER BY checkpoint_id DESC LIMIT 1""",
+                    (thread_id, checkpoint_ns)).fetchone()
+            return self._tuple_from_row(row) if row else None
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        where, params = [], []
+        if config:
+            conf = config["configurable"]
+            where.append("thread_id = ?")
+            params.append(conf["thread_id"])
+            if conf.get("checkpoint_ns") is not None:
+                where.append("checkpoint_ns = ?")
+                params.append(conf["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                params.append(get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            where.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+        sql = f"SELECT {self._COLUMNS} FROM checkpoints"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC"
+
+        with self._db_lock:
+            self.flush()
+            out = []
+            for row in self._conn.execute(sql, params).fetchall():
+                if limit is not None and len(out) >= limit:
+                    break
+                tup = self._tuple_from_row(row)
+                if filter and not all(tup.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                out.append(tup)
+        yield from out
+
+    def thread_ids(self) -> List[str]:
+        with self._db_lock:
+            self.flush()
+            return [r[0] for r in self._conn.execute("SELECT DISTINCT thread_id FROM checkpoints ORDER BY thread_id")]
+
+    # ----- async: put only queues; put_writes and reads go to a worker thread -----
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def aprune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        await asyncio.to_thread(self.prune, thread_ids, strategy=strategy)
@@ -0,0 +1,169 @@
+# src/coach_output.py
+"""
+Typed coach output and the helpers around it.
+
+- CoachAnalysis: pydantic model of the COACH_JSON_SCHEMA answer; invalid_fields() lists the
+  top-level fields of a parsed answer that are missing or the wrong shape.
+- response_format(mode): the OpenAI response_format for a coach call
+  ("json_schema" = strict schema from CoachAnalysis, "json_object" = JSON mode, "text" = none).
+- build_repair_messages(): a small follow-up call that sends the previous answer and a short
+  business snapshot and asks for the broken fields only, instead of re-sending the whole prompt
+  and evidence.
+- COACH_OUTPUT_METRICS: per-coach parse-failure / repair counters.
+"""
+import copy
+import json
+import threading
+from typing import Any, Dict, List, Literal, Optional
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from pydantic import BaseModel, ValidationError
+
+OUTPUT_MODES = ("json_schema", "json_object", "text")
+# previous answers longer than this are cut in the repair prompt
+REPAIR_CONTEXT_CHARS = 6000
+REPAIR_MARKER = "Your previous response was missing keys"
+# business description / goal / kpis are cut to this many chars in the repair prompt's snapshot
+REPAIR_SNAPSHOT_CHARS = 600
+
+
+class Bottleneck(BaseModel):
+    name: str
+    diagnosis: str
+    tactical_fix: List[str]
+    priority: Literal["low", "medium", "high"]
+
+
+class ProposedKPI(BaseModel):
+    kpi: str
+    why: str
+
+
+class CoachAnalysis(BaseModel):
+    bottlenecks: List[Bottleneck]
+    top_recommendation: str
+    kpis_to_track: List[str]
+    proposed_kpis: List[ProposedKPI] = []
+    summary: str
+
+
+# what each field should look like, for the repair prompt
+FIELD_TEMPLATES = {
+    "bottlenecks": [{"name": "", "diagnosis": "", "tactical_fix": ["", ""], "priority": "low|medium|high"}],
+    "top_recommendation": "",
+    "kpis_to_track": ["kpi_name1", "kpi_name2"],
+    "proposed_kpis": [{"kpi": "", "why": ""}],
+    "summary": "",
+}
+
+
+def invalid_fields(parsed: Any) -> List[str]:
+    """Top-level CoachAnalysis fields that are missing or fail validation, in schema order."""
+    if not isinstance(parsed, dict):
+        return [name for name, f in CoachAnalysis.model_fields.items() if f.is_required()]
+    try:
+        CoachAnalysis.model_validate(parsed)
+        return []
+    except ValidationError as e:
+        bad = {err["loc"][0] for err in e.errors() if err.get("loc")}
+        return [name for name in CoachAnalysis.model_fields if name in bad]
+
+
+def _strict(schema: Dict[str, Any]) -> Dict[str, Any]:
+    # OpenAI strict mode: every object closed and every property required
+    if schema.get("type") == "object" and "properties" in schema:
+        schema["additionalProperties"] = False
+        schema["required"] = list(schema["properties"])
+    for value in schema.values():
+        if isinstance(value, dict):
+            _strict(value)
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict):
+                    _strict(item)
+    schema.pop("default", None)
+    return schema
+
+
+_STRICT_SCHEMA = _strict(copy.deepcopy(CoachAnalysis.model_json_schema()))
+
+
+def response_format(mode: str) -> Optional[Dict[str, Any]]:
+    if mode == "json_schema":
+        return {"type": "json_schema", "json_schema": {"name": "coach_analysis", "strict": True, "schema": _STRICT_SCHEMA}}
+    if mode == "json_object":
+        return {"type": "json_object"}
+    if mode == "text":
+        return None
+    raise ValueError(f"Unknown coach output mode '{mode}' (expected {', '.join(OUTPUT_MODES)})")
+
+
+def _snapshot_text(context: Optional[Dict[str, Any]]) -> str:
+    if not context:
+        return ""
+    lines = [f"{label}: {str(context.get(key) or '')[:REPAIR_SNAPSHOT_CHARS]}"
+             for key, label in (("description", "Business"), ("goal", "Goal")) if context.get(key)]
+    if context.get("kpis"):
+        lines.append("KPIs: " + json.dumps(context["kpis"], ensure_ascii=False)[:REPAIR_SNAPSHOT_CHARS])
+    return "Business snapshot:\n" + "\n".join(lines) + "\n\n" if lines else ""
+
+
+def build_repair_messages(parsed: Dict[str, Any], fields: List[str], context: Optional[Dict[str, Any]] = None) -> List[Any]:
+    """
+    Messages asking only for `fields`, given the previous (partial or unparsable) answer.
+    context ({description, goal, kpis}) is added as a short business snapshot so regenerated
+    fields like bottlenecks stay about this business.
+    """
+    previous = parsed.get("raw_text") if set(parsed) == {"raw_text"} else json.dumps(parsed, ensure_ascii=False)
+    previous = str(previous)[:REPAIR_CONTEXT_CHARS]
+    template = json.dumps({f: FIELD_TEMPLATES.get(f, "") for f in fields}, indent=2)
+    return [
+        SystemMessage(content="You are a strict JSON assistant. Return ONLY a single valid JSON object."),
+        HumanMessage(content=(
+            _snapshot_text(context)
+            + f"{REPAIR_MARKER} (or had invalid values): {', '.join(fields)}.\n\n"
+            f"Previous response:\n{previous}\n\n"
+            f"Return ONLY a JSON object with exactly these keys, consistent with the previous response:\n{template}\n"
+            + ("Each bottleneck priority must be one of low, medium, high. " if "bottlenecks" in fields else "")
+            + "If you can't determine a value, use \"I_DONT_KNOW\"."
+        )),
+    ]
+
+
+class CoachOutputMetrics:
+    """Thread-safe per-coach counters: calls, parse_failures, invalid, repairs, repair_failures."""
+
+    FIELDS = ("calls", "parse_failures", "invalid", "repairs", "repair_failures")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def record(self, coach: str, parse_failed: bool, invalid: bool, repaired: bool, still_invalid: bool) -> None:
+        with self._lock:
+            c = self._counts.setdefault(coach, dict.fromkeys(self.FIELDS, 0))
+            c["calls"] += 1
+            c["parse_failures"] += int(parse_failed)
+            c["invalid"] += int(invalid)
+            c["repairs"] += int(repaired)
+            c["repair_failures"] += int(repaired and still_invalid)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """{coach | "all": counts + parse_failure_rate, repair_rate, repair_success_rate}"""
+        with self._lock:
+            counts = {k: dict(v) for k, v in self._counts.items()}
+        if counts:
+            counts["all"] = {f: sum(c[f] for c in counts.values()) for f in self.FIELDS}
+        for c in counts.values():
+            calls = c["calls"] or 1
+            c["parse_failure_rate"] = round(c["parse_failures"] / calls, 4)
+            c["repair_rate"] = round(c["repairs"] / calls, 4)
+            c["repair_success_rate"] = round(1 - c["repair_failures"] / c["repairs"], 4) if c["repairs"] else 1.0
+        return counts
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+
+COACH_OUTPUT_METRICS = CoachOutputMetrics()
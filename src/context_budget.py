@@ -0,0 +1,158 @@
+# src/context_budget.py
+"""
+Token-budgeted evidence packing for coach prompts.
+
+Retrieved chunks arrive in relevance order. pack_evidence():
+1. adds chunks in rank order while they fit the budget; the first one that does not fit
+   is trimmed to the remaining tokens (if enough remain to be useful) and packing stops
+2. drops the text a chunk shares with a neighbour from the same source (the chunker overlaps
+   consecutive windows by ~80 tokens, so adjacent chunk_ids repeat text), but only when that
+   neighbour was already packed untrimmed, so the shared text is never lost from the prompt
+
+Chunks written by a current preprocess run carry token_count and char offsets in their metadata;
+those are used directly, and text is only re-tokenized for older chunks or when it was cut.
+"""
+import functools
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+MODEL_FOR_TOKENIZER = "gpt-3.5-turbo"
+MIN_TRIM_TOKENS = 64           # don't bother adding a trimmed stub smaller than this
+OVERLAP_PROBE_CHARS = 32       # prefix of the later chunk searched for in the earlier one
+TRIM_MARKER = " …"
+
+
+_encoder_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def _load_encoder():
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(MODEL_FOR_TOKENIZER)
+        except Exception:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"tiktoken unavailable, estimating tokens as chars/4 ({type(e).__name__})")
+        return None
+
+
+def get_encoder():
+    """tiktoken encoder, or None when it can't be loaded (e.g. offline without a cached vocab)."""
+    with _encoder_lock:
+        return _load_encoder()
+
+
+def count_tokens(text: str) -> int:
+    enc = get_encoder()
+    if enc is None:
+        return (len(text) + 3) // 4
+    return len(enc.encode(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    enc = get_encoder()
+    if enc is None:
+        return text[:max_tokens * 4]
+    toks = enc.encode(text)
+    return text if len(toks) <= max_tokens else enc.decode(toks[:max_tokens])
+
+
+def _overlap_chars(earlier: str, later: str) -> int:
+    """Length of the longest suffix of `earlier` that is a prefix of `later` (0 if none)."""
+    probe = later[:OVERLAP_PROBE_CHARS]
+    if not probe:
+        return 0
+    start = earlier.find(probe)
+    while start != -1:
+        tail = earlier[start:]
+        if later.startswith(tail):
+            return len(tail)
+        start = earlier.find(probe, start + 1)
+    return 0
+
+
+def _stored_tokens(meta: Dict[str, Any]) -> Optional[int]:
+    n = meta.get("token_count")
+    return n if isinstance(n, int) and n >= 0 else None
+
+
+def _offset_overlap(prev_meta: Dict[str, Any], meta: Dict[str, Any], prev: str, text: str) -> Optional[int]:
+    """Overlap from precomputed char offsets, or None when they are missing or disagree with the text."""
+    try:
+        n = int(prev_meta["char_end"]) - int(meta["char_start"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    n = max(0, min(n, len(text)))
+    if n == 0:
+        return 0
+    # a window edge can split a multibyte character, which decodes as U+FFFD on either side
+    tail = prev[-n:]
+    if len(tail) != n:
+        return None
+    ok = all(a == b or a == "\ufffd" or b == "\ufffd" for a, b in zip(text[:n], tail))
+    return n if ok else None
+
+
+def _chunk_pos(meta: Dict[str, Any]) -> Optional[Tuple[Any, int]]:
+    try:
+        return meta.get("source"), int(meta.get("chunk_id"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _shared_chars(prev: Tuple[str, Dict[str, Any]], nxt: Tuple[str, Dict[str, Any]]) -> int:
+    """Chars the start of chunk `nxt` repeats from the end of its predecessor `prev` (both (text, meta))."""
+    n = _offset_overlap(prev[1], nxt[1], prev[0], nxt[0])
+    return _overlap_chars(prev[0], nxt[0]) if n is None else n
+
+
+def pack_evidence(evidence: List[Tuple[str, Dict[str, Any]]], budget_tokens: int) -> Tuple[List[Tuple[str, Dict[str, Any], Dict[str, Any]]], int]:
+    """
+    Fit ranked evidence into budget_tokens.
+    Returns ([(text, meta, pack_info)], tokens_used); pack_info has tokens/trimmed/overlap_chars_removed.
+    """
+    packed = []
+    used = 0
+    # (source, chunk_id) -> original text/meta of chunks packed in full, the only safe dedup partners
+    whole: Dict[Tuple[Any, int], Tuple[str, Dict[str, Any]]] = {}
+    for text, meta in evidence:
+        if not text:
+            continue
+        remaining = budget_tokens - used
+        if remaining <= 0:
+            break
+        pos = _chunk_pos(meta)
+        original = (text, meta)
+        removed = 0
+        if pos is not None:
+            prev = whole.get((pos[0], pos[1] - 1))
+            if prev is not None:
+                cut = _shared_chars(prev, original)
+                text = text[cut:].lstrip()
+                removed += cut
+            nxt = whole.get((pos[0], pos[1] + 1))
+            if nxt is not None and text:
+                cut = min(_shared_chars(original, nxt), len(text))
+                text = text[:len(text) - cut].rstrip()
+                removed += cut
+        if not text:
+            continue
+        n = _stored_tokens(meta) if not removed else None
+        if n is None:
+            n = count_tokens(text)
+        trimmed = False
+        if n > remaining:
+            if remaining < MIN_TRIM_TOKENS:
+                break
+            text = truncate_to_tokens(text, remaining - count_tokens(TRIM_MARKER)) + TRIM_MARKER
+            n = count_tokens(text)
+            trimmed = True
+        used += n
+        packed.append((text, meta, {"tokens": n, "trimmed": trimmed, "overlap_chars_removed": removed}))
+        if trimmed:
+            break
+        if pos is not None:
+            whole[pos] = original
+    return packed, used
@@ -0,0 +1,134 @@
+# src/embedding_backends.py
+"""
+Pluggable embedding backends, selected with EMBEDDING_BACKEND:
+
+- "openai"  (default) OpenAIEmbeddings; uses the original per-coach collection names
+- "local"   sentence-transformers model on CPU (EMBEDDING_LOCAL_MODEL), batched numpy inference
+- "hashing" deterministic signed hashing vectorizer; no model, no network (tests/benchmarks)
+
+Vectors from different backends are not comparable, so every non-openai backend
+gets its own Chroma collection per coach: "<coach>__<backend tag>".
+"""
+import os
+import re
+import zlib
+from typing import Any, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_BACKEND = "openai"
+LOCAL_MODEL = os.getenv("EMBEDDING_LOCAL_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+HASHING_DIM = int(os.getenv("EMBEDDING_HASHING_DIM", 384))
+BATCH_SIZE = 64
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic bag-of-words vectors: unigrams + bigrams hashed (crc32) into `dim` signed
+    buckets, sublinear tf, L2-normalised. Cosine similarity behaves like a lexical overlap score.
+    """
+
+    def __init__(self, dim: int = HASHING_DIM):
+        self.dim = dim
+        self.model = f"hashing-{dim}"
+
+    def _features(self, text: str) -> List[int]:
+        words = _TOKEN_RE.findall(text.lower())
+        grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        return [zlib.crc32(g.encode("utf-8")) for g in grams]
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            h = np.asarray(self._features(text), dtype=np.uint32)
+            if h.size == 0:
+                continue
+            idx = (h % self.dim).astype(np.int64)
+            sign = np.where((h >> 31) & 1, -1.0, 1.0).astype(np.float32)
+            np.add.at(out[row], idx, sign)
+        out = np.sign(out) * np.log1p(np.abs(out))
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = [self._embed_batch(texts[i:i + BATCH_SIZE]) for i in range(0, len(texts), BATCH_SIZE)]
+        return np.vstack(vectors).tolist() if vectors else []
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_batch([text])[0].tolist()
+
+
+class LocalEmbeddings(Embeddings):
+    """sentence-transformers on CPU; the model is loaded lazily on first use."""
+
+    def __init__(self, model_name: str = LOCAL_MODEL, device: str = "cpu"):
+        self.model = model_name
+        self.device = device
+        self._model = None
+
+    def _load(self):
+        if self._model is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError as e:
+                raise RuntimeError(
+                    "EMBEDDING_BACKEND=local needs `pip install sentence-transformers` "
+                    "(or use EMBEDDING_BACKEND=hashing)."
+                ) from e
+            self._model = SentenceTransformer(self.model, device=self.device)
+        return self._model
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        return self._load().encode(texts, batch_size=BATCH_SIZE, convert_to_numpy=True,
+                                   normalize_embeddings=True, show_progress_bar=False)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._encode(texts).astype(np.float32).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].astype(np.float32).tolist()
+
+
+def backend_name(name: Optional[str] = None) -> str:
+    return (name or os.getenv("EMBEDDING_BACKEND") or DEFAULT_BACKEND).strip().lower()
+
+
+def backend_tag(name: Optional[str] = None) -> str:
+    """Short id used in collection names, e.g. 'hashing-384' or 'local-all-MiniLM-L6-v2'."""
+    name = backend_name(name)
+    if name == "hashing":
+        return f"hashing-{HASHING_DIM}"
+    if name == "local":
+        return "local-" + re.sub(r"[^A-Za-z0-9_-]+", "-", LOCAL_MODEL.split("/")[-1])
+    return name
+
+
+def collection_name(coach: str, name: Optional[str] = None) -> str:
+    """Physical Chroma collection for a coach under the active backend."""
+    name = backend_name(name)
+    if name == "openai":
+        return coach
+    return f"{coach}__{backend_tag(name)}"
+
+
+def get_embedding_backend(name: Optional[str] = None, openai_class: Any = None, openai_api_key: Optional[str] = None) -> Embeddings:
+    """
+    Build the configured embeddings client. openai_class is passed in by callers because
+    the OpenAIEmbeddings import differs between langchain versions.
+    """
+    name = backend_name(name)
+    if name == "hashing":
+        return HashingEmbeddings()
+    if name == "local":
+        return LocalEmbeddings()
+    if name == "openai":
+        if openai_class is None:
+            raise RuntimeError("OpenAI embeddings class not available")
+        return openai_class(openai_api_key=openai_api_key)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{name}' (expected openai, local or hashing)")
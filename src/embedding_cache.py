@@ -0,0 +1,169 @@
+# src/embedding_cache.py
+import re
+import json
+import asyncio
+import weakref
+import hashlib
+import functools
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+def normalize_query(text: str) -> str:
+    """Collapse whitespace so trivially different submissions share one cache entry."""
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def embedding_model_name(emb: Any) -> str:
+    """Best-effort model identifier for an embeddings client (part of the cache key)."""
+    for attr in ("model", "model_name", "deployment"):
+        val = getattr(emb, attr, None)
+        if isinstance(val, str) and val:
+            return val
+    return type(emb).__name__
+
+
+class QueryEmbeddingCache:
+    """
+    Two-tier cache for query vectors:
+    - bounded in-memory LRU (per process)
+    - optional on-disk tier (one small JSON file per sha256(model + text))
+    Concurrent misses for the same key wait for a single embedding call.
+    """
+
+    def __init__(self, max_entries: int = 512, disk_dir: Optional[str] = None):
+        self.max_entries = max_entries
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._lru: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, threading.Event] = {}
+        # per event loop: a task belongs to the loop that created it, and a closed loop's map goes away with it
+        self._ainflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Task]]" = (
+            weakref.WeakKeyDictionary())
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    @staticmethod
+    def make_key(text: str, model: str) -> str:
+        return hashlib.sha256(f"{model}\n{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key: str) -> Optional[Path]:
+        if not self.disk_dir:
+            return None
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    def _read_disk(self, key: str) -> Optional[List[float]]:
+        p = self._disk_path(key)
+        if p is None or not p.exists():
+            return None
+        try:
+            return json.loads(p.read_text(encoding="utf-8"))["vector"]
+        except Exception:
+            return None
+
+    def _write_disk(self, key: str, model: str, vector: List[float]) -> None:
+        p = self._disk_path(key)
+        if p is None:
+            return
+        try:
+            p.parent.mkdir(parents=True, exist_ok=True)
+            tmp = p.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"model": model, "vector": vector}), encoding="utf-8")
+            tmp.replace(p)
+        except Exception as e:
+            print(f"Query embedding disk cache write failed: {e}")
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def get_or_embed(self, text: str, emb: Any) -> List[float]:
+        """Return the query vector for text, calling emb.embed_query only on a full miss."""
+        model = embedding_model_name(emb)
+        key = self.make_key(text, model)
+        while True:
+            with self._lock:
+                vec = self._lru.get(key)
+                if vec is not None:
+                    self._lru.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return vec
+                waiter = self._inflight.get(key)
+                if waiter is None:
+                    # we own the computation for this key
+                    self._inflight[key] = threading.Event()
+                    break
+            waiter.wait()
+
+        try:
+            vec = self._read_disk(key)
+            if vec is not None:
+                with self._lock:
+                    self.stats["disk_hits"] += 1
+            else:
+                vec = list(emb.embed_query(normalize_query(text)))
+                with self._lock:
+                    self.stats["misses"] += 1
+                self._write_disk(key, model, vec)
+            with self._lock:
+                self._remember(key, vec)
+            return vec
+        finally:
+            with self._lock:
+                self._inflight.pop(key).set()
+
+    async def _aembed(self, key: str, model: str, text: str, emb: Any) -> List[float]:
+        vec = await asyncio.to_thread(self._read_disk, key)
+        if vec is not None:
+            with self._lock:
+                self.stats["disk_hits"] += 1
+        else:
+            if hasattr(emb, "aembed_query"):
+                vec = list(await emb.aembed_query(normalize_query(text)))
+            else:
+                vec = list(await asyncio.to_thread(emb.embed_query, normalize_query(text)))
+            with self._lock:
+                self.stats["misses"] += 1
+            await asyncio.to_thread(self._write_disk, key, model, vec)
+        with self._lock:
+            self._remember(key, vec)
+        return vec
+
+    async def aget_or_embed(self, text: str, emb: Any) -> List[float]:
+        """
+        Async twin of get_or_embed(); concurrent coroutines for one key share one aembed_query.
+        The embedding runs as its own task that every caller awaits through asyncio.shield, so
+        cancelling one caller (e.g. one session) never cancels or fails the others.
+        """
+        model = embedding_model_name(emb)
+        key = self.make_key(text, model)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            vec = self._lru.get(key)
+            if vec is not None:
+                self._lru.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return vec
+            inflight = self._ainflight.get(loop)
+            if inflight is None:
+                inflight = self._ainflight[loop] = {}
+            task = inflight.get(key)
+            if task is None:
+                task = inflight[key] = loop.create_task(self._aembed(key, model, text, emb))
+                task.add_done_callback(functools.partial(self._adone, inflight, key))
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _adone(inflight: Dict[str, "asyncio.Task"], key: str, task: "asyncio.Task") -> None:
+        if inflight.get(key) is task:
+            inflight.pop(key)
+        if not task.cancelled():
+            # every caller may have been cancelled; mark the result retrieved so asyncio doesn't warn
+            task.exception()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._lru.clear()
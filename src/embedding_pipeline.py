@@ -0,0 +1,202 @@
+# src/embedding_pipeline.py
+import time
+import queue
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# (ids, texts, metadatas)
+Batch = Tuple[List[str], List[str], List[Dict[str, Any]]]
+EmbedFn = Callable[[List[str]], List[List[float]]]
+WriteFn = Callable[[List[str], List[List[float]], List[str], List[Dict[str, Any]]], None]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 chars/token) used for TPM budgeting."""
+    return max(1, len(text) // 4)
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """True for provider 429s, whichever client library raised them."""
+    for attr in ("status_code", "http_status", "status"):
+        if getattr(exc, attr, None) == 429:
+            return True
+    resp = getattr(exc, "response", None)
+    if getattr(resp, "status_code", None) == 429:
+        return True
+    name = type(exc).__name__.lower()
+    msg = str(exc).lower()
+    return "ratelimit" in name or "rate limit" in msg or "429" in msg
+
+
+class TokenBucket:
+    """Refills at rate_per_minute/60 per second up to capacity; acquire() blocks until enough is available."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        start = max(self._last, self._paused_until)
+        if now > start:
+            self._tokens = min(self.capacity, self._tokens + (now - start) * self.rate)
+        self._last = max(now, self._last)
+
+    def acquire(self, amount: float = 1.0) -> None:
+        # an item larger than the bucket would never fit; let it through once the bucket is full
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = max(self._paused_until - now, (amount - self._tokens) / self.rate if self.rate else 1.0)
+            self._sleep(max(wait, 0.001))
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for a while (called after a 429)."""
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = 0.0
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets acquired together."""
+
+    def __init__(self, rpm: float, tpm: float):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    def acquire(self, n_tokens: int) -> None:
+        self.requests.acquire(1)
+        self.tokens.acquire(n_tokens)
+
+    def pause(self, seconds: float) -> None:
+        self.requests.pause(seconds)
+        self.tokens.pause(seconds)
+
+
+class AdaptiveBackoff:
+    """Exponential backoff with jitter that grows on 429s and decays on successes."""
+
+    def __init__(self, base: float = 1.0, maximum: float = 60.0):
+        self.base = base
+        self.maximum = maximum
+        self._delay = 0.0
+        self._lock = threading.Lock()
+
+    def on_rate_limited(self) -> float:
+        with self._lock:
+            self._delay = min(self.maximum, max(self.base, self._delay * 2))
+            return self._delay * random.uniform(0.8, 1.2)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self._delay = self._delay / 2 if self._delay > self.base else 0.0
+
+
+class EmbeddingPipeline:
+    """
+    Two-stage ingestion pipeline:
+    - embed stage: up to max_in_flight concurrent embed_fn calls, gated by an RPM/TPM limiter,
+      retried with adaptive backoff on 429s
+    - write stage: a single writer thread persisting finished batches, so writes overlap embedding
+
+    embed_fn / write_fn are plain callables, so the pipeline can run against a fake embedder.
+    """
+
+    def __init__(self, embed_fn: EmbedFn, write_fn: WriteFn, max_in_flight: int = 4,
+                 rpm: float = 3000, tpm: float = 1_000_000, max_retries: int = 6,
+                 token_counter: Callable[[str], int] = estimate_tokens):
+        self.embed_fn = embed_fn
+        self.write_fn = write_fn
+        self.max_in_flight = max(1, max_in_flight)
+        self.limiter = RateLimiter(rpm, tpm)
+        self.backoff = AdaptiveBackoff()
+        self.max_retries = max_retries
+        self.token_counter = token_counter
+        self.stats = {"batches": 0, "texts": 0, "tokens": 0, "rate_limited": 0, "written": 0}
+        self._stats_lock = threading.Lock()
+
+    def _bump(self, **kw) -> None:
+        with self._stats_lock:
+            for k, v in kw.items():
+                self.stats[k] += v
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        n_tokens = sum(self.token_counter(t) for t in texts)
+        attempt = 0
+        while True:
+            self.limiter.acquire(n_tokens)
+            try:
+                vectors = self.embed_fn(texts)
+                self.backoff.on_success()
+                self._bump(batches=1, texts=len(texts), tokens=n_tokens)
+                return vectors
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                delay = self.backoff.on_rate_limited()
+                self._bump(rate_limited=1)
+                print(f"Embedding rate limited (attempt {attempt}/{self.max_retries}); backing off {delay:.1f}s")
+                # every worker waits, not just this one
+                self.limiter.pause(delay)
+
+    def run(self, batches: Iterable[Batch]) -> Dict[str, int]:
+        write_q: "queue.Queue" = queue.Queue(maxsize=self.max_in_flight * 2)
+        errors: List[BaseException] = []
+        done = object()
+
+        def writer():
+            while True:
+                item = write_q.get()
+                if item is done:
+                    return
+                ids, vectors, texts, metas = item
+                try:
+                    if not errors:
+                        self.write_fn(ids, vectors, texts, metas)
+                        self._bump(written=len(ids))
+                except BaseException as e:
+                    errors.append(e)
+
+        writer_thread = threading.Thread(target=writer, name="embedding-writer", daemon=True)
+        writer_thread.start()
+
+        slots = threading.Semaphore(self.max_in_flight)
+
+        def embed_then_queue(batch: Batch):
+            ids, texts, metas = batch
+            try:
+                if not errors:
+                    write_q.put((ids, self._embed_batch(texts), texts, metas))
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                slots.release()
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="embed") as pool:
+            for batch in batches:
+                if errors:
+                    break
+                # bound submitted-but-unfinished batches so large corpora aren't queued all at once
+                slots.acquire()
+                pool.submit(embed_then_queue, batch)
+
+        write_q.put(done)
+        writer_thread.join()
+        if errors:
+            raise errors[0]
+        return dict(self.stats)
@@ -0,0 +1,194 @@
+# src/fake_models.py
+"""
+Local stand-ins for ChatOpenAI and OpenAIEmbeddings, for benchmarks and offline runs.
+
+- FakeChatModel answers with canned coach JSON after a sampled delay; a seeded fraction of
+  answers drops required keys so the repair path gets exercised too.
+- FakeEmbeddings returns HashingEmbeddings vectors (so they match the EMBEDDING_BACKEND=hashing
+  collections) after a sampled delay.
+- install_fakes(graph_module, ...) swaps both into src.business_consultant_graph.
+
+Latency specs (milliseconds):
+    "0"                   no delay
+    "fixed:50"            always 50ms
+    "uniform:20:80"       uniform between 20 and 80
+    "normal:50:10"        mean 50, stddev 10 (clipped at 0)
+    "lognormal:50:0.5"    median 50, sigma 0.5 (long tail, closest to real API latency)
+"""
+import time
+import json
+import random
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+from src.coach_output import REPAIR_MARKER
+from src.embedding_backends import HashingEmbeddings
+
+DEFAULT_COACH_RESPONSE = {
+    "bottlenecks": [
+        {
+            "name": "Founder-dependent delivery",
+            "diagnosis": "Every client project needs the founder's sign-off.",
+            "evidence": [{"source": "transcript", "chunk_id": 0}],
+            "tactical_fix": ["Document the delivery process", "Hire a delivery lead"],
+            "expected_impact": "Frees 10h/week of founder time",
+            "priority": "high",
+        },
+        {
+            "name": "Unclear offer",
+            "diagnosis": "Prospects cannot tell what they get.",
+            "evidence": [{"source": "transcript", "chunk_id": 1}],
+            "tactical_fix": ["Rewrite the offer around one outcome"],
+            "expected_impact": "Higher close rate",
+            "priority": "medium",
+        },
+    ],
+    "top_recommendation": "Systemise delivery before adding sales capacity.",
+    "kpis_to_track": ["close_rate", "founder_hours_per_week"],
+    "proposed_kpis": [{"kpi": "close_rate", "why": "Shows whether the offer rewrite works"}],
+    "summary": "Delivery depends on the founder; fix that first.",
+}
+
+
+class Latency:
+    """Seeded delay sampler built from a spec string (see module docstring)."""
+
+    def __init__(self, spec: str = "0", seed: Optional[int] = None):
+        self.spec = str(spec)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        kind, *params = self.spec.split(":")
+        if kind.replace(".", "", 1).isdigit():
+            kind, params = "fixed", [kind]
+        try:
+            self._params = [float(p) for p in params]
+        except ValueError:
+            raise ValueError(f"Bad latency spec '{spec}'")
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if expected.get(kind) != len(self._params):
+            raise ValueError(f"Bad latency spec '{spec}' (expected fixed:ms, uniform:lo:hi, normal:mean:sd or lognormal:median:sigma)")
+        self.kind = kind
+
+    def sample(self) -> float:
+        """Delay in seconds."""
+        p = self._params
+        with self._lock:
+            if self.kind == "fixed":
+                ms = p[0]
+            elif self.kind == "uniform":
+                ms = self._rng.uniform(p[0], p[1])
+            elif self.kind == "normal":
+                ms = self._rng.gauss(p[0], p[1])
+            else:
+                ms = p[0] * self._rng.lognormvariate(0.0, p[1])
+        return max(0.0, ms) / 1000.0
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model with canned JSON answers; responses maps a coach name fragment (e.g. "Dan") to its answer."""
+
+    model_name: str = "fake-chat"
+    temperature: float = 0.0
+    latency: str = "0"
+    malformed_rate: float = 0.0
+    seed: Optional[int] = 0
+    responses: Dict[str, Any] = {}
+
+    _latency: Latency = PrivateAttr()
+    _rng: random.Random = PrivateAttr()
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _calls: int = PrivateAttr(default=0)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._latency = Latency(self.latency, self.seed)
+        self._rng = random.Random(None if self.seed is None else self.seed + 1)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    def _answer(self, messages: List[BaseMessage]) -> AIMessage:
+        system = str(messages[0].content) if messages else ""
+        prompt = "".join(str(m.content) for m in messages)
+        body = next((v for k, v in self.responses.items() if k in system[:200]), DEFAULT_COACH_RESPONSE)
+        if not isinstance(body, str):
+            body = json.dumps(body)
+        with self._lock:
+            self._calls += 1
+            malformed = REPAIR_MARKER not in prompt and self._rng.random() < self.malformed_rate
+        if malformed:
+            body = json.dumps({"summary": "partial answer"})
+        return AIMessage(content=body, usage_metadata={
+            "input_tokens": _estimate_tokens(prompt),
+            "output_tokens": _estimate_tokens(body),
+            "total_tokens": _estimate_tokens(prompt) + _estimate_tokens(body),
+        })
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._latency.sample())
+        return ChatResult(generations=[ChatGeneration(message=self._answer(messages))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._latency.sample())
+        return ChatResult(generations=[ChatGeneration(message=self._answer(messages))])
+
+
+class FakeEmbeddings(Embeddings):
+    """HashingEmbeddings behind a sampled delay (one delay per call, not per text)."""
+
+    def __init__(self, latency: str = "0", seed: Optional[int] = 0, dim: Optional[int] = None):
+        self._inner = HashingEmbeddings(dim) if dim else HashingEmbeddings()
+        self.model = f"fake-{self._inner.model}"
+        self.latency = Latency(latency, seed)
+        self.calls = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        time.sleep(self.latency.sample())
+        return self._inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        time.sleep(self.latency.sample())
+        return self._inner.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        await asyncio.sleep(self.latency.sample())
+        return self._inner.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        await asyncio.sleep(self.latency.sample())
+        return self._inner.embed_query(text)
+
+
+def install_fakes(graph_module: Any, llm_latency: str = "0", embed_latency: str = "0",
+                  malformed_rate: float = 0.0, seed: Optional[int] = 0):
+    """
+    Swap the graph module's LLM and pooled embedding clients for the fakes (call before building
+    the graph's first session). Returns (fake_llm, fake_embeddings).
+    """
+    fake_llm = FakeChatModel(latency=llm_latency, malformed_rate=malformed_rate, seed=seed)
+    fake_emb = FakeEmbeddings(latency=embed_latency, seed=seed)
+    graph_module.llm = fake_llm
+    graph_module.VECTORSTORE_POOL.invalidate()
+    for coach in graph_module.COACH_COLLECTIONS:
+        graph_module.VECTORSTORE_POOL._embeddings[coach] = fake_emb
+    graph_module.warm_vectorstores()
+    return fake_llm, fake_emb
@@ -0,0 +1,285 @@
+# src/lexical_index.py
+"""
+BM25 lexical index over data/processed/<coach>/chunks.jsonl, plus reciprocal-rank fusion.
+
+- one index per coach, persisted as gzip JSON under data/index/bm25/<coach>.json.gz
+- loaded lazily on first query; when the source chunks file changes on disk the index is
+  synced incrementally (only added/removed chunks are re-tokenized) into a copy that replaces
+  it, so concurrent searches never see an index mid-update
+- exact-term matching catches client jargon ("CAC", "churn", "LTV") that embeddings blur
+"""
+import gzip
+import json
+import math
+import re
+import time
+import hashlib
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+PROCESSED_ROOT = Path("data/processed")
+BM25_ROOT = Path("data/index/bm25")
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60
+STALE_CHECK_SECONDS = 5.0
+INDEX_VERSION = 1
+
+_TOKEN_RE = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i if in into is it its me my of on or our "
+    "she so that the their them then there they this to was we were what when which who will with you your".split()
+)
+
+Evidence = Tuple[str, Dict[str, Any]]
+
+# per-chunk stats written by scripts/preprocess_and_chunk.py; carried into metadata when present
+CHUNK_STAT_FIELDS = ("token_count", "token_start", "token_end", "char_start", "char_end", "text_hash")
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def doc_key(text: str, meta: Dict[str, Any]) -> str:
+    """Identity used to line up the same chunk across lexical and vector results."""
+    if meta.get("source") is not None and meta.get("chunk_id") is not None:
+        return f"{meta['source']}#{meta['chunk_id']}"
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def source_chunks_file(coach: str, processed_root: Path = PROCESSED_ROOT) -> Optional[Path]:
+    """Same choice as ingestion: chunks_dedup.jsonl when it is at least as new as chunks.jsonl."""
+    raw = processed_root / coach / "chunks.jsonl"
+    dedup = processed_root / coach / "chunks_dedup.jsonl"
+    if dedup.exists() and (not raw.exists() or dedup.stat().st_mtime >= raw.stat().st_mtime):
+        return dedup
+    return raw if raw.exists() else None
+
+
+def chunk_metadata(obj: Dict[str, Any]) -> Dict[str, Any]:
+    """Metadata for one chunks.jsonl row: identity fields plus whichever precomputed stats it has."""
+    meta = {"source": obj.get("source"), "coach": obj.get("coach"), "chunk_id": obj.get("chunk_id")}
+    meta.update({k: obj[k] for k in CHUNK_STAT_FIELDS if obj.get(k) is not None})
+    return meta
+
+
+class BM25Index:
+    def __init__(self):
+        self.docs: Dict[int, Dict[str, Any]] = {}       # doc id -> {"hash", "text", "meta", "len"}
+        self.postings: Dict[str, Dict[int, int]] = {}   # term -> {doc id: tf}
+        self.by_hash: Dict[str, int] = {}
+        self.total_len = 0
+        self.next_id = 0
+        self.source_sig: Optional[List] = None
+
+    # ----- maintenance -----
+    @staticmethod
+    def _chunk_hash(text: str, meta: Dict[str, Any]) -> str:
+        blob = json.dumps({"text": text, "metadata": meta}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def add(self, text: str, meta: Dict[str, Any]) -> None:
+        h = self._chunk_hash(text, meta)
+        if h in self.by_hash:
+            return
+        tf = Counter(tokenize(text))
+        did = self.next_id
+        self.next_id += 1
+        n = sum(tf.values())
+        self.docs[did] = {"hash": h, "text": text, "meta": meta, "len": n}
+        self.by_hash[h] = did
+        self.total_len += n
+        for term, c in tf.items():
+            self.postings.setdefault(term, {})[did] = c
+
+    def remove(self, h: str) -> None:
+        did = self.by_hash.pop(h, None)
+        if did is None:
+            return
+        doc = self.docs.pop(did)
+        self.total_len -= doc["len"]
+        for term in set(tokenize(doc["text"])):
+            plist = self.postings.get(term)
+            if plist is not None:
+                plist.pop(did, None)
+                if not plist:
+                    del self.postings[term]
+
+    def sync(self, chunks: Sequence[Dict[str, Any]]) -> Tuple[int, int]:
+        """Make the index match `chunks` (chunks.jsonl rows). Returns (added, removed)."""
+        wanted = {}
+        for obj in chunks:
+            text = obj.get("text", "")
+            meta = chunk_metadata(obj)
+            wanted[self._chunk_hash(text, meta)] = (text, meta)
+        stale = [h for h in self.by_hash if h not in wanted]
+        for h in stale:
+            self.remove(h)
+        added = 0
+        for h, (text, meta) in wanted.items():
+            if h not in self.by_hash:
+                self.add(text, meta)
+                added += 1
+        return added, len(stale)
+
+    def copy(self) -> "BM25Index":
+        """Independent copy for sync(); doc entries are never mutated, so they are shared."""
+        idx = BM25Index()
+        idx.docs = dict(self.docs)
+        idx.postings = {t: dict(p) for t, p in self.postings.items()}
+        idx.by_hash = dict(self.by_hash)
+        idx.total_len = self.total_len
+        idx.next_id = self.next_id
+        idx.source_sig = self.source_sig
+        return idx
+
+    # ----- query -----
+    def search(self, query: str, k: int) -> List[Tuple[str, Dict[str, Any], float]]:
+        n_docs = len(self.docs)
+        if not n_docs or k <= 0:
+            return []
+        avg_len = self.total_len / n_docs or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = math.log(1 + (n_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+            for did, tf in plist.items():
+                dl = self.docs[did]["len"]
+                s = idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * dl / avg_len))
+                scores[did] = scores.get(did, 0.0) + s
+        best = sorted(scores.items(), key=lambda x: (-x[1], x[0]))[:k]
+        return [(self.docs[d]["text"], dict(self.docs[d]["meta"]), s) for d, s in best]
+
+    # ----- persistence -----
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "version": INDEX_VERSION,
+            "source_sig": self.source_sig,
+            "next_id": self.next_id,
+            "docs": [[did, d["hash"], d["text"], d["meta"], d["len"]] for did, d in self.docs.items()],
+            # term -> [doc ids..., tfs...] flattened pairs keep the file small
+            "postings": {t: [x for pair in p.items() for x in pair] for t, p in self.postings.items()},
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "BM25Index":
+        idx = cls()
+        idx.source_sig = data.get("source_sig")
+        idx.next_id = data["next_id"]
+        for did, h, text, meta, n in data["docs"]:
+            idx.docs[did] = {"hash": h, "text": text, "meta": meta, "len": n}
+            idx.by_hash[h] = did
+            idx.total_len += n
+        for term, flat in data["postings"].items():
+            idx.postings[term] = dict(zip(flat[0::2], flat[1::2]))
+        return idx
+
+
+class LexicalIndexRegistry:
+    """Lazily loaded, incrementally refreshed BM25 index per coach."""
+
+    def __init__(self, processed_root: Path = PROCESSED_ROOT, index_root: Path = BM25_ROOT):
+        self.processed_root = Path(processed_root)
+        self.index_root = Path(index_root)
+        self._lock = threading.Lock()
+        self._indexes: Dict[str, BM25Index] = {}
+        self._checked: Dict[str, float] = {}
+        self._refresh_locks: Dict[str, threading.Lock] = {}
+
+    def _index_path(self, coach: str) -> Path:
+        return self.index_root / f"{coach}.json.gz"
+
+    @staticmethod
+    def _file_sig(path: Optional[Path]) -> Optional[List]:
+        if path is None:
+            return None
+        st = path.stat()
+        return [path.name, st.st_mtime_ns, st.st_size]
+
+    def _load(self, coach: str) -> BM25Index:
+        p = self._index_path(coach)
+        if p.exists():
+            try:
+                with gzip.open(p, "rt", encoding="utf-8") as fh:
+                    data = json.load(fh)
+                if data.get("version") == INDEX_VERSION:
+                    return BM25Index.from_json(data)
+            except Exception as e:
+                print(f"BM25 index for {coach} unreadable, rebuilding: {e}")
+        return BM25Index()
+
+    def _save(self, coach: str, idx: BM25Index) -> None:
+        p = self._index_path(coach)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_suffix(".tmp")
+        with gzip.open(tmp, "wt", encoding="utf-8") as fh:
+            json.dump(idx.to_json(), fh, ensure_ascii=False, separators=(",", ":"))
+        tmp.replace(p)
+
+    def _refresh(self, coach: str, idx: BM25Index) -> BM25Index:
+        """Index matching the current chunks file: idx itself when unchanged, else a synced copy.
+        Indexes handed out by get() are never modified, so searches running on other threads
+        keep a consistent view while a refresh builds the next one."""
+        src = source_chunks_file(coach, self.processed_root)
+        sig = self._file_sig(src)
+        if sig == idx.source_sig:
+            return idx
+        chunks = []
+        if src is not None:
+            with src.open("r", encoding="utf-8") as fh:
+                chunks = [json.loads(line) for line in fh if line.strip()]
+        fresh = idx.copy()
+        added, removed = fresh.sync(chunks)
+        fresh.source_sig = sig
+        self._save(coach, fresh)
+        print(f"BM25 index for {coach} synced (+{added} / -{removed} chunks)")
+        return fresh
+
+    def get(self, coach: str) -> BM25Index:
+        with self._lock:
+            idx = self._indexes.get(coach)
+            now = time.monotonic()
+            if idx is not None:
+                if now - self._checked[coach] < STALE_CHECK_SECONDS:
+                    return idx
+                # claim this check; other threads keep using idx until the refreshed one is swapped in
+                self._checked[coach] = now
+            refresh_lock = self._refresh_locks.setdefault(coach, threading.Lock())
+        # load / refresh outside the registry lock, one at a time per coach: reading chunks.jsonl,
+        # syncing a copy and saving it never holds up searches, for this coach or any other
+        with refresh_lock:
+            if idx is None:
+                with self._lock:
+                    idx = self._indexes.get(coach)
+                if idx is not None:
+                    return idx  # loaded by another thread while this one waited
+                idx = self._load(coach)
+            idx = self._refresh(coach, idx)
+            with self._lock:
+                self._indexes[coach] = idx
+                self._checked[coach] = time.monotonic()
+            return idx
+
+    def search(self, coach: str, query: str, k: int) -> List[Evidence]:
+        return [(t, m) for t, m, _ in self.get(coach).search(query, k)]
+
+
+def reciprocal_rank_fusion(result_lists: Sequence[Sequence[Evidence]], k: int, rrf_k: int = RRF_K) -> List[Evidence]:
+    """Merge ranked lists by sum(1 / (rrf_k + rank)); ties keep first-seen order."""
+    scores: Dict[str, float] = {}
+    items: Dict[str, Evidence] = {}
+    order: Dict[str, int] = {}
+    for results in result_lists:
+        for rank, (text, meta) in enumerate(results, start=1):
+            key = doc_key(text, meta)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            if key not in items:
+                items[key] = (text, meta)
+                order[key] = len(order)
+    ranked = sorted(scores, key=lambda key: (-scores[key], order[key]))[:k]
+    return [items[key] for key in ranked]
@@ -0,0 +1,175 @@
+# src/llm_cache.py
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage
+
+# sampling params that change what the model returns; anything set on the client is part of the key
+SAMPLING_PARAMS = ("temperature", "top_p", "max_tokens", "seed", "n", "frequency_penalty", "presence_penalty", "stop")
+
+
+def llm_model_name(llm: Any) -> str:
+    for attr in ("model_name", "model", "deployment_name"):
+        val = getattr(llm, attr, None)
+        if isinstance(val, str) and val:
+            return val
+    return type(llm).__name__
+
+
+def make_cache_key(llm: Any, msgs: List[Any], extra: Optional[Dict[str, Any]] = None) -> str:
+    """Content address for one call: model + message contents + sampling params."""
+    payload = {
+        "model": llm_model_name(llm),
+        "messages": [[getattr(m, "type", type(m).__name__), getattr(m, "content", str(m))] for m in msgs],
+        "params": {p: getattr(llm, p, None) for p in SAMPLING_PARAMS},
+    }
+    if extra:
+        payload["extra"] = extra
+    blob = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    SQLite-backed response cache in front of llm.invoke.
+    - entries older than ttl_seconds are treated as misses and purged
+    - table is trimmed to max_entries by least-recent access
+    - enabled=False (or bypass=True per call) goes straight to the model
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 7 * 24 * 3600, max_entries: int = 5000, enabled: bool = True):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.stats = {"hits": 0, "misses": 0, "bypassed": 0, "evicted": 0}
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, model TEXT, content TEXT,"
+                " created_at REAL, accessed_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT content, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            content, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                db.commit()
+                self.stats["evicted"] += 1
+                return None
+            db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            db.commit()
+            return content
+
+    def put(self, key: str, model: str, content: str) -> None:
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, content, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, model, content, now, now),
+            )
+            self._evict(db, now)
+            db.commit()
+
+    def _evict(self, db: sqlite3.Connection, now: float) -> None:
+        if self.ttl_seconds:
+            cur = db.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            self.stats["evicted"] += max(cur.rowcount, 0)
+        (count,) = db.execute("SELECT COUNT(*) FROM responses").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            cur = db.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,),
+            )
+            self.stats["evicted"] += max(cur.rowcount, 0)
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _lookup(self, llm: Any, msgs: List[Any], call_kwargs: Optional[Dict[str, Any]] = None):
+        """Returns (key, cached AIMessage or None)."""
+        key = make_cache_key(llm, msgs, call_kwargs)
+        try:
+            cached = self.get(key)
+        except Exception as e:
+            print(f"LLM cache read failed, calling model: {e}")
+            cached = None
+        self._count("misses" if cached is None else "hits")
+        if cached is None:
+            return key, None
+        return key, AIMessage(content=cached, response_metadata={"cache_hit": True})
+
+    def _store(self, key: str, llm: Any, resp: Any) -> None:
+        content = getattr(resp, "content", None)
+        if isinstance(content, str) and content.strip():
+            try:
+                self.put(key, llm_model_name(llm), content)
+            except Exception as e:
+                print(f"LLM cache write failed: {e}")
+
+    def invoke(self, llm: Any, msgs: List[Any], bypass: bool = False, refresh: bool = False, **call_kwargs: Any) -> Any:
+        """
+        Drop-in for llm.invoke(msgs, **call_kwargs). Cached hits come back as an AIMessage.
+        refresh=True skips the lookup but stores the new answer (replaces a bad cached one).
+        call_kwargs (e.g. response_format) are part of the cache key.
+        """
+        if bypass or not self.enabled:
+            self._count("bypassed")
+            return llm.invoke(msgs, **call_kwargs)
+        if refresh:
+            key = make_cache_key(llm, msgs, call_kwargs)
+            self._count("misses")
+        else:
+            key, hit = self._lookup(llm, msgs, call_kwargs)
+            if hit is not None:
+                return hit
+        resp = llm.invoke(msgs, **call_kwargs)
+        self._store(key, llm, resp)
+        return resp
+
+    async def ainvoke(self, llm: Any, msgs: List[Any], bypass: bool = False, refresh: bool = False, **call_kwargs: Any) -> Any:
+        """Async twin of invoke(); the SQLite lookups are local and short, the model call is awaited."""
+        if bypass or not self.enabled:
+            self._count("bypassed")
+            return await llm.ainvoke(msgs, **call_kwargs)
+        if refresh:
+            key = make_cache_key(llm, msgs, call_kwargs)
+            self._count("misses")
+        else:
+            key, hit = self._lookup(llm, msgs, call_kwargs)
+            if hit is not None:
+                return hit
+        resp = await llm.ainvoke(msgs, **call_kwargs)
+        self._store(key, llm, resp)
+        return resp
+
+    def clear(self) -> None:
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM responses")
+            db.commit()
@@ -0,0 +1,173 @@
+# src/numpy_index.py
+"""
+In-memory alternative to Chroma for small coach corpora.
+
+Export layout (one directory per physical collection, e.g. data/index/sam_ovens/):
+    embeddings.npy   float32 (n, dim), rows L2-normalised, C-contiguous -> np.load(mmap_mode="r")
+    doc_offsets.npy  int64 (n + 1,) byte offsets into documents.bin
+    documents.bin    UTF-8 chunk texts back to back (only the top-k rows are ever decoded)
+    meta.npz         columnar metadata: "ids" plus, per metadata key, "<key>.codes" (int32, -1 = missing)
+                     and "<key>.values" (the distinct values)
+    manifest.json    collection name, row count, dimension, export time
+
+Queries are a single mat-vec dot product plus np.argpartition for the top k.
+"""
+import json
+import time
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+INDEX_ROOT = Path("data/index")
+
+
+def _normalize_rows(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+
+def _encode_column(values: List[Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """Dictionary-encode one metadata column -> (codes, distinct values)."""
+    distinct: Dict[Any, int] = {}
+    codes = np.full(len(values), -1, dtype=np.int32)
+    for i, v in enumerate(values):
+        if v is None:
+            continue
+        codes[i] = distinct.setdefault(v, len(distinct))
+    kinds = {type(v) for v in distinct}
+    if kinds and kinds <= {int}:
+        vals = np.array(list(distinct), dtype=np.int64)
+    elif kinds and kinds <= {int, float}:
+        vals = np.array(list(distinct), dtype=np.float64)
+    else:
+        vals = np.array([str(v) for v in distinct], dtype=np.str_)
+    return codes, vals
+
+
+def export_collection(persist_dir: str, collection: str, out_root: Path = INDEX_ROOT) -> Path:
+    """Dump one Chroma collection into the layout above. Returns the output directory."""
+    import chromadb
+
+    client = chromadb.PersistentClient(path=persist_dir)
+    col = client.get_collection(collection)
+    got = col.get(include=["embeddings", "documents", "metadatas"])
+    ids = list(got["ids"])
+    embeddings = got.get("embeddings")
+    if embeddings is None or len(ids) == 0:
+        raise RuntimeError(f"Collection '{collection}' is empty or has no stored embeddings")
+
+    matrix = np.ascontiguousarray(_normalize_rows(np.asarray(embeddings, dtype=np.float32)))
+    docs = [(d or "").encode("utf-8") for d in got.get("documents") or [""] * len(ids)]
+    metas = [m or {} for m in got.get("metadatas") or [{}] * len(ids)]
+
+    out_dir = Path(out_root) / collection
+    tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    np.save(tmp_dir / "embeddings.npy", matrix)
+    offsets = np.zeros(len(docs) + 1, dtype=np.int64)
+    np.cumsum([len(d) for d in docs], out=offsets[1:])
+    np.save(tmp_dir / "doc_offsets.npy", offsets)
+    (tmp_dir / "documents.bin").write_bytes(b"".join(docs))
+
+    columns: Dict[str, np.ndarray] = {"ids": np.array(ids, dtype=np.str_)}
+    for key in sorted({k for m in metas for k in m}):
+        codes, vals = _encode_column([m.get(key) for m in metas])
+        columns[f"{key}.codes"] = codes
+        columns[f"{key}.values"] = vals
+    np.savez(tmp_dir / "meta.npz", **columns)
+
+    (tmp_dir / "manifest.json").write_text(json.dumps({
+        "collection": collection,
+        "rows": int(matrix.shape[0]),
+        "dim": int(matrix.shape[1]),
+        "exported_at": time.time(),
+    }, indent=2), encoding="utf-8")
+
+    # swap the finished export in place so readers never see a half-written index
+    if out_dir.exists():
+        old = out_dir.with_name(out_dir.name + ".old")
+        out_dir.rename(old)
+        tmp_dir.rename(out_dir)
+        for f in old.iterdir():
+            f.unlink()
+        old.rmdir()
+    else:
+        tmp_dir.rename(out_dir)
+    return out_dir
+
+
+class NumpyIndex:
+    """Memory-mapped exported collection answering top-k by dot product."""
+
+    def __init__(self, index_dir: Path):
+        self.index_dir = Path(index_dir)
+        self.matrix = np.load(self.index_dir / "embeddings.npy", mmap_mode="r")
+        self.offsets = np.load(self.index_dir / "doc_offsets.npy", mmap_mode="r")
+        self.documents = np.memmap(self.index_dir / "documents.bin", dtype=np.uint8, mode="r") \
+            if (self.index_dir / "documents.bin").stat().st_size else np.zeros(0, dtype=np.uint8)
+        self._meta = np.load(self.index_dir / "meta.npz")
+        self.meta_keys = sorted(k[:-len(".codes")] for k in self._meta.files if k.endswith(".codes"))
+        self._columns: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return int(self.matrix.shape[0])
+
+    def _column(self, key: str) -> Tuple[np.ndarray, np.ndarray]:
+        col = self._columns.get(key)
+        if col is None:
+            col = self._columns[key] = (self._meta[f"{key}.codes"], self._meta[f"{key}.values"])
+        return col
+
+    def text(self, row: int) -> str:
+        lo, hi = int(self.offsets[row]), int(self.offsets[row + 1])
+        return bytes(self.documents[lo:hi]).decode("utf-8")
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        meta = {}
+        for key in self.meta_keys:
+            codes, vals = self._column(key)
+            code = int(codes[row])
+            if code >= 0:
+                meta[key] = vals[code].item()
+        return meta
+
+    def search(self, query_vector: List[float], k: int) -> List[Tuple[str, Dict[str, Any], float]]:
+        """Top-k rows by cosine similarity -> [(text, metadata, score)], best first."""
+        n = len(self)
+        if n == 0 or k <= 0:
+            return []
+        q = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm:
+            q = q / norm
+        scores = self.matrix @ q
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k] if k < n else np.arange(n)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(self.text(int(r)), self.metadata(int(r)), float(scores[r])) for r in top]
+
+
+class NumpyIndexRegistry:
+    """Loads each exported collection once per process and reloads it after a re-export."""
+
+    def __init__(self, root: Path = INDEX_ROOT):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._indexes: Dict[str, Tuple[float, NumpyIndex]] = {}
+
+    def get(self, collection: str) -> Optional[NumpyIndex]:
+        manifest = self.root / collection / "manifest.json"
+        try:
+            stamp = manifest.stat().st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._indexes.get(collection)
+            if cached is None or cached[0] != stamp:
+                cached = (stamp, NumpyIndex(self.root / collection))
+                self._indexes[collection] = cached
+            return cached[1]
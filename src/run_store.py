@@ -0,0 +1,356 @@
+# src/run_store.py
+"""
+Append-only run history with a sidecar SQLite index (replaces the flat data/metadata/runs.jsonl).
+
+Layout under root (default data/metadata/runs/):
+    runs-00001.jsonl.gz   rotated segments: concatenated gzip members of ~BLOCK_BYTES of records each,
+    runs-00002.jsonl.gz   so one record is read by decompressing one small member
+    runs-00003.jsonl      active segment, plain JSON lines; rotated once it passes max_segment_bytes
+    index.sqlite3         seq, thread_id, ts, segment, byte offset/length (+ gzip member offset/length)
+                          and an FTS5 table over business description + goal
+
+Lookups (latest, by thread_id, by time range, by business keyword) go through the index and read
+only the matching records. Records are written before their index row; on open, records at the
+end of the active segment that have no index row yet (crash between the two) are indexed again.
+A rotation interrupted by a crash is finished on open. The first open imports a legacy
+runs.jsonl once (resuming, without duplicates, if that import was interrupted).
+
+Writes (append, recovery, legacy import, rotation) hold the store's thread lock plus an flock on
+<root>/write.lock, so several processes (the graph runner, rerun_coaches.py) can append to one
+store. Reads take no file lock; a record moved by another process's rotation is looked up again.
+"""
+import os
+import gzip
+import json
+import time
+import zlib
+import sqlite3
+import threading
+import contextlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialised within one process
+    fcntl = None
+
+DEFAULT_ROOT = Path("data/metadata/runs")
+LEGACY_RUNS_FILE = Path("data/metadata/runs.jsonl")
+MAX_SEGMENT_BYTES = 32 * 1024 * 1024
+BLOCK_BYTES = 256 * 1024
+TAIL_CHUNK_BYTES = 64 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    seq INTEGER PRIMARY KEY,
+    thread_id TEXT,
+    ts REAL NOT NULL,
+    segment TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    block_offset INTEGER,
+    block_length INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_thread ON runs (thread_id, seq);
+CREATE INDEX IF NOT EXISTS runs_ts ON runs (ts);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+_FTS_SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS runs_text USING fts5(description, goal)"
+
+
+def read_tail(path: Path, n: int = 1) -> List[str]:
+    """Last n non-empty lines of a text file, read backwards from the end in fixed-size chunks."""
+    path = Path(path)
+    if n <= 0 or not path.exists():
+        return []
+    with path.open("rb") as fh:
+        fh.seek(0, os.SEEK_END)
+        pos = fh.tell()
+        data = b""
+        while pos > 0 and data.count(b"\n") <= n:
+            step = min(TAIL_CHUNK_BYTES, pos)
+            pos -= step
+            fh.seek(pos)
+            data = fh.read(step) + data
+    lines = [ln for ln in data.split(b"\n") if ln.strip()]
+    if pos > 0:
+        lines = lines[1:]  # first piece may be the end of a longer line
+    return [ln.decode("utf-8") for ln in lines[-n:]]
+
+
+def _record_text(record: Dict[str, Any]) -> Tuple[str, str]:
+    snap = (record.get("final_report") or {}).get("business_snapshot") or {}
+    return str(snap.get("description", "") or ""), str(snap.get("goal", "") or "")
+
+
+class RunStore:
+    def __init__(self, root: Path = DEFAULT_ROOT, max_segment_bytes: int = MAX_SEGMENT_BYTES,
+                 legacy_file: Optional[Path] = LEGACY_RUNS_FILE):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_segment_bytes = max_segment_bytes
+        self._lock = threading.RLock()
+        self._lock_file = None  # open write.lock while this process holds the flock
+        self._conn = sqlite3.connect(str(self.root / "index.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        try:
+            self._conn.execute(_FTS_SCHEMA)
+            self._fts = True
+        except sqlite3.OperationalError:
+            # sqlite built without FTS5: keyword search falls back to scanning description/goal
+            self._fts = False
+        self._conn.commit()
+        self._block_cache: Tuple[Optional[Tuple[str, int]], bytes] = (None, b"")
+        with self._writing():
+            self._recover()
+        if legacy_file is not None:
+            self._import_legacy(Path(legacy_file))
+
+    # ---------- segments ----------
+    def _segments(self) -> List[Path]:
+        return sorted(p for p in self.root.glob("runs-*.jsonl*") if not p.name.endswith(".tmp"))
+
+    def _active_segment(self) -> Path:
+        plain = [p for p in self._segments() if p.suffix == ".jsonl"]
+        if plain:
+            return plain[-1]
+        last = self._segments()
+        number = int(last[-1].name.split("-")[1].split(".")[0]) + 1 if last else 1
+        return self.root / f"runs-{number:05d}.jsonl"
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @contextlib.contextmanager
+    def _writing(self):
+        """Exclusive write access: thread lock, then an inter-process flock on write.lock."""
+        with self._lock:
+            if fcntl is None or self._lock_file is not None:  # re-entered, e.g. append() from the legacy import
+                yield
+                return
+            with (self.root / "write.lock").open("a") as fh:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+                self._lock_file = fh
+                try:
+                    yield
+                finally:
+                    self._lock_file = None
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _index_rows(self, rows: List[Tuple[Dict[str, Any], str, int, int]]) -> int:
+        for record, segment, offset, length in rows:
+            cur = self._conn.execute(
+                "INSERT INTO runs (thread_id, ts, segment, offset, length) VALUES (?, ?, ?, ?, ?)",
+                (record.get("thread_id"), float(record.get("timestamp") or time.time()), segment, offset, length),
+            )
+            if self._fts:
+                self._conn.execute("INSERT INTO runs_text (rowid, description, goal) VALUES (?, ?, ?)",
+                                   (cur.lastrowid, *_record_text(record)))
+        self._conn.commit()
+        return cur.lastrowid if rows else 0
+
+    def _recover(self) -> None:
+        """Finish an interrupted rotation, then index records at the end of the active segment
+        that were written but never indexed."""
+        active = self._active_segment()
+        if not active.exists():
+            return
+        if active.with_name(active.name + ".gz").exists():
+            # crash during _rotate: redo it if the index still points here, else only the delete was missed
+            if self._conn.execute("SELECT 1 FROM runs WHERE segment = ? LIMIT 1", (active.name,)).fetchone():
+                self._rotate(active)
+            else:
+                active.unlink()
+            return
+        row = self._conn.execute("SELECT MAX(offset + length) FROM runs WHERE segment = ?", (active.name,)).fetchone()
+        indexed_end = row[0] or 0
+        if active.stat().st_size <= indexed_end:
+            return
+        rows = []
+        with active.open("rb") as fh:
+            fh.seek(indexed_end)
+            offset = indexed_end
+            for line in fh:
+                if line.endswith(b"\n") and line.strip():
+                    try:
+                        rows.append((json.loads(line), active.name, offset, len(line)))
+                    except ValueError:
+                        pass
+                offset += len(line)
+        if rows:
+            print(f"Run store: re-indexed {len(rows)} record(s) missing from {self.root / 'index.sqlite3'}")
+            self._index_rows(rows)
+
+    def _import_legacy(self, legacy: Path) -> None:
+        if not legacy.exists() or self._meta("legacy_imported") == str(legacy.resolve()):
+            return
+        # records already in the store (an import interrupted by a crash) are skipped by
+        # (thread_id, timestamp); records without a timestamp get the file's mtime so that holds
+        default_ts = legacy.stat().st_mtime
+        imported = 0
+        with self._writing():
+            if self._meta("legacy_imported") == str(legacy.resolve()):
+                return  # another process finished the import while we waited
+            with legacy.open("r", encoding="utf-8") as fh:
+                for line in fh:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    record.setdefault("timestamp", default_ts)
+                    if self._conn.execute("SELECT 1 FROM runs WHERE thread_id IS ? AND ts = ? LIMIT 1",
+                                          (record.get("thread_id"), float(record["timestamp"]))).fetchone():
+                        continue
+                    self.append(record)
+                    imported += 1
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_imported', ?)",
+                               (str(legacy.resolve()),))
+            self._conn.commit()
+        print(f"Run store: imported {imported} record(s) from {legacy}")
+
+    def _rotate(self, segment: Path) -> None:
+        """Compress a full segment into gzip members of ~BLOCK_BYTES and repoint its index rows."""
+        target = segment.with_name(segment.name + ".gz")
+        tmp = target.with_name(target.name + ".tmp")
+        rows = self._conn.execute("SELECT seq, offset, length FROM runs WHERE segment = ? ORDER BY offset",
+                                  (segment.name,)).fetchall()
+        updates = []
+        with segment.open("rb") as src, tmp.open("wb") as out:
+            block: List[Tuple[int, bytes]] = []
+            size = 0
+
+            def flush_block():
+                nonlocal block, size
+                if not block:
+                    return
+                member_offset = out.tell()
+                out.write(gzip.compress(b"".join(data for _, data in block)))
+                member_length = out.tell() - member_offset
+                inner = 0
+                for seq, data in block:
+                    updates.append((target.name, inner, member_offset, member_length, seq))
+                    inner += len(data)
+                block, size = [], 0
+
+            for seq, offset, length in rows:
+                src.seek(offset)
+                data = src.read(length)
+                block.append((seq, data))
+                size += length
+                if size >= BLOCK_BYTES:
+                    flush_block()
+            flush_block()
+            out.flush()
+            os.fsync(out.fileno())
+        tmp.replace(target)
+        self._conn.executemany(
+            "UPDATE runs SET segment = ?, offset = ?, block_offset = ?, block_length = ? WHERE seq = ?", updates)
+        self._conn.commit()
+        segment.unlink()
+
+    # ---------- write ----------
+    def append(self, record: Dict[str, Any]) -> int:
+        """Append one run record ({"thread_id", "final_report", "timestamp", ...}). Returns its seq."""
+        record = dict(record)
+        record.setdefault("timestamp", time.time())
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._writing():
+            segment = self._active_segment()
+            with segment.open("ab") as fh:
+                offset = fh.tell()
+                fh.write(line)
+            seq = self._index_rows([(record, segment.name, offset, len(line))])
+            if offset + len(line) >= self.max_segment_bytes:
+                self._rotate(segment)
+        return seq
+
+    # ---------- read ----------
+    def _read(self, segment: str, offset: int, length: int, block_offset: Optional[int], block_length: Optional[int]) -> Dict[str, Any]:
+        path = self.root / segment
+        if block_offset is None:
+            with path.open("rb") as fh:
+                fh.seek(offset)
+                return json.loads(fh.read(length))
+        key = (segment, block_offset)
+        cached_key, block = self._block_cache
+        if cached_key != key:
+            with path.open("rb") as fh:
+                fh.seek(block_offset)
+                block = zlib.decompress(fh.read(block_length), wbits=31)
+            self._block_cache = (key, block)
+        return json.loads(block[offset:offset + length])
+
+    _ROW = "seq, segment, offset, length, block_offset, block_length"
+
+    def _read_row(self, row: tuple) -> Dict[str, Any]:
+        try:
+            return self._read(*row[1:])
+        except FileNotFoundError:
+            # segment rotated (renamed) by another process since the row was read: look it up again
+            with self._lock:
+                fresh = self._conn.execute(f"SELECT {self._ROW} FROM runs WHERE seq = ?", (row[0],)).fetchone()
+            return self._read(*fresh[1:])
+
+    def _fetch(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {self._ROW} FROM runs {sql}", params).fetchall()
+            return [self._read_row(row) for row in rows]
+
+    def latest(self, n: int = 1) -> List[Dict[str, Any]]:
+        """Newest n records, newest first."""
+        return self._fetch("ORDER BY seq DESC LIMIT ?", (n,))
+
+    def get(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        """Latest record for thread_id, or None."""
+        found = self._fetch("WHERE thread_id = ? ORDER BY seq DESC LIMIT 1", (thread_id,))
+        return found[0] if found else None
+
+    def history(self, thread_id: str) -> List[Dict[str, Any]]:
+        """Every record of thread_id, oldest first (e.g. the original run and its coach re-runs)."""
+        return self._fetch("WHERE thread_id = ? ORDER BY seq", (thread_id,))
+
+    def between(self, start_ts: Optional[float] = None, end_ts: Optional[float] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Records with start_ts <= timestamp < end_ts, newest first."""
+        return self._fetch("WHERE ts >= ? AND ts < ? ORDER BY ts DESC LIMIT ?",
+                           (start_ts if start_ts is not None else float("-inf"),
+                            end_ts if end_ts is not None else float("inf"), limit))
+
+    def search(self, keyword: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Records whose business description or goal contain every word of keyword, newest first."""
+        if self._fts:
+            # each word quoted, so "e-commerce" or "50%" are matched as text rather than FTS5 operators
+            query = " ".join('"' + w.replace('"', '""') + '"' for w in keyword.split())
+            if not query:
+                return []
+            return self._fetch("WHERE seq IN (SELECT rowid FROM runs_text WHERE runs_text MATCH ?) ORDER BY seq DESC LIMIT ?",
+                               (query, limit))
+        words = keyword.lower().split()
+        return [r for r in self.iter_records(reverse=True)
+                if all(w in " ".join(_record_text(r)).lower() for w in words)][:limit]
+
+    def iter_records(self, reverse: bool = False) -> Iterator[Dict[str, Any]]:
+        """Every record in append order (or newest first), reading segment by segment.
+        No lock is held while the caller handles a record, so appends are never blocked by a reader."""
+        order = "DESC" if reverse else "ASC"
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {self._ROW} FROM runs ORDER BY seq {order}").fetchall()
+        for row in rows:
+            with self._lock:
+                record = self._read_row(row)
+            yield record
+
+    def count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def default_run_store() -> RunStore:
+    return RunStore(Path(os.getenv("RUN_STORE_DIR", str(DEFAULT_ROOT))))
@@ -0,0 +1,150 @@
+# src/stream_json.py
+"""
+Incremental parser for a streamed coach answer (one JSON object, COACH_JSON_SCHEMA shape).
+
+    parser = CoachStreamParser()
+    for delta in token_deltas:
+        for kind, key, value in parser.feed(delta):
+            ...  # ("bottleneck", index, {...}) or ("field", name, value)
+
+Each bottlenecks[] element is reported as soon as its closing brace arrives, and every top-level
+field once its value is complete (so "summary" can show up before "kpis_to_track" is generated).
+The parser only scans the new characters on each feed: the cost is linear in the answer length,
+and completed values are json.loads()ed from their slice of the buffer. Text before the first "{"
+(code fences, chatter) is skipped; anything after the object closes is ignored.
+"""
+import json
+from typing import Any, List, Optional, Tuple
+
+Event = Tuple[str, Any, Any]
+
+_WS = " \t\r\n"
+
+
+class CoachStreamParser:
+    def __init__(self, item_key: str = "bottlenecks"):
+        self.item_key = item_key
+        self.buf = ""
+        self.pos = 0
+        self.started = False
+        self.done = False
+        self.result: dict = {}
+        self.items: List[Any] = []
+        self._depth = 0                  # container nesting; 1 = inside the top-level object
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._expect = "key"             # key | colon | value | comma (top-level object only)
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None
+        self._value_depth = 0             # depth to return to when a container value closes
+        self._item_start: Optional[int] = None
+
+    def feed(self, delta: str) -> List[Event]:
+        """Consume a text delta; returns the events completed by it."""
+        if self.done or not delta:
+            return []
+        self.buf += delta
+        events: List[Event] = []
+        buf, i, n = self.buf, self.pos, len(self.buf)
+        while i < n:
+            ch = buf[i]
+            if not self.started:
+                if ch == "{":
+                    self.started = True
+                    self._depth = 1
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._string_done(i, events)
+                i += 1
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+                if self._depth == 1 and self._expect == "value":
+                    self._value_start = i
+                    self._expect = "string_value"
+            elif ch in "{[":
+                if self._depth == 1 and self._expect == "value":
+                    self._value_start = i
+                    self._value_depth = 1
+                    self._expect = "container"
+                elif (self._depth == 2 and ch == "{" and self._expect == "container"
+                      and self._key == self.item_key and buf[self._value_start] == "["):
+                    self._item_start = i
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 2 and self._item_start is not None and ch == "}":
+                    self._emit_item(buf[self._item_start:i + 1], events)
+                    self._item_start = None
+                elif self._depth == 1 and self._expect == "container":
+                    self._value_done(i + 1, events)
+                elif self._depth == 0:
+                    if self._expect == "scalar":
+                        self._value_done(i, events)
+                    self.done = True
+                    i += 1
+                    break
+            elif self._depth == 1:
+                if ch == ":" and self._expect == "colon":
+                    self._expect = "value"
+                elif ch == ",":
+                    if self._expect == "scalar":
+                        self._value_done(i, events)
+                    self._expect = "key"
+                elif ch not in _WS and self._expect == "value":
+                    # number / true / false / null: ends at the next "," or "}"
+                    self._value_start = i
+                    self._expect = "scalar"
+            i += 1
+        self.pos = i
+        return events
+
+    def _string_done(self, end: int, events: List[Event]) -> None:
+        if self._depth != 1:
+            return
+        if self._expect == "key":
+            try:
+                self._key = json.loads(self.buf[self._string_start:end + 1])
+            except ValueError:
+                self._key = None
+            self._expect = "colon"
+        elif self._expect == "string_value":
+            self._value_done(end + 1, events)
+
+    def _value_done(self, end: int, events: List[Event]) -> None:
+        raw = self.buf[self._value_start:end].strip()
+        self._expect = "comma"
+        self._value_start = None
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return
+        if self._key is not None:
+            self.result[self._key] = value
+            events.append(("field", self._key, value))
+
+    def _emit_item(self, raw: str, events: List[Event]) -> None:
+        try:
+            item = json.loads(raw)
+        except ValueError:
+            return
+        events.append(("bottleneck", len(self.items), item))
+        self.items.append(item)
+
+    def partial(self) -> dict:
+        """Fields completed so far, with the bottlenecks seen so far even if the list is still open."""
+        out = dict(self.result)
+        if self.item_key not in out and self.items:
+            out[self.item_key] = list(self.items)
+        return out
@@ -0,0 +1,177 @@
+# src/tracing.py
+"""
+Lightweight spans for the consulting pipeline, written to a local JSONL trace file.
+
+    with TRACER.span("llm", coach="sam_ovens") as sp:
+        resp = llm.invoke(msgs)
+        sp.set(prompt_tokens=..., completion_tokens=..., cache_hit=False)
+
+Each finished span is one line: trace_id (the graph thread_id), span_id, parent_id, stage,
+start (epoch s), duration_ms, ok, error plus whatever attributes were set. Parents are
+tracked with contextvars, so nesting works across awaits; threads started from a pool need
+contextvars.copy_context() to keep their parent.
+
+summarize() / scripts/trace_summary.py report p50/p95/p99 per stage across runs.
+"""
+import os
+import json
+import time
+import uuid
+import atexit
+import threading
+import contextvars
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+DEFAULT_TRACE_PATH = Path("data/traces/spans.jsonl")
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "stage", "start", "attrs")
+
+    def __init__(self, stage: str, trace_id: Optional[str], parent: Optional["Span"]):
+        self.stage = stage
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.trace_id = trace_id or (parent.trace_id if parent else None)
+        self.start = time.time()
+        self.attrs: Dict[str, Any] = {}
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def add(self, key: str, amount: float) -> None:
+        """Accumulate a counter attribute (e.g. tokens over several calls)."""
+        self.attrs[key] = self.attrs.get(key, 0) + amount
+
+
+class Tracer:
+    def __init__(self, path: Path = DEFAULT_TRACE_PATH, enabled: bool = True):
+        self.path = Path(path)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._fh = None
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._fh is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._fh = self.path.open("a", encoding="utf-8")
+                atexit.register(self.close)
+            self._fh.write(line)
+            self._fh.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+    @contextmanager
+    def span(self, stage: str, trace_id: Optional[str] = None, **attrs: Any) -> Iterator[Span]:
+        sp = Span(stage, trace_id, _current.get())
+        sp.attrs.update(attrs)
+        token = _current.set(sp)
+        t0 = time.perf_counter()
+        error = None
+        try:
+            yield sp
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current.reset(token)
+            if self.enabled:
+                try:
+                    self._write({
+                        "trace_id": sp.trace_id,
+                        "span_id": sp.span_id,
+                        "parent_id": sp.parent_id,
+                        "stage": stage,
+                        "start": round(sp.start, 6),
+                        "duration_ms": round((time.perf_counter() - t0) * 1000, 3),
+                        "ok": error is None,
+                        "error": error,
+                        **sp.attrs,
+                    })
+                except Exception as e:
+                    print(f"Trace write failed: {e}")
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def make_tracer() -> Tracer:
+    return Tracer(Path(os.getenv("TRACE_PATH", str(DEFAULT_TRACE_PATH))),
+                  enabled=os.getenv("TRACE_DISABLED", "").lower() not in ("1", "true", "yes"))
+
+
+# ---------- SUMMARY ----------
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list (q in 0..100)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * q // 100))  # ceil
+    return sorted_values[int(rank) - 1]
+
+
+def load_spans(path: Path = DEFAULT_TRACE_PATH) -> Iterator[Dict[str, Any]]:
+    path = Path(path)
+    if not path.exists():
+        return
+    with path.open("r", encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+def summarize(spans: Iterator[Dict[str, Any]], since: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Per-stage latency percentiles and totals:
+    {stage: {count, errors, p50_ms, p95_ms, p99_ms, mean_ms, max_ms, prompt_tokens, completion_tokens,
+             cache_hits, retries, traces}}
+    """
+    durations: Dict[str, List[float]] = {}
+    totals: Dict[str, Dict[str, Any]] = {}
+    for sp in spans:
+        if since is not None and sp.get("start", 0) < since:
+            continue
+        stage = sp.get("stage", "?")
+        durations.setdefault(stage, []).append(float(sp.get("duration_ms", 0.0)))
+        t = totals.setdefault(stage, {"errors": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                                      "cache_hits": 0, "retries": 0, "traces": set()})
+        t["errors"] += 0 if sp.get("ok", True) else 1
+        t["prompt_tokens"] += sp.get("prompt_tokens") or 0
+        t["completion_tokens"] += sp.get("completion_tokens") or 0
+        t["cache_hits"] += 1 if sp.get("cache_hit") else 0
+        t["retries"] += sp.get("retries") or 0
+        if sp.get("trace_id"):
+            t["traces"].add(sp["trace_id"])
+
+    out = {}
+    for stage, vals in durations.items():
+        vals.sort()
+        t = totals[stage]
+        out[stage] = {
+            "count": len(vals),
+            "errors": t["errors"],
+            "p50_ms": round(percentile(vals, 50), 3),
+            "p95_ms": round(percentile(vals, 95), 3),
+            "p99_ms": round(percentile(vals, 99), 3),
+            "mean_ms": round(sum(vals) / len(vals), 3),
+            "max_ms": round(vals[-1], 3),
+            "prompt_tokens": t["prompt_tokens"],
+            "completion_tokens": t["completion_tokens"],
+            "cache_hits": t["cache_hits"],
+            "retries": t["retries"],
+            "traces": len(t["traces"]),
+        }
+    return out
@@ -1,5 +1,13 @@
 # src/validate_report.py
-from typing import Dict, Any, List
+"""
+final_report validation against a declarative schema (a small JSON Schema subset:
+type, required, properties, additionalProperties, items, enum, minLength).
+
+The schema is compiled once into nested closures, so checking a report is a single walk with
+no schema interpretation; it runs inline in merge_node and over thousands of stored reports.
+Errors carry RFC 6901 JSON pointers, e.g. ("/consensus_bottlenecks/2/priority", "must be one of ...").
+"""
+from typing import Any, Callable, Dict, List, NamedTuple
 
 REQUIRED_TOP_KEYS = [
     "business_snapshot",
@@ -10,33 +18,189 @@ REQUIRED_TOP_KEYS = [
     "final_summary"
 ]
 
-def validate_final_report(rep: Dict[str, Any]) -> List[str]:
-    errs = []
-    if not isinstance(rep, dict):
-        return ["final_report must be a dict"]
-    for k in REQUIRED_TOP_KEYS:
-        if k not in rep:
-            errs.append(f"missing top-level key: {k}")
-    # business_snapshot checks
-    bs = rep.get("business_snapshot", {})
-    if not isinstance(bs, dict):
-        errs.append("business_snapshot must be an object")
+PROVENANCE_SCHEMA = {
+    "type": "object",
+    "required": ["source", "chunk_id"],
+    "properties": {
+        "evidence_rank": {"type": "integer"},
+        "source": {"type": "string"},
+        "chunk_id": {"type": ["integer", "string"]},
+        "char_start": {"type": "integer"},
+        "char_end": {"type": "integer"},
+        "text_hash": {"type": "string"},
+    },
+}
+
+BOTTLENECK_SCHEMA = {
+    "type": "object",
+    "required": ["name", "diagnosis", "tactical_fix", "priority"],
+    "properties": {
+        "name": {"type": "string", "minLength": 1},
+        "diagnosis": {"type": "string"},
+        "tactical_fix": {"type": "array", "items": {"type": "string", "minLength": 1}},
+        "priority": {"enum": ["low", "medium", "high"]},
+        "source": {"type": "string"},
+    },
+}
+
+FINAL_REPORT_SCHEMA = {
+    "type": "object",
+    "required": REQUIRED_TOP_KEYS,
+    "properties": {
+        "business_snapshot": {
+            "type": "object",
+            "required": ["description", "goal"],
+            "properties": {
+                "description": {"type": "string"},
+                "goal": {"type": "string"},
+                "kpis": {"type": "object"},
+            },
+        },
+        "coach_insights": {
+            "type": "object",
+            "additionalProperties": {
+                "type": "object",
+                "required": ["analysis", "provenance"],
+                "properties": {
+                    "analysis": {"type": "object"},
+                    "provenance": {"type": "array", "items": PROVENANCE_SCHEMA},
+                },
+            },
+        },
+        "consensus_bottlenecks": {"type": "array", "items": BOTTLENECK_SCHEMA},
+        "action_plan": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["fix", "from"],
+                "properties": {"fix": {"type": "string", "minLength": 1}, "from": {"type": "string"}},
+            },
+        },
+        "kpis_to_track": {"type": "array", "items": {"type": "string"}},
+        "proposed_kpis": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["kpi", "why"],
+                "properties": {"kpi": {"type": "string", "minLength": 1}, "why": {"type": "string"}},
+            },
+        },
+        "final_summary": {"type": "string"},
+        "rag_provenance": {"type": "object", "additionalProperties": {"type": "array", "items": PROVENANCE_SCHEMA}},
+    },
+}
+
+
+class ReportError(NamedTuple):
+    path: str      # JSON pointer into the report ("" is the report itself)
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.path or '/'}: {self.message}"
+
+
+# a compiled check: (value, path parts, error sink); parts is a shared stack, joined only on error
+Check = Callable[[Any, List[str], List[ReportError]], None]
+
+_TYPES = {
+    "object": (dict,),
+    "array": (list,),
+    "string": (str,),
+    "integer": (int,),
+    "number": (int, float),
+    "boolean": (bool,),
+    "null": (type(None),),
+}
+
+
+def _pointer(parts: List[str]) -> str:
+    return "".join("/" + p.replace("~", "~0").replace("/", "~1") for p in parts)
+
+
+def _type_check(names: List[str]) -> Callable[[Any], bool]:
+    allowed = tuple(t for n in names for t in _TYPES[n])
+    # bool is an int subclass; only accept it where "boolean" is allowed
+    no_bool = "boolean" not in names
+    return lambda v: isinstance(v, allowed) and not (no_bool and isinstance(v, bool))
+
+
+def compile_schema(schema: Dict[str, Any]) -> Check:
+    """Turn a schema dict into one Check closure (recursively compiles the nested schemas)."""
+    checks: List[Check] = []
+
+    if "type" in schema:
+        names = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+        is_type = _type_check(names)
+        type_msg = "must be " + " or ".join(names)
     else:
-        for sub in ("description", "goal"):
-            if sub not in bs:
-                errs.append(f"business_snapshot missing {sub}")
-    # coach_insights sanity
-    ci = rep.get("coach_insights", {})
-    if not isinstance(ci, dict):
-        errs.append("coach_insights must be an object")
-    # consensus_bottlenecks type
-    cb = rep.get("consensus_bottlenecks", [])
-    if not isinstance(cb, list):
-        errs.append("consensus_bottlenecks must be a list")
-    # action_plan type
-    if not isinstance(rep.get("action_plan", []), list):
-        errs.append("action_plan must be a list")
-    # kpis_to_track type
-    if not isinstance(rep.get("kpis_to_track", []), list):
-        errs.append("kpis_to_track must be a list")
+        is_type, type_msg = None, ""
+
+    if "enum" in schema:
+        allowed = list(schema["enum"])
+        enum_msg = "must be one of " + ", ".join(map(str, allowed))
+
+        def check_enum(v, parts, errs):
+            if v not in allowed:
+                errs.append(ReportError(_pointer(parts), f"{enum_msg} (got {v!r})"))
+        checks.append(check_enum)
+
+    if "minLength" in schema:
+        min_len = schema["minLength"]
+
+        def check_min_length(v, parts, errs):
+            if isinstance(v, str) and len(v.strip()) < min_len:
+                errs.append(ReportError(_pointer(parts), f"must have at least {min_len} non-blank character(s)"))
+        checks.append(check_min_length)
+
+    required = list(schema.get("required", []))
+    props = {k: compile_schema(s) for k, s in schema.get("properties", {}).items()}
+    extra = compile_schema(schema["additionalProperties"]) if isinstance(schema.get("additionalProperties"), dict) else None
+    if required or props or extra:
+        def check_object(v, parts, errs):
+            if not isinstance(v, dict):
+                return
+            for k in required:
+                if k not in v:
+                    errs.append(ReportError(_pointer(parts), f"missing required key '{k}'"))
+            for k, sub in v.items():
+                check = props.get(k, extra)
+                if check is not None:
+                    parts.append(str(k))
+                    check(sub, parts, errs)
+                    parts.pop()
+        checks.append(check_object)
+
+    if "items" in schema:
+        item_check = compile_schema(schema["items"])
+
+        def check_items(v, parts, errs):
+            if not isinstance(v, list):
+                return
+            for i, item in enumerate(v):
+                parts.append(str(i))
+                item_check(item, parts, errs)
+                parts.pop()
+        checks.append(check_items)
+
+    def check(v, parts, errs):
+        if is_type is not None and not is_type(v):
+            errs.append(ReportError(_pointer(parts), f"{type_msg} (got {type(v).__name__})"))
+            return
+        for c in checks:
+            c(v, parts, errs)
+    return check
+
+
+_CHECK_REPORT = compile_schema(FINAL_REPORT_SCHEMA)
+
+
+def report_errors(rep: Any) -> List[ReportError]:
+    """All schema violations in a final_report, as (json_pointer, message)."""
+    errs: List[ReportError] = []
+    _CHECK_REPORT(rep, [], errs)
     return errs
+
+
+def validate_final_report(rep: Dict[str, Any]) -> List[str]:
+    """Same checks as report_errors(), formatted as "<json pointer>: <message>" strings."""
+    return [str(e) for e in report_errors(rep)]
@@ -0,0 +1,68 @@
+import os
+import sys
+import json
+import asyncio
+import tempfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+import scripts.batch_consult as batch
+from scripts.batch_consult import record_id, run_batch
+
+
+class FakeGraph:
+    def __init__(self):
+        self.threads = []
+
+    async def ainvoke(self, state, config):
+        self.threads.append(config["configurable"]["thread_id"])
+        if state["business_description"] == "boom":
+            raise RuntimeError("coach failed")
+        return {"final_report": {"business_snapshot": {"description": state["business_description"]}}}
+
+
+async def _no_session(graph, thread_id):
+    return {"exists": False}
+
+
+def _run(tmp, lines, graph):
+    batch.build_async_graph = lambda: (graph, None)
+    batch.asession_status = _no_session
+    src = Path(tmp) / "intake.jsonl"
+    src.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return asyncio.run(run_batch(src, Path(tmp) / "out", concurrency=3))
+
+
+def test_record_ids_are_stable_and_distinct():
+    rec = {"business_description": "bakery", "goal": "grow", "kpis": {"cac": 1}}
+    assert record_id(rec) == record_id(dict(rec)) and len(record_id(rec)) == 12
+    assert record_id({"id": "acme-1"}) == "acme-1"
+    assert record_id({"id": "a/b"}) != record_id({"id": "a:b"})
+    assert record_id({"id": "a/b"}).startswith("a_b-")
+
+
+def test_bad_lines_fail_alone_and_reruns_resume():
+    lines = [
+        json.dumps({"id": "a/b", "business_description": "one"}),
+        json.dumps({"id": "a:b", "business_description": "two"}),
+        "[]",
+        "null",
+        json.dumps({"id": "x", "business_description": "boom"}),
+        json.dumps({"id": "a:b", "business_description": "two again"}),
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        graph = FakeGraph()
+        counts = _run(tmp, lines, graph)
+        assert counts == {"done": 2, "failed": 3, "skipped": 1}
+        assert len(graph.threads) == 3
+
+        graph = FakeGraph()
+        counts = _run(tmp, lines, graph)
+        assert graph.threads == ["batch-x"]  # only the failed record is retried
+        assert counts == {"done": 0, "failed": 3, "skipped": 3}
+
+
+if __name__ == "__main__":
+    test_record_ids_are_stable_and_distinct()
+    test_bad_lines_fail_alone_and_reruns_resume()
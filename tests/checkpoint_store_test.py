@@ -0,0 +1,140 @@
+import sys
+import sqlite3
+import operator
+import tempfile
+from pathlib import Path
+from typing import Annotated, List, TypedDict
+
+sys.path.append(str(Path(__file__).parent.parent))
+from langgraph.graph import StateGraph, START, END
+from src.checkpoint_store import SQLiteCheckpointSaver
+
+
+class State(TypedDict):
+    log: Annotated[List[str], operator.add]
+
+
+def _graph(saver, calls, fail_b=False):
+    def node(name, fail=False):
+        def run(state):
+            calls.append(name)
+            if fail:
+                raise RuntimeError(f"{name} failed")
+            return {"log": [name]}
+        return run
+
+    g = StateGraph(State)
+    g.add_node("a", node("a"))
+    g.add_node("b", node("b", fail_b))
+    g.add_node("merge", node("merge"))
+    g.add_edge(START, "a")
+    g.add_edge(START, "b")
+    g.add_edge(["a", "b"], "merge")
+    g.add_edge("merge", END)
+    return g.compile(checkpointer=saver)
+
+
+def _saver(path, **kw):
+    kw.setdefault("keep_last", None)
+    kw.setdefault("max_age_seconds", None)
+    return SQLiteCheckpointSaver(path, **kw)
+
+
+def _thread(tid):
+    return {"configurable": {"thread_id": tid}}
+
+
+def test_state_round_trips_through_a_new_saver():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "cp.sqlite"
+        saver = _saver(path)
+        _graph(saver, []).invoke({"log": []}, _thread("t1"))
+        saver.close()
+
+        saver = _saver(path)
+        tup = saver.get_tuple(_thread("t1"))
+        assert sorted(tup.checkpoint["channel_values"]["log"]) == ["a", "b", "merge"]
+        assert saver.thread_ids() == ["t1"]
+        assert len(list(saver.list(_thread("t1")))) > 1
+        saver.delete_thread("t1")
+        assert saver.get_tuple(_thread("t1")) is None
+        saver.close()
+
+
+def test_resume_after_failure_reruns_only_the_failed_node():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "cp.sqlite"
+        saver, calls = _saver(path), []
+        try:
+            _graph(saver, calls, fail_b=True).invoke({"log": []}, _thread("t1"))
+        except RuntimeError:
+            pass
+        saver.close()
+        assert sorted(calls) == ["a", "b"]
+
+        saver, calls = _saver(path), []
+        state = _graph(saver, calls).invoke(None, _thread("t1"))
+        saver.close()
+        assert calls == ["b", "merge"]
+        assert sorted(state["log"]) == ["a", "b", "merge"]
+
+
+def test_retention_keeps_last_and_drops_old_threads():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "cp.sqlite"
+        saver = _saver(path, keep_last=2)
+        graph = _graph(saver, [])
+        for _ in range(3):
+            graph.invoke({"log": []}, _thread("t1"))
+        graph.invoke({"log": []}, _thread("old"))
+        saver.flush()
+        with sqlite3.connect(str(path)) as db:
+            db.execute("UPDATE checkpoints SET created_at = created_at - 3600 WHERE thread_id = 'old'")
+
+        saver.max_age_seconds = 600
+        assert saver.apply_retention() > 0
+        assert len(list(saver.list(_thread("t1")))) == 2
+        assert saver.thread_ids() == ["t1"]
+        with sqlite3.connect(str(path)) as db:
+            assert db.execute("SELECT COUNT(*) FROM writes WHERE thread_id = 'old'").fetchone()[0] == 0
+        saver.close()
+
+
+def test_close_flushes_queued_writes():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "cp.sqlite"
+        saver = _saver(path, flush_interval=3600, batch_size=10_000)
+        _graph(saver, []).invoke({"log": []}, _thread("t1"))
+        with sqlite3.connect(str(path)) as db:
+            before = db.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+        queued = len(saver._pending)
+        saver.close()
+        with sqlite3.connect(str(path)) as db:
+            after = db.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+        assert queued and after > before
+
+
+def test_finished_node_writes_survive_a_crash():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "cp.sqlite"
+        crashed, calls = _saver(path, flush_interval=3600, batch_size=10_000), []
+        try:
+            _graph(crashed, calls, fail_b=True).invoke({"log": []}, _thread("t1"))
+        except RuntimeError:
+            pass
+        # no close(): the process "died" with whatever was only queued
+
+        saver, calls = _saver(path), []
+        state = _graph(saver, calls).invoke(None, _thread("t1"))
+        saver.close()
+        assert calls == ["b", "merge"]
+        assert sorted(state["log"]) == ["a", "b", "merge"]
+        crashed._closed = True
+
+
+if __name__ == "__main__":
+    test_state_round_trips_through_a_new_saver()
+    test_resume_after_failure_reruns_only_the_failed_node()
+    test_retention_keeps_last_and_drops_old_threads()
+    test_close_flushes_queued_writes()
+    test_finished_node_writes_survive_a_crash()
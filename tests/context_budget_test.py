@@ -0,0 +1,49 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.context_budget import count_tokens, pack_evidence
+
+DOC = " ".join(f"word{i}" for i in range(200))
+SHARED = DOC[300:400]
+
+
+def _chunk(chunk_id, start, end, source="guide.txt"):
+    return DOC[start:end], {"source": source, "chunk_id": chunk_id, "char_start": start, "char_end": end}
+
+
+C4 = _chunk(4, 0, 400)
+C5 = _chunk(5, 300, 700)
+OTHER = ("unrelated evidence " * 20, {"source": "other.txt", "chunk_id": 1})
+
+
+def test_overlap_removed_against_packed_neighbours():
+    packed, _ = pack_evidence([C4, C5], 10_000)
+    assert [info["overlap_chars_removed"] for _, _, info in packed] == [0, 100]
+    assert packed[1][0] == DOC[400:700].lstrip()
+
+    packed, _ = pack_evidence([C5, C4], 10_000)
+    assert [info["overlap_chars_removed"] for _, _, info in packed] == [0, 100]
+    assert packed[1][0] == DOC[0:300].rstrip()
+
+
+def test_shared_text_kept_when_predecessor_is_dropped():
+    budget = count_tokens(C5[0]) + count_tokens(OTHER[0]) + 10
+    packed, _ = pack_evidence([C5, OTHER, C4], budget)
+    assert [meta["chunk_id"] for _, meta, _ in packed] == [5, 1]
+    assert packed[0][0] == C5[0] and packed[0][2]["overlap_chars_removed"] == 0
+
+
+def test_shared_text_kept_when_predecessor_is_trimmed():
+    packed, _ = pack_evidence([C5, C4], count_tokens(C5[0]) + 70)
+    assert packed[1][2]["trimmed"]
+    assert SHARED in packed[0][0]
+
+    packed, _ = pack_evidence([C4, C5], 70)
+    assert len(packed) == 1 and packed[0][2]["trimmed"]
+
+
+if __name__ == "__main__":
+    test_overlap_removed_against_packed_neighbours()
+    test_shared_text_kept_when_predecessor_is_dropped()
+    test_shared_text_kept_when_predecessor_is_trimmed()
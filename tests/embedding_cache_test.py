@@ -0,0 +1,90 @@
+import sys
+import asyncio
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.embedding_cache import QueryEmbeddingCache
+
+
+class SlowEmbeddings:
+    model = "fake-embed"
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = 0
+
+    async def aembed_query(self, text):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return [float(len(text)), 1.0]
+
+    def embed_query(self, text):
+        self.calls += 1
+        return [float(len(text)), 1.0]
+
+
+def test_concurrent_misses_share_one_call():
+    emb = SlowEmbeddings()
+    cache = QueryEmbeddingCache()
+
+    async def main():
+        return await asyncio.gather(*[cache.aget_or_embed("  grow  revenue ", emb) for _ in range(5)])
+
+    assert asyncio.run(main()) == [[12.0, 1.0]] * 5
+    assert emb.calls == 1 and cache.stats["misses"] == 1
+
+
+def test_cancelling_the_first_caller_does_not_fail_the_others():
+    emb = SlowEmbeddings(delay=0.1)
+    cache = QueryEmbeddingCache()
+
+    async def main():
+        owner = asyncio.create_task(cache.aget_or_embed("churn", emb))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.aget_or_embed("churn", emb))
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        vec = await waiter
+        assert owner.cancelled()
+        return vec
+
+    assert asyncio.run(main()) == [5.0, 1.0]
+    assert emb.calls == 1
+    assert cache.get_or_embed("churn", emb) == [5.0, 1.0] and emb.calls == 1
+
+
+def test_event_loops_on_other_threads_do_not_share_futures():
+    emb = SlowEmbeddings(delay=0.2)
+    cache = QueryEmbeddingCache()
+    errors, results = [], []
+
+    def run():
+        try:
+            results.append(asyncio.run(cache.aget_or_embed("cac", emb)))
+        except Exception as e:
+            errors.append(repr(e))
+
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors and results == [[3.0, 1.0]] * 2
+
+
+def test_disk_tier_survives_a_new_cache():
+    with tempfile.TemporaryDirectory() as tmp:
+        emb = SlowEmbeddings(delay=0)
+        asyncio.run(QueryEmbeddingCache(disk_dir=tmp).aget_or_embed("ltv", emb))
+        cache = QueryEmbeddingCache(disk_dir=tmp)
+        assert asyncio.run(cache.aget_or_embed("ltv", emb)) == [3.0, 1.0]
+        assert emb.calls == 1 and cache.stats["disk_hits"] == 1
+
+
+if __name__ == "__main__":
+    test_concurrent_misses_share_one_call()
+    test_cancelling_the_first_caller_does_not_fail_the_others()
+    test_event_loops_on_other_threads_do_not_share_futures()
+    test_disk_tier_survives_a_new_cache()
@@ -0,0 +1,42 @@
+import sys
+import threading
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.embedding_pipeline import EmbeddingPipeline
+
+
+class FakeRateLimit(Exception):
+    status_code = 429
+
+
+def test_pipeline_retries_429_and_writes_everything():
+    lock = threading.Lock()
+    calls = {"n": 0}
+    written = {}
+
+    def fake_embed(texts):
+        with lock:
+            calls["n"] += 1
+            n = calls["n"]
+        if n % 3 == 0:
+            raise FakeRateLimit("429 Too Many Requests")
+        return [[float(len(t))] for t in texts]
+
+    def fake_write(ids, vectors, texts, metas):
+        with lock:
+            written.update(zip(ids, vectors))
+
+    batches = [([f"id{b}-{i}" for i in range(4)], [f"text {b} {i}" for i in range(4)], [{}] * 4) for b in range(10)]
+    pipeline = EmbeddingPipeline(fake_embed, fake_write, max_in_flight=3, rpm=60000, tpm=10_000_000)
+    pipeline.backoff.base = 0.01
+    stats = pipeline.run(batches)
+
+    assert len(written) == 40
+    assert stats["written"] == 40
+    assert stats["rate_limited"] > 0
+    print("pipeline stats:", stats)
+
+
+if __name__ == "__main__":
+    test_pipeline_retries_429_and_writes_everything()
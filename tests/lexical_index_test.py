@@ -0,0 +1,95 @@
+import sys
+import json
+import time
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+import src.lexical_index as lexical
+from src.lexical_index import BM25Index, LexicalIndexRegistry, reciprocal_rank_fusion
+
+
+def _chunk(i, text):
+    return {"text": text, "source": "guide.txt", "coach": "c", "chunk_id": i}
+
+
+CHUNKS = [
+    _chunk(0, "Lower CAC by fixing the offer before buying ads"),
+    _chunk(1, "Churn drops when onboarding shows value in week one"),
+    _chunk(2, "Hire a closer once the offer converts"),
+]
+
+
+def _write(path, chunks):
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text("".join(json.dumps(c) + "\n" for c in chunks), encoding="utf-8")
+    tmp.replace(path)
+
+
+def test_bm25_matches_jargon_and_syncs_incrementally():
+    idx = BM25Index()
+    assert idx.sync(CHUNKS) == (3, 0)
+    assert idx.search("what is our CAC?", 2)[0][1]["chunk_id"] == 0
+    assert idx.sync(CHUNKS[1:] + [_chunk(3, "LTV over CAC above three")]) == (1, 1)
+    assert [m["chunk_id"] for _, m, _ in idx.search("cac", 5)] == [3]
+    assert BM25Index.from_json(json.loads(json.dumps(idx.to_json()))).search("churn", 1) == idx.search("churn", 1)
+
+
+def test_registry_refresh_swaps_in_a_new_index():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        (root / "processed" / "c").mkdir(parents=True)
+        src = root / "processed" / "c" / "chunks.jsonl"
+        _write(src, CHUNKS)
+        reg = LexicalIndexRegistry(root / "processed", root / "bm25")
+        old = reg.get("c")
+        assert [m["chunk_id"] for _, m in reg.search("c", "churn", 3)] == [1]
+
+        _write(src, CHUNKS + [_chunk(3, "Churn interviews every month")])
+        reg._checked["c"] = 0.0  # due for a staleness check
+        new = reg.get("c")
+        assert new is not old and len(new.docs) == 4
+        assert len(old.docs) == 3  # searches still holding the old index are unaffected
+        assert (root / "bm25" / "c.json.gz").exists()
+
+
+def test_slow_refresh_does_not_block_other_coaches():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        for coach in ("slow", "fast"):
+            (root / "processed" / coach).mkdir(parents=True)
+            _write(root / "processed" / coach / "chunks.jsonl", CHUNKS)
+        reg = LexicalIndexRegistry(root / "processed", root / "bm25")
+        reg.get("fast")
+        refresh = reg._refresh
+
+        def slow_refresh(coach, idx):
+            if coach == "slow":
+                time.sleep(0.5)
+            return refresh(coach, idx)
+
+        reg._refresh = slow_refresh
+        loader = threading.Thread(target=reg.get, args=("slow",))
+        loader.start()
+        time.sleep(0.05)
+        t0 = time.perf_counter()
+        reg._checked["fast"] = 0.0
+        assert reg.search("fast", "offer", 1)
+        assert time.perf_counter() - t0 < 0.25
+        loader.join()
+
+
+def test_rrf_rewards_agreement_and_keeps_first_seen_order():
+    a, b, c = [(t["text"], {"source": t["source"], "chunk_id": t["chunk_id"]}) for t in CHUNKS]
+    fused = reciprocal_rank_fusion([[a, b, c], [c, a]], k=3)
+    assert fused == [a, c, b]
+    assert reciprocal_rank_fusion([[a], [b]], k=2) == [a, b]
+    assert lexical.doc_key(*a) == "guide.txt#0"
+
+
+if __name__ == "__main__":
+    test_bm25_matches_jargon_and_syncs_incrementally()
+    test_registry_refresh_swaps_in_a_new_index()
+    test_slow_refresh_does_not_block_other_coaches()
+    test_rrf_rewards_agreement_and_keeps_first_seen_order()
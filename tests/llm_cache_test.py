@@ -0,0 +1,75 @@
+import sys
+import asyncio
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from langchain_core.messages import AIMessage, HumanMessage
+from src.llm_cache import LLMResponseCache, make_cache_key
+
+
+class CountingLLM:
+    model_name = "fake-chat"
+
+    def __init__(self, temperature=0.0):
+        self.temperature = temperature
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def invoke(self, msgs, **kwargs):
+        with self._lock:
+            self.calls += 1
+            return AIMessage(content=f"answer {self.calls}")
+
+    async def ainvoke(self, msgs, **kwargs):
+        return self.invoke(msgs, **kwargs)
+
+
+MSGS = [HumanMessage(content="diagnose my agency")]
+
+
+def test_key_covers_model_params_and_call_kwargs():
+    base = make_cache_key(CountingLLM(), MSGS)
+    assert base == make_cache_key(CountingLLM(), list(MSGS))
+    assert base != make_cache_key(CountingLLM(temperature=0.7), MSGS)
+    assert base != make_cache_key(CountingLLM(), [HumanMessage(content="diagnose my bakery")])
+    assert base != make_cache_key(CountingLLM(), MSGS, {"response_format": {"type": "json_object"}})
+
+
+def test_hits_refresh_and_bypass():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache, llm = LLMResponseCache(str(Path(tmp) / "llm.sqlite")), CountingLLM()
+        assert cache.invoke(llm, MSGS).content == "answer 1"
+        hit = cache.invoke(llm, MSGS)
+        assert hit.content == "answer 1" and hit.response_metadata["cache_hit"] and llm.calls == 1
+
+        assert cache.invoke(llm, MSGS, refresh=True).content == "answer 2"
+        assert asyncio.run(cache.ainvoke(llm, MSGS)).content == "answer 2"  # refresh replaced the entry
+        assert cache.invoke(llm, MSGS, bypass=True).content == "answer 3"
+        assert cache.invoke(llm, MSGS, response_format={"type": "json_object"}).content == "answer 4"
+        assert cache.stats == {"hits": 2, "misses": 3, "bypassed": 1, "evicted": 0}
+
+
+def test_stats_are_exact_under_concurrency():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache, llm = LLMResponseCache(str(Path(tmp) / "llm.sqlite")), CountingLLM()
+        cache.invoke(llm, MSGS)
+
+        def hammer():
+            for _ in range(200):
+                cache.invoke(llm, MSGS)
+                cache.invoke(llm, MSGS, bypass=True)
+
+        threads = [threading.Thread(target=hammer) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert cache.stats["hits"] == 1600 and cache.stats["bypassed"] == 1600 and cache.stats["misses"] == 1
+
+
+if __name__ == "__main__":
+    test_key_covers_model_params_and_call_kwargs()
+    test_hits_refresh_and_bypass()
+    test_stats_are_exact_under_concurrency()
@@ -0,0 +1,126 @@
+import sys
+import gzip
+import json
+import tempfile
+import threading
+import multiprocessing
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.run_store import RunStore, read_tail
+
+
+def _record(i, business="Agency"):
+    snapshot = {"description": f"{business} number {i}", "goal": "Grow revenue"}
+    return {"thread_id": f"t-{i % 5}", "timestamp": 1000.0 + i,
+            "final_report": {"business_snapshot": snapshot, "final_summary": "x" * 200}}
+
+
+def test_lookups_survive_rotation_and_compression():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RunStore(Path(tmp), max_segment_bytes=2000, legacy_file=None)
+        for i in range(40):
+            store.append(_record(i, "Bakery" if i == 7 else "Agency"))
+
+        assert list(Path(tmp).glob("runs-*.jsonl.gz"))
+        assert [r["timestamp"] for r in store.latest(2)] == [1039.0, 1038.0]
+        assert store.get("t-3")["timestamp"] == 1038.0
+        assert [r["timestamp"] for r in store.history("t-2")] == [1002.0 + 5 * k for k in range(8)]
+        assert [r["timestamp"] for r in store.between(1010.0, 1013.0)] == [1012.0, 1011.0, 1010.0]
+        assert [r["timestamp"] for r in store.search("bakery")] == [1007.0]
+        assert [r["timestamp"] for r in store.iter_records()] == [1000.0 + i for i in range(40)]
+        store.close()
+
+
+def test_unindexed_tail_and_legacy_file_are_picked_up():
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = Path(tmp) / "runs.jsonl"
+        legacy.write_text("".join(json.dumps(_record(i)) + "\n" for i in range(3)), encoding="utf-8")
+        assert json.loads(read_tail(legacy, 1)[0])["timestamp"] == 1002.0
+
+        store = RunStore(Path(tmp) / "runs", legacy_file=legacy)
+        assert store.count() == 3
+        active = sorted((Path(tmp) / "runs").glob("runs-*.jsonl"))[-1]
+        with active.open("a", encoding="utf-8") as fh:  # written, then crashed before indexing
+            fh.write(json.dumps(_record(3)) + "\n")
+        store.close()
+
+        store = RunStore(Path(tmp) / "runs", legacy_file=legacy)
+        assert store.count() == 4  # legacy file imported only once
+        assert store.get("t-3")["timestamp"] == 1003.0
+        store._conn.execute("DELETE FROM meta")  # as if the import had crashed before its marker
+        store._conn.commit()
+        store.close()
+
+        store = RunStore(Path(tmp) / "runs", legacy_file=legacy)
+        assert store.count() == 4
+        store.close()
+
+
+def test_interrupted_rotation_is_finished_on_open():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        store = RunStore(root, legacy_file=None)
+        for i in range(5):
+            store.append(_record(i))
+        store.close()
+        plain = root / "runs-00001.jsonl"
+        gz = root / "runs-00001.jsonl.gz"
+
+        gz.write_bytes(b"")  # crashed before the index was repointed: rotation is redone
+        store = RunStore(root, legacy_file=None)
+        assert not plain.exists() and store.count() == 5
+        assert [r["timestamp"] for r in store.iter_records()] == [1000.0 + i for i in range(5)]
+        store.close()
+
+        plain.write_bytes(gzip.decompress(gz.read_bytes()))  # crashed before the plain segment was deleted
+        store = RunStore(root, legacy_file=None)
+        assert not plain.exists() and store.count() == 5
+        store.append(_record(5))
+        assert store.latest(1)[0]["timestamp"] == 1005.0
+        store.close()
+
+
+def _append_many(root, worker, n):
+    store = RunStore(Path(root), max_segment_bytes=3000, legacy_file=None)
+    for i in range(n):
+        store.append({"thread_id": f"w{worker}-{i}", "timestamp": 2000.0 + worker * 100 + i, "final_report": {}})
+    store.close()
+
+
+def test_appends_from_several_processes_index_correct_offsets():
+    with tempfile.TemporaryDirectory() as tmp:
+        procs = [multiprocessing.Process(target=_append_many, args=(tmp, w, 25)) for w in range(3)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        store = RunStore(Path(tmp), legacy_file=None)
+        assert store.count() == 75
+        assert sorted(r["thread_id"] for r in store.iter_records()) == sorted(
+            f"w{w}-{i}" for w in range(3) for i in range(25))
+        assert store.get("w2-24")["timestamp"] == 2224.0
+        store.close()
+
+
+def test_iterating_does_not_block_appends():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RunStore(Path(tmp), legacy_file=None)
+        for i in range(3):
+            store.append(_record(i))
+        records = store.iter_records()
+        next(records)
+        writer = threading.Thread(target=store.append, args=(_record(3),))
+        writer.start()
+        writer.join(timeout=5)
+        assert not writer.is_alive() and store.count() == 4
+        records.close()
+        store.close()
+
+
+if __name__ == "__main__":
+    test_lookups_survive_rotation_and_compression()
+    test_unindexed_tail_and_legacy_file_are_picked_up()
+    test_interrupted_rotation_is_finished_on_open()
+    test_appends_from_several_processes_index_correct_offsets()
+    test_iterating_does_not_block_appends()
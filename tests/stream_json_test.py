@@ -0,0 +1,43 @@
+import sys
+import json
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.stream_json import CoachStreamParser
+
+ANSWER = {
+    "bottlenecks": [
+        {"name": "Offer \"clarity\" }", "tactical_fix": ["a, b", "c"], "priority": "high"},
+        {"name": "Delivery", "tactical_fix": [], "priority": "low"},
+    ],
+    "top_recommendation": "Fix the offer",
+    "kpis_to_track": ["close_rate"],
+    "score": 3.5,
+    "summary": "s",
+}
+
+
+def test_bottlenecks_stream_out_before_the_answer_ends():
+    text = "```json\n" + json.dumps(ANSWER, indent=2) + "\n```"
+    parser = CoachStreamParser()
+    events = []
+    for i in range(0, len(text), 3):
+        events.extend((i, e) for e in parser.feed(text[i:i + 3]))
+
+    items = [(i, e[2]) for i, e in events if e[0] == "bottleneck"]
+    assert [item for _, item in items] == ANSWER["bottlenecks"]
+    assert items[0][0] < text.index('"top_recommendation"')
+    assert [e[1] for _, e in events if e[0] == "field"] == list(ANSWER)
+    assert parser.done and parser.result == ANSWER
+
+
+def test_partial_exposes_open_bottleneck_list():
+    text = json.dumps(ANSWER)
+    parser = CoachStreamParser()
+    parser.feed(text[:text.index('{"name": "Delivery"')])
+    assert parser.partial() == {"bottlenecks": ANSWER["bottlenecks"][:1]}
+
+
+if __name__ == "__main__":
+    test_bottlenecks_stream_out_before_the_answer_ends()
+    test_partial_exposes_open_bottleneck_list()
@@ -0,0 +1,47 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.validate_report import report_errors, validate_final_report
+
+
+def _report():
+    return {
+        "business_snapshot": {"description": "SaaS", "goal": "grow", "kpis": {}},
+        "coach_insights": {
+            "sam_ovens": {"analysis": {"summary": "s"}, "provenance": [{"evidence_rank": 1, "source": "a.txt", "chunk_id": 3}]},
+        },
+        "consensus_bottlenecks": [
+            {"name": "Offer", "diagnosis": "unclear", "tactical_fix": ["rewrite"], "priority": "high", "source": "sam_ovens"},
+        ],
+        "action_plan": [{"fix": "rewrite", "from": "sam_ovens"}],
+        "kpis_to_track": ["close_rate"],
+        "proposed_kpis": [{"kpi": "close_rate", "why": "offer fit"}],
+        "final_summary": "s",
+    }
+
+
+def test_valid_report_has_no_errors():
+    assert validate_final_report(_report()) == []
+
+
+def test_errors_point_at_nested_fields():
+    rep = _report()
+    rep["consensus_bottlenecks"][0]["priority"] = "low|medium|high"
+    del rep["proposed_kpis"][0]["why"]
+    rep["coach_insights"]["sam_ovens"]["provenance"][0]["chunk_id"] = None
+    del rep["final_summary"]
+
+    paths = {e.path for e in report_errors(rep)}
+    assert paths == {
+        "/consensus_bottlenecks/0/priority",
+        "/proposed_kpis/0",
+        "/coach_insights/sam_ovens/provenance/0/chunk_id",
+        "",
+    }
+    assert "/: missing required key 'final_summary'" in validate_final_report(rep)
+
+
+if __name__ == "__main__":
+    test_valid_report_has_no_errors()
+    test_errors_point_at_nested_fields()
@@ -0,0 +1,105 @@
+import os
+import sys
+import gc
+import asyncio
+import tempfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+import src.business_consultant_graph as graph
+from chromadb.api.client import SharedSystemClient
+
+
+class FakeStore:
+    def __init__(self, name):
+        self.name = name
+
+
+class Patched:
+    """Stand-in Chroma builder plus a counter on chromadb's client-cache reset."""
+
+    def __enter__(self):
+        self.built = []
+        self.resets = 0
+        self._saved = (graph._build_chroma_vectorstore, graph._new_embeddings,
+                       graph.POOL_STALE_CHECK_SECONDS, SharedSystemClient.__dict__["clear_system_cache"])
+
+        def build(name, emb=None):
+            self.built.append(name)
+            return FakeStore(name)
+
+        def reset():
+            self.resets += 1
+
+        graph._build_chroma_vectorstore = build
+        graph._new_embeddings = object
+        graph.POOL_STALE_CHECK_SECONDS = 0.0
+        SharedSystemClient.clear_system_cache = staticmethod(reset)
+        return self
+
+    def __exit__(self, *exc):
+        (graph._build_chroma_vectorstore, graph._new_embeddings,
+         graph.POOL_STALE_CHECK_SECONDS, clear) = self._saved
+        SharedSystemClient.clear_system_cache = clear
+
+
+def test_handles_and_embeddings_are_reused():
+    with tempfile.TemporaryDirectory() as tmp, Patched() as p:
+        pool = graph.VectorstorePool(persist_dir=tmp)
+        a = pool.get("dan_martell")
+        assert pool.get("dan_martell") is a
+        assert pool.get("sam_ovens") is not a
+        assert p.built == ["dan_martell", "sam_ovens"]
+        # one embeddings client serves every collection
+        assert pool.get_embeddings("dan_martell") is pool.get_embeddings("sam_ovens")
+
+
+def test_disk_change_drops_handles():
+    with tempfile.TemporaryDirectory() as tmp, Patched() as p:
+        pool = graph.VectorstorePool(persist_dir=tmp)
+        a = pool.get("dan_martell")
+        (Path(tmp) / "chroma.sqlite3").write_bytes(b"re-ingested")
+        b = pool.get("dan_martell")
+        assert b is not a
+        assert p.built == ["dan_martell", "dan_martell"]
+        assert p.resets == 1
+
+
+def test_invalidate_waits_for_leased_handles():
+    with tempfile.TemporaryDirectory() as tmp, Patched() as p:
+        pool = graph.VectorstorePool(persist_dir=tmp)
+        with pool.lease("dan_martell") as old:
+            pool.invalidate()
+            # the leased handle's client must stay open while it is in use
+            assert p.resets == 0
+            fresh = pool.get("dan_martell")
+            assert fresh is not old
+        assert p.resets == 1
+        # handles opened through the old client went with it
+        assert pool.get("dan_martell") is not fresh
+
+        pool.invalidate()
+        assert p.resets == 2
+
+
+def test_upstream_semaphores_are_per_loop():
+    async def grab():
+        first = graph.upstream_semaphore("llm")
+        assert graph.upstream_semaphore("llm") is first
+        assert graph.upstream_semaphore("chroma") is not first
+        await asyncio.gather(*(asyncio.sleep(0) for _ in range(3)))
+        return first
+
+    a = asyncio.run(grab())
+    b = asyncio.run(grab())
+    assert a is not b
+    gc.collect()
+    assert len(graph._UPSTREAM_SEMAPHORES) == 0
+
+
+if __name__ == "__main__":
+    test_handles_and_embeddings_are_reused()
+    test_disk_change_drops_handles()
+    test_invalidate_waits_for_leased_handles()
+    test_upstream_semaphores_are_per_loop()